@@ -1,18 +1,115 @@
-from audio_metadata_editor.metadata import AudioType, MediaType, Metadata
-from audio_metadata_editor.spotify_api import SpotifyAPI
-from audio_metadata_editor.youtube_audio_downloader import YouTubeAudioDownloader
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from audio_metadata_editor.daemon import Daemon
+    from audio_metadata_editor.fingerprint import Fingerprint, FingerprintIndex
+    from audio_metadata_editor.format_policy import FormatPolicy
+    from audio_metadata_editor.instrumentation import (
+        Hook,
+        Instrumentation,
+        JsonLinesHook,
+        LoggingHook,
+        PrometheusHook,
+    )
+    from audio_metadata_editor.jobs import Job, JobQueue
+    from audio_metadata_editor.loudness import Loudness
+    from audio_metadata_editor.lyrics import (
+        HTTPLyricsProvider,
+        LocalLyricsProvider,
+        Lyrics,
+        LyricsProvider,
+        LyricsQuery,
+    )
+    from audio_metadata_editor.manifest import DownloadManifest
+    from audio_metadata_editor.memory import MemoryBudget
+    from audio_metadata_editor.metadata import AudioType, MediaType, Metadata
+    from audio_metadata_editor.rate_limit import RateLimiter
+    from audio_metadata_editor.spotify_api import AlbumContext, SpotifyAPI
+    from audio_metadata_editor.verification import VerificationError
+    from audio_metadata_editor.youtube_audio_downloader import (
+        YouTubeAudioDownloader,
+    )
+
+    YTAD = YouTubeAudioDownloader
 
 version_tuple: tuple[int, int, int] = (1, 0, 0)  # (main, minor, patchlevel)
 version: str = ".".join(map(str, version_tuple))
 
-YTAD = YouTubeAudioDownloader
+# exported name -> (module, attribute); modules are imported on first access,
+# so e.g. `Metadata` does not pull in requests, PIL, pytube or ffmpeg
+_EXPORTS: dict[str, tuple[str, str]] = {
+    "AlbumContext": ("spotify_api", "AlbumContext"),
+    "AudioType": ("metadata", "AudioType"),
+    "Daemon": ("daemon", "Daemon"),
+    "DownloadManifest": ("manifest", "DownloadManifest"),
+    "Fingerprint": ("fingerprint", "Fingerprint"),
+    "FingerprintIndex": ("fingerprint", "FingerprintIndex"),
+    "FormatPolicy": ("format_policy", "FormatPolicy"),
+    "Hook": ("instrumentation", "Hook"),
+    "HTTPLyricsProvider": ("lyrics", "HTTPLyricsProvider"),
+    "Instrumentation": ("instrumentation", "Instrumentation"),
+    "Job": ("jobs", "Job"),
+    "JobQueue": ("jobs", "JobQueue"),
+    "JsonLinesHook": ("instrumentation", "JsonLinesHook"),
+    "LocalLyricsProvider": ("lyrics", "LocalLyricsProvider"),
+    "LoggingHook": ("instrumentation", "LoggingHook"),
+    "Loudness": ("loudness", "Loudness"),
+    "Lyrics": ("lyrics", "Lyrics"),
+    "LyricsProvider": ("lyrics", "LyricsProvider"),
+    "LyricsQuery": ("lyrics", "LyricsQuery"),
+    "MediaType": ("metadata", "MediaType"),
+    "MemoryBudget": ("memory", "MemoryBudget"),
+    "Metadata": ("metadata", "Metadata"),
+    "PrometheusHook": ("instrumentation", "PrometheusHook"),
+    "RateLimiter": ("rate_limit", "RateLimiter"),
+    "SpotifyAPI": ("spotify_api", "SpotifyAPI"),
+    "VerificationError": ("verification", "VerificationError"),
+    "YouTubeAudioDownloader": ("youtube_audio_downloader", "YouTubeAudioDownloader"),
+    "YTAD": ("youtube_audio_downloader", "YouTubeAudioDownloader"),
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module, attribute = _EXPORTS[name]
+    value = getattr(import_module(f".{module}", __name__), attribute)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
 
 
 __all__: list[str] = [
+    "AlbumContext",
     "AudioType",
+    "Daemon",
+    "DownloadManifest",
+    "Fingerprint",
+    "FingerprintIndex",
+    "FormatPolicy",
+    "Hook",
+    "HTTPLyricsProvider",
+    "Instrumentation",
+    "Job",
+    "JobQueue",
+    "JsonLinesHook",
+    "LocalLyricsProvider",
+    "LoggingHook",
+    "Loudness",
+    "Lyrics",
+    "LyricsProvider",
+    "LyricsQuery",
     "MediaType",
+    "MemoryBudget",
     "Metadata",
+    "PrometheusHook",
+    "RateLimiter",
     "SpotifyAPI",
+    "VerificationError",
     "YouTubeAudioDownloader",
     "YTAD",
 ]
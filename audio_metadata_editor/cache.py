@@ -0,0 +1,100 @@
+# @title Thread-safe memoization cache class { display-mode: "form" }
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+
+@dataclass
+class LRUCache:
+    """Thread-safe least recently used cache memoizing computed values.
+
+    Concurrent `get` calls for a missing key share one computation; a
+    computation that raises is not cached, its error is raised to every caller.
+
+    Attributes
+    ----------
+    maxsize : int
+        The number of values cached before the least recently used is evicted,
+        by default 1024.
+    on_evict : Callable[[Any], Any], optional
+        Called with every value evicted or cleared, e.g. to remove a file, by
+        default None.
+    """
+
+    maxsize: int = 1024
+    on_evict: Optional[Callable[[Any], Any]] = None
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: OrderedDict[Hashable, Any] = OrderedDict()
+        self._pending: dict[Hashable, Future] = {}
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value of `key`, computing it on a miss.
+
+        Parameters
+        ----------
+        key : Hashable
+            The cache key.
+        compute : Callable[[], Any]
+            Computes the value of a missing key.
+
+        Returns
+        -------
+        Any
+            The value.
+        """
+        with self._lock:
+            if key in self._values:
+                self._values.move_to_end(key)
+                return self._values[key]
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as error:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(error)
+            raise
+
+        evicted = []
+        with self._lock:
+            self._values[key] = value
+            while len(self._values) > self.maxsize:
+                evicted.append(self._values.popitem(last=False)[1])
+            del self._pending[key]
+        future.set_result(value)
+
+        for value_ in evicted:
+            self._evict(value_)
+        return value
+
+    def _evict(self, value: Any) -> None:
+        if self.on_evict is not None:
+            self.on_evict(value)
+        return
+
+    def clear(self) -> None:
+        """Evict every cached value."""
+        with self._lock:
+            values = list(self._values.values())
+            self._values.clear()
+        for value in values:
+            self._evict(value)
+        return
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
@@ -0,0 +1,352 @@
+# @title Batch command-line interface { display-mode: "form" }
+"""
+Download and tag the YouTube videos listed in files or on stdin.
+
+    ytad urls.txt --workers 8 --output-dir music > results.jsonl
+    cat urls.txt | ytad --format mobile --no-metadata
+    ytad urls.txt --shards 4 --db /shared/ytad.db --spotify-rate 10
+
+One URL per line; blank lines and lines starting with "#" are skipped. Every
+video is reported as one JSON line on stdout as soon as it finishes, or with
+`--shards`, within a second of it finishing, and the exit status is 1 if any
+video failed, with a summary of the failures on stderr.
+"""
+
+import argparse
+import json
+import logging
+import sys
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, replace
+from typing import IO, Iterable, Iterator, Optional
+
+from .format_policy import FormatPolicy
+from .instrumentation import Instrumentation
+from .lyrics import HTTPLyricsProvider, LocalLyricsProvider, Lyrics, LyricsProvider
+from .manifest import DownloadManifest
+from .memory import MemoryBudget
+from .pipeline import TrackResult, process
+from .rate_limit import RateLimiter
+from .spotify_api import SpotifyAPI
+from .youtube_audio_downloader import YouTubeAudioDownloader
+
+logger = logging.getLogger(__name__)
+
+
+def read_urls(files: Iterable[IO[str]]) -> Iterator[str]:
+    """Yield the URLs of files line by line, without reading them whole.
+
+    Parameters
+    ----------
+    files : Iterable[IO[str]]
+        Text streams with one URL per line.
+
+    Yields
+    ------
+    str
+        The URLs, skipping blank lines and "#" comments.
+    """
+    for file in files:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+
+
+def lyrics(directory: Optional[str], endpoint: Optional[str]) -> Optional[Lyrics]:
+    """Build the lyrics lookup of the command-line options.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Directory of local lyrics files, tried first.
+    endpoint : str, optional
+        Endpoint of an LRCLIB-style lyrics API.
+
+    Returns
+    -------
+    Lyrics or None
+        The lyrics lookup, or None without any provider.
+    """
+    providers: list[LyricsProvider] = []
+    if directory:
+        providers.append(LocalLyricsProvider(directory))
+    if endpoint:
+        providers.append(HTTPLyricsProvider(endpoint))
+    return Lyrics(providers) if providers else None
+
+
+def memory_budget(megabytes: Optional[float]) -> Optional[MemoryBudget]:
+    """Build the memory budget of the command-line options.
+
+    Parameters
+    ----------
+    megabytes : float, optional
+        The estimated MiB processed at once.
+
+    Returns
+    -------
+    MemoryBudget or None
+        The budget, or None to limit videos by worker count alone.
+    """
+    return MemoryBudget(int(megabytes * 1024 * 1024)) if megabytes else None
+
+
+def run(
+    urls: Iterable[str],
+    downloader: YouTubeAudioDownloader,
+    spotify: Optional[SpotifyAPI] = None,
+    workers: int = 4,
+    output: Optional[IO[str]] = None,
+) -> list[TrackResult]:
+    """Process videos concurrently, writing every result as a JSON line.
+
+    At most `2 * workers` URLs are read ahead of the finished videos, so an
+    endless stream of URLs is processed in bounded memory.
+
+    Parameters
+    ----------
+    urls : Iterable[str]
+        URLs of the YouTube videos.
+    downloader : YouTubeAudioDownloader
+        Template of the per-video downloaders.
+    spotify : SpotifyAPI, optional
+        An authenticated Spotify client; metadata is skipped without one,
+        by default None.
+    workers : int, optional
+        Number of videos processed concurrently, by default 4.
+    output : IO[str], optional
+        The stream the JSON lines are written to, by default stdout.
+
+    Returns
+    -------
+    list[TrackResult]
+        The failed videos.
+    """
+
+    def job(url: str) -> TrackResult:
+        # SpotifyAPI keeps the last search response, one copy per video
+        return process(url, replace(downloader), replace(spotify) if spotify else None)
+
+    output = output or sys.stdout
+    failures: list[TrackResult] = []
+
+    def emit(futures: Iterable[Future]) -> None:
+        for future in futures:
+            result = future.result()
+            output.write(json.dumps(asdict(result), default=str) + "\n")
+            output.flush()
+            if result.status == "failed":
+                failures.append(result)
+        return
+
+    pending: set[Future] = set()
+    with ThreadPoolExecutor(workers, thread_name_prefix="ytad") as executor:
+        for url in urls:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                emit(done)
+            pending.add(executor.submit(job, url))
+        emit(wait(pending).done)
+
+    return failures
+
+
+def format_policy(option: str) -> FormatPolicy:
+    """Build the format policy of the `--format` option.
+
+    Parameters
+    ----------
+    option : str
+        "default", "mobile" or the `FormatPolicy` fields as a JSON object.
+
+    Returns
+    -------
+    FormatPolicy
+        The policy.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the option is invalid, naming it in the message.
+    """
+    try:
+        return FormatPolicy.from_option(option)
+    except (TypeError, ValueError) as error:
+        raise argparse.ArgumentTypeError(f"--format: {error}") from error
+
+
+def build(
+    args: argparse.Namespace,
+) -> tuple[YouTubeAudioDownloader, Optional[SpotifyAPI]]:
+    """Build the downloader template and Spotify client of the command-line options.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The parsed options of `main`.
+
+    Returns
+    -------
+    tuple[YouTubeAudioDownloader, SpotifyAPI or None]
+        The downloader, and the unauthenticated Spotify client, or None without
+        metadata.
+
+    Raises
+    ------
+    argparse.ArgumentTypeError
+        If the `--format` option is invalid.
+    """
+    instrumentation = Instrumentation()
+    fingerprint_index = None
+    if args.fingerprints:
+        from .fingerprint import FingerprintIndex
+
+        fingerprint_index = FingerprintIndex(args.fingerprints)
+
+    downloader = YouTubeAudioDownloader(
+        fingerprint_index=fingerprint_index,
+        skip_duplicates=args.skip_duplicates,
+        analyze_loudness=args.analyze_loudness,
+        format_policy=format_policy(args.format),
+        output_dir=args.output_dir,
+        temp_dir=args.temp_dir,
+        instrumentation=instrumentation,
+        memory_budget=memory_budget(args.memory_budget),
+        verify=args.verify,
+        manifest=DownloadManifest(args.manifest) if args.manifest else None,
+    )
+
+    spotify = None
+    if args.metadata:
+        spotify = SpotifyAPI(
+            temp_dir=args.temp_dir,
+            instrumentation=instrumentation,
+            lyrics=lyrics(args.lyrics_dir, args.lyrics_api),
+            rate_limiter=RateLimiter(args.spotify_rate) if args.spotify_rate else None,
+        )
+    return downloader, spotify
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the `ytad` command line, downloading the videos of the URL files.
+
+    Parameters
+    ----------
+    argv : list[str], optional
+        The command-line arguments, by default `sys.argv[1:]`.
+
+    Returns
+    -------
+    int
+        The exit status, 1 if any video failed, else 0; invalid options exit
+        with status 2.
+    """
+    parser = argparse.ArgumentParser(
+        prog="ytad",
+        description=__doc__.strip().splitlines()[0],
+        epilog="Results are JSON lines on stdout; logs go to stderr.",
+    )
+    parser.add_argument(
+        "files",
+        nargs="*",
+        type=argparse.FileType("r"),
+        help="files with one URL per line, by default stdin ('-')",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument("-o", "--output-dir", help="by default the current directory")
+    parser.add_argument("--temp-dir", help="by default the system temporary directory")
+    parser.add_argument(
+        "--format",
+        default="default",
+        help="'default', 'mobile' or the FormatPolicy fields as a JSON object",
+    )
+    parser.add_argument(
+        "--metadata",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="tag the audio with Spotify metadata (default: on)",
+    )
+    parser.add_argument("--auth-file", default="auth.json")
+    parser.add_argument("--lyrics-dir", help="directory of .lrc/.txt lyrics files")
+    parser.add_argument("--lyrics-api", help="LRCLIB-style lyrics API endpoint")
+    parser.add_argument("--fingerprints", help="fingerprint index for duplicates")
+    parser.add_argument("--skip-duplicates", action="store_true")
+    parser.add_argument("--manifest", help="JSON lines log of the published files")
+    parser.add_argument(
+        "--verify",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="check integrity and duration before tagging (default: on)",
+    )
+    parser.add_argument("--analyze-loudness", action="store_true")
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        metavar="MIB",
+        help="limit concurrent videos by their estimated size, not only by count",
+    )
+    parser.add_argument(
+        "--spotify-rate",
+        type=float,
+        metavar="RPS",
+        help="Spotify requests per second, divided among the live shards",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        help="worker processes, coordinated through the --db job queue",
+    )
+    parser.add_argument("--db", default="ytad.db", help="job queue of sharded runs")
+    parser.add_argument(
+        "--lease",
+        type=float,
+        default=60.0,
+        help="seconds before a crashed shard's videos are picked again",
+    )
+    parser.add_argument(
+        "--join",
+        action="store_true",
+        help="only process the videos already queued in --db, e.g. on another host",
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="[%(levelname)s] %(message)s",
+        stream=sys.stderr,
+    )
+
+    try:
+        downloader, spotify = build(args)
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+
+    if spotify and not spotify.is_authenticated(args.auth_file):
+        spotify.authenticate(args.auth_file)
+
+    urls = [] if args.join else read_urls(args.files or [sys.stdin])
+    if args.shards or args.join:
+        from . import shard
+
+        failed = shard.run(urls, args, spotify.auth if spotify else None)
+        failures = [TrackResult(job.url, "failed", error=job.error) for job in failed]
+    else:
+        try:
+            failures = run(urls, downloader, spotify, args.workers)
+        finally:
+            if spotify:
+                spotify.close()
+        logger.info("Stage timings:\n%s", downloader.instrumentation.summary())
+
+    if failures:
+        print(f"{len(failures)} failed:", file=sys.stderr)
+        for result in failures:
+            print(f"  {result.video_url}: {result.error}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
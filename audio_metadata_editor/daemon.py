@@ -0,0 +1,508 @@
+# @title Long-running download and tag worker service { display-mode: "form" }
+"""
+Worker service processing queued videos with a warm Spotify session.
+
+    python -m audio_metadata_editor.daemon serve --db jobs.db --socket ytad.sock
+    python -m audio_metadata_editor.daemon submit --socket ytad.sock URL...
+    python -m audio_metadata_editor.daemon status --socket ytad.sock
+
+Jobs live in a `JobQueue`, so they can also be submitted by writing to the
+SQLite database directly and survive restarts of the service. Daemons on several
+hosts may serve one database file on a shared filesystem.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, replace
+from datetime import datetime
+from typing import Any, Optional
+
+from .format_policy import FormatPolicy
+from .instrumentation import Instrumentation
+from .jobs import Job, JobQueue
+from .manifest import DownloadManifest
+from .pipeline import IDENTIFIERS, TrackResult, process
+from .rate_limit import RateLimiter
+from .spotify_api import SpotifyAPI
+from .youtube_audio_downloader import YouTubeAudioDownloader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Daemon:
+    """Service taking jobs from a `JobQueue` and processing them concurrently.
+
+    The Spotify token, HTTP connections, fingerprint index and worker threads
+    stay alive between jobs. Failed jobs are retried with exponential backoff.
+
+    Attributes
+    ----------
+    queue : JobQueue
+        The queue jobs are taken from.
+    spotify : SpotifyAPI, optional
+        The Spotify client shared by all jobs; metadata is skipped without one,
+        by default None.
+    auth_file : str
+        The file the Spotify token is cached in, by default "auth.json".
+    workers : int
+        Maximum number of jobs processed concurrently, by default 4.
+    max_attempts : int
+        Attempts before a job fails for good, by default 3.
+    backoff : float
+        Seconds before the first retry, doubled on every further retry, by
+        default 30.0.
+    max_backoff : float
+        Upper bound of the retry delay in seconds, by default 3600.0.
+    poll_interval : float
+        Seconds between polls of an empty queue, by default 1.0.
+    socket_path : str, optional
+        Unix socket serving the status and submit endpoint, by default None.
+    downloader : YouTubeAudioDownloader
+        Template of the per-job downloaders, sharing e.g. its fingerprint index,
+        output directory and instrumentation.
+    drain : bool
+        Whether to return from `serve_forever` once no job is queued or running
+        in any process sharing the queue, e.g. for sharded batch runs, by default
+        False.
+    spotify_rate : float, optional
+        The Spotify requests per second of all daemons sharing the queue, divided
+        evenly among the live ones, by default None, which does not limit them.
+    """
+
+    queue: JobQueue
+    spotify: Optional[SpotifyAPI] = None
+    auth_file: str = "auth.json"
+    workers: int = 4
+    max_attempts: int = 3
+    backoff: float = 30.0
+    max_backoff: float = 3600.0
+    poll_interval: float = 1.0
+    socket_path: Optional[str] = None
+    downloader: YouTubeAudioDownloader = field(default_factory=YouTubeAudioDownloader)
+    drain: bool = False
+    spotify_rate: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+        self._wakeup = threading.Event()
+        self._auth_lock = threading.Lock()
+        self._running: dict[int, Job] = {}
+        self._running_lock = threading.Lock()
+        self._server: Optional[socketserver.BaseServer] = None
+        self._started = time.time()
+        self._finished = threading.Event()
+        self._rate_limiter: Optional[RateLimiter] = None
+
+    @property
+    def instrumentation(self) -> Instrumentation:
+        return self.downloader.instrumentation
+
+    def _authenticated(self) -> Optional[SpotifyAPI]:
+        """Return the Spotify client, renewing its token a minute before expiry."""
+        if self.spotify is None:
+            return
+        with self._auth_lock:
+            expires = self.spotify.auth.get("authorize_after", 0)
+            if datetime.now().timestamp() > expires - 60:
+                self.spotify.authenticate(self.auth_file)
+        return self.spotify
+
+    def process(self, job: Job) -> TrackResult:
+        """Download and tag the video of a job.
+
+        Parameters
+        ----------
+        job : Job
+            The claimed job; its options override the `downloader` template,
+            e.g. "output_dir", "format", "skip_duplicates", "analyze_loudness",
+            "metadata", "output_file" and "market"; "spotify_track_id", "isrc",
+            "upc" and "track_number" look the track up instead of searching.
+
+        Returns
+        -------
+        TrackResult
+            The outcome of processing the video.
+        """
+        options = job.options
+        downloader = replace(
+            self.downloader,
+            output_dir=options.get("output_dir", self.downloader.output_dir),
+            skip_duplicates=options.get(
+                "skip_duplicates", self.downloader.skip_duplicates
+            ),
+            analyze_loudness=options.get(
+                "analyze_loudness", self.downloader.analyze_loudness
+            ),
+            format_policy=(
+                FormatPolicy.from_option(options["format"])
+                if "format" in options
+                else self.downloader.format_policy
+            ),
+        )
+
+        spotify = self._authenticated() if options.get("metadata", True) else None
+        return process(
+            job.url,
+            downloader,
+            # SpotifyAPI keeps the last search response, one copy per job
+            replace(spotify) if spotify else None,
+            output_file=options.get("output_file"),
+            market=options.get("market"),
+            identifiers={key: options[key] for key in IDENTIFIERS if key in options},
+        )
+
+    def _retry_in(self, attempts: int) -> Optional[float]:
+        """Return the backoff before the next attempt, or None after the last."""
+        if attempts >= self.max_attempts:
+            return
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+
+    def _lost(self, job: Job) -> None:
+        """Log an outcome the queue dropped because the job's lease was lost."""
+        logger.warning(
+            "Job %d lost its lease (attempt %d), its outcome is not recorded.",
+            job.id,
+            job.attempts,
+        )
+        return
+
+    def _run(self, job: Job) -> None:
+        """Process a claimed job and record its outcome in the queue."""
+        try:
+            with self.instrumentation.span("job", attempt=job.attempts):
+                result = self.process(job)
+            if result.status == "failed":
+                retry_in = self._retry_in(job.attempts)
+                if not self.queue.fail(
+                    job, str(result.error), asdict(result), retry_in
+                ):
+                    self._lost(job)
+                    return
+                logger.warning(
+                    "Job %d failed (attempt %d), %s: %s",
+                    job.id,
+                    job.attempts,
+                    "retry in %.0fs" % retry_in if retry_in is not None else "gave up",
+                    result.error,
+                )
+            elif not self.queue.complete(job, asdict(result)):
+                self._lost(job)
+            else:
+                logger.info("Job %d %s: `%s`", job.id, result.status, result.path)
+        except Exception as error:
+            logger.exception("Job %d crashed.", job.id)
+            if not self.queue.fail(
+                job,
+                f"{type(error).__name__}: {error}",
+                None,
+                self._retry_in(job.attempts),
+            ):
+                self._lost(job)
+        finally:
+            with self._running_lock:
+                self._running.pop(job.id, None)
+            self._slots.release()
+        return
+
+    def submit(self, url: str, **options: Any) -> int:
+        """Queue a video and wake an idle worker.
+
+        Parameters
+        ----------
+        url : str
+            URL of the YouTube video.
+        options : Any
+            Per-job options, see `process`.
+
+        Returns
+        -------
+        int
+            The job ID.
+        """
+        job_id = self.queue.submit(url, **options)
+        self._wakeup.set()
+        return job_id
+
+    def status(self) -> dict[str, Any]:
+        """Report the queue, the running jobs and the stage timings.
+
+        Returns
+        -------
+        dict[str, Any]
+            The status report.
+        """
+        with self._running_lock:
+            running = [
+                {"id": job.id, "url": job.url, "attempts": job.attempts}
+                for job in self._running.values()
+            ]
+        return {
+            "owner": self.owner,
+            "uptime": time.time() - self._started,
+            "workers": self.workers,
+            "jobs": self.queue.counts(),
+            "running": running,
+            "stages": self.instrumentation.report(),
+        }
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Answer one request of the socket endpoint.
+
+        Parameters
+        ----------
+        request : dict[str, Any]
+            {"op": "status"}, {"op": "job", "id": ...} or
+            {"op": "submit", "url": ..., "options": {...}}.
+
+        Returns
+        -------
+        dict[str, Any]
+            The response, with an "error" on a bad request.
+        """
+        op = request.get("op")
+        if op == "status":
+            return self.status()
+        if op == "submit" and request.get("url"):
+            return {"id": self.submit(request["url"], **request.get("options", {}))}
+        if op == "job":
+            job = self.queue.get(int(request.get("id", 0)))
+            return asdict(job) if job else {"error": "no such job"}
+        return {"error": f"unknown request {request!r}"}
+
+    def _heartbeat(self) -> None:
+        """Renew the leases of the running jobs until `serve_forever` returns, and
+        divide `spotify_rate` among the live daemons."""
+        interval = self.queue.lease / 3
+        while True:
+            try:
+                live = self.queue.heartbeat(self.owner)
+            except Exception:
+                logger.exception("Heartbeat failed.")
+            else:
+                if self._rate_limiter is not None:
+                    self._rate_limiter.rate = self.spotify_rate / max(live, 1)
+            if self._finished.wait(interval):
+                break
+        self.queue.leave(self.owner)
+        return
+
+    def _serve_socket(self) -> None:
+        """Serve `handle` on `socket_path`, one JSON request per line."""
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                for line in self.rfile:
+                    try:
+                        response = daemon.handle(json.loads(line))
+                    except Exception as error:
+                        response = {"error": f"{type(error).__name__}: {error}"}
+                    self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return
+
+    def serve_forever(self) -> None:
+        """Process jobs until `stop` is called, then finish the running ones."""
+        self._slots = threading.BoundedSemaphore(self.workers)
+        if self.socket_path:
+            self._serve_socket()
+        if self.spotify and self.spotify_rate:
+            # the job copies of the client share the limiter
+            self._rate_limiter = RateLimiter(self.spotify_rate)
+            self.spotify.rate_limiter = self._rate_limiter
+        self._finished.clear()
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        self._authenticated()
+        logger.info("Serving as %s with %d workers.", self.owner, self.workers)
+
+        executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ytad")
+        try:
+            while not self._stopping.is_set():
+                if not self._slots.acquire(timeout=self.poll_interval):
+                    continue
+                job = self.queue.claim(self.owner, self.max_attempts)
+                if job is None:
+                    self._slots.release()
+                    if self.drain and self.queue.drained():
+                        logger.info("Queue drained.")
+                        break
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+                    continue
+                with self._running_lock:
+                    self._running[job.id] = job
+                executor.submit(self._run, job)
+        finally:
+            # unfinished jobs of an interrupted run are reclaimed once leases expire
+            executor.shutdown(wait=True)
+            self._finished.set()
+            heartbeat.join()
+            if self._server:
+                self._server.shutdown()
+                self._server.server_close()
+                os.remove(self.socket_path)
+            if self.spotify:
+                self.spotify.close()
+            self.instrumentation.close()
+        return
+
+    def stop(self) -> None:
+        """Stop claiming jobs; `serve_forever` returns once running jobs finish."""
+        self._stopping.set()
+        self._wakeup.set()
+        return
+
+
+def request(socket_path: str, op: str, **kwargs: Any) -> dict[str, Any]:
+    """Send one request to the socket endpoint of a running `Daemon`.
+
+    Parameters
+    ----------
+    socket_path : str
+        The Unix socket of the daemon.
+    op : str
+        "status", "job" or "submit".
+    kwargs : Any
+        The request fields, e.g. `url` and `options` for "submit".
+
+    Returns
+    -------
+    dict[str, Any]
+        The response.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps({"op": op, **kwargs}).encode() + b"\n")
+        with client.makefile("rb") as response:
+            return json.loads(response.readline())
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the daemon command line: "serve", "submit" or "status".
+
+    Parameters
+    ----------
+    argv : list[str], optional
+        The command-line arguments, by default `sys.argv[1:]`.
+
+    Returns
+    -------
+    int
+        The exit status, 0 once the command finished.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default="jobs.db", help="the SQLite job queue")
+    parser.add_argument("--socket", help="the Unix socket of the status endpoint")
+    parser.add_argument(
+        "--lease", type=float, default=900.0, help="seconds a job is leased"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="process queued jobs")
+    serve.add_argument("--workers", type=int, default=4)
+    serve.add_argument("--max-attempts", type=int, default=3)
+    serve.add_argument("--backoff", type=float, default=30.0)
+    serve.add_argument("--drain", action="store_true", help="exit once queue is empty")
+    serve.add_argument(
+        "--spotify-rate",
+        type=float,
+        metavar="RPS",
+        help="Spotify requests per second, divided among the live daemons",
+    )
+    serve.add_argument("--output-dir")
+    serve.add_argument("--temp-dir")
+    serve.add_argument("--fingerprints", help="fingerprint index for duplicates")
+    serve.add_argument("--no-metadata", dest="metadata", action="store_false")
+    serve.add_argument("--no-verify", dest="verify", action="store_false")
+    serve.add_argument("--manifest", help="JSON lines log of the published files")
+    serve.add_argument("--lyrics-dir", help="directory of .lrc/.txt lyrics files")
+    serve.add_argument("--lyrics-api", help="LRCLIB-style lyrics API endpoint")
+    serve.add_argument(
+        "--memory-budget",
+        type=float,
+        metavar="MIB",
+        help="limit concurrent jobs by their estimated size, not only by count",
+    )
+
+    submit = commands.add_parser("submit", help="queue videos")
+    submit.add_argument("urls", nargs="+")
+    submit.add_argument("--options", type=json.loads, default={})
+
+    commands.add_parser("status", help="print the daemon status")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+
+    if args.command == "serve":
+        from .cli import lyrics, memory_budget
+        from .fingerprint import FingerprintIndex
+
+        daemon = Daemon(
+            queue=JobQueue(args.db, lease=args.lease),
+            spotify=(
+                SpotifyAPI(
+                    temp_dir=args.temp_dir,
+                    lyrics=lyrics(args.lyrics_dir, args.lyrics_api),
+                )
+                if args.metadata
+                else None
+            ),
+            workers=args.workers,
+            max_attempts=args.max_attempts,
+            backoff=args.backoff,
+            socket_path=args.socket,
+            drain=args.drain,
+            spotify_rate=args.spotify_rate,
+            downloader=YouTubeAudioDownloader(
+                fingerprint_index=(
+                    FingerprintIndex(args.fingerprints) if args.fingerprints else None
+                ),
+                output_dir=args.output_dir,
+                temp_dir=args.temp_dir,
+                memory_budget=memory_budget(args.memory_budget),
+                verify=args.verify,
+                manifest=DownloadManifest(args.manifest) if args.manifest else None,
+            ),
+        )
+        signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == "submit":
+        for url in args.urls:
+            if args.socket:
+                response = request(args.socket, "submit", url=url, options=args.options)
+            else:
+                response = {"id": JobQueue(args.db).submit(url, **args.options)}
+            print(json.dumps({"url": url, **response}))
+        return 0
+
+    if args.socket:
+        print(json.dumps(request(args.socket, "status"), indent=2))
+    else:
+        print(json.dumps({"jobs": JobQueue(args.db).counts()}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,464 @@
+# @title Audio fingerprint and duplicate index class { display-mode: "form" }
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+import numpy as np
+
+from .paths import move_into_place, temporary_path
+
+try:
+    import fcntl
+except ImportError:  # Windows, the index is only shared between threads
+    fcntl = None
+
+SAMPLE_RATE: int = 11025  # Hz, mono PCM decoded for fingerprinting
+FRAME_SIZE: int = 4096  # samples per FFT frame (~370 ms)
+HOP_SIZE: int = 2048  # samples between consecutive frames
+SEGMENTS: int = 32  # coarse time segments summarised in the fingerprint
+CHROMA_BINS: int = 12
+MIN_FREQUENCY: float = 55.0  # A1
+MAX_FREQUENCY: float = 2000.0
+FINGERPRINT_BITS: int = SEGMENTS * CHROMA_BINS + CHROMA_BINS * CHROMA_BINS
+
+
+def _chroma_filter() -> np.ndarray:
+    """Build the matrix that folds FFT magnitude bins into 12 pitch classes.
+
+    Returns
+    -------
+    np.ndarray
+        A (FRAME_SIZE // 2 + 1, 12) matrix of zeros and ones.
+    """
+    freqs = np.fft.rfftfreq(FRAME_SIZE, 1 / SAMPLE_RATE)
+    chroma_filter = np.zeros((freqs.size, CHROMA_BINS), dtype=np.float32)
+    valid = (freqs >= MIN_FREQUENCY) & (freqs <= MAX_FREQUENCY)
+    # pitch class 0 is C, A4 (440 Hz) is pitch class 9
+    pitch_class = (np.round(12 * np.log2(freqs[valid] / 440.0)).astype(int) + 9) % 12
+    chroma_filter[np.flatnonzero(valid), pitch_class] = 1.0
+    return chroma_filter
+
+
+_CHROMA_FILTER: np.ndarray = _chroma_filter()
+_WINDOW: np.ndarray = np.hanning(FRAME_SIZE).astype(np.float32)
+
+
+def chroma(samples: np.ndarray, block_frames: int = 512) -> np.ndarray:
+    """Compute per-frame chroma vectors from mono PCM samples.
+
+    Parameters
+    ----------
+    samples : np.ndarray
+        Mono PCM samples at `SAMPLE_RATE`, any numeric dtype.
+    block_frames : int, optional
+        Number of frames transformed at once, bounding peak memory, by default 512.
+
+    Returns
+    -------
+    np.ndarray
+        A (n_frames, 12) float32 array of L2-normalised chroma vectors.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if samples.size < FRAME_SIZE:
+        samples = np.pad(samples, (0, FRAME_SIZE - samples.size))
+
+    frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+    blocks = []
+    for start in range(0, len(frames), block_frames):
+        block = frames[start : start + block_frames] * _WINDOW
+        blocks.append(np.abs(np.fft.rfft(block, axis=1)) @ _CHROMA_FILTER)
+
+    chroma_ = np.concatenate(blocks).astype(np.float32)
+    norms = np.linalg.norm(chroma_, axis=1, keepdims=True)
+    return chroma_ / np.maximum(norms, 1e-9)
+
+
+@dataclass
+class Fingerprint:
+    """Compact chroma-based fingerprint of an audio track.
+
+    Attributes
+    ----------
+    bits : np.ndarray
+        The fingerprint bits packed into a uint8 array.
+    duration : float
+        The duration of the fingerprinted audio in seconds.
+    """
+
+    bits: np.ndarray
+    duration: float
+
+    @classmethod
+    def from_samples(cls, samples: np.ndarray) -> "Fingerprint":
+        """Fingerprint mono PCM samples decoded at `SAMPLE_RATE`.
+
+        The fingerprint combines a coarse chroma profile of `SEGMENTS` equal
+        parts of the track with the frame-to-frame chroma transition matrix,
+        each binarised against its mean so that re-encodes, loudness changes
+        and small offsets only flip a few bits.
+
+        Parameters
+        ----------
+        samples : np.ndarray
+            Mono PCM samples at `SAMPLE_RATE`.
+
+        Returns
+        -------
+        Fingerprint
+            The fingerprint of the samples.
+        """
+        return cls._from_chroma(chroma(samples), len(samples) / SAMPLE_RATE)
+
+    @classmethod
+    def from_file(cls, filename: str) -> "Fingerprint":
+        """Fingerprint an audio file by decoding it with ffmpeg.
+
+        Parameters
+        ----------
+        filename : str
+            Path to any audio file ffmpeg can decode.
+
+        Returns
+        -------
+        Fingerprint
+            The fingerprint of the audio file.
+        """
+        blocks, n_samples = [], 0
+        remainder = np.zeros(0, dtype=np.int16)
+
+        for pcm in _decode(filename):
+            samples = np.concatenate((remainder, pcm))
+            n_samples += len(pcm)
+            # keep the tail that does not fill a whole hop for the next block
+            usable = max(0, (len(samples) - FRAME_SIZE) // HOP_SIZE + 1)
+            if usable:
+                blocks.append(chroma(samples[: (usable - 1) * HOP_SIZE + FRAME_SIZE]))
+                remainder = samples[usable * HOP_SIZE :]
+            else:
+                remainder = samples
+
+        if not blocks or len(remainder) > HOP_SIZE:
+            blocks.append(chroma(remainder))
+
+        return cls._from_chroma(np.concatenate(blocks), n_samples / SAMPLE_RATE)
+
+    @classmethod
+    def _from_chroma(cls, chroma_: np.ndarray, duration: float) -> "Fingerprint":
+        """Binarise a chroma matrix into a fingerprint.
+
+        Parameters
+        ----------
+        chroma_ : np.ndarray
+            A (n_frames, 12) array of chroma vectors.
+        duration : float
+            The duration of the audio in seconds.
+
+        Returns
+        -------
+        Fingerprint
+            The fingerprint of the chroma matrix.
+        """
+        segments = np.stack(
+            [
+                segment.mean(axis=0) if len(segment) else np.zeros(CHROMA_BINS)
+                for segment in np.array_split(chroma_, SEGMENTS)
+            ]
+        )
+        profile = segments > segments.mean(axis=1, keepdims=True)
+
+        transitions = (
+            chroma_[:-1].T @ chroma_[1:] if len(chroma_) > 1 else np.eye(CHROMA_BINS)
+        )
+        transitions = transitions > transitions.mean()
+
+        bits = np.concatenate((profile.ravel(), transitions.ravel()))
+        return cls(bits=np.packbits(bits), duration=float(duration))
+
+    def distance(self, other: "Fingerprint") -> float:
+        """Return the normalised Hamming distance to another fingerprint.
+
+        Parameters
+        ----------
+        other : Fingerprint
+            The fingerprint to compare against.
+
+        Returns
+        -------
+        float
+            0.0 for identical fingerprints, around 0.5 for unrelated audio.
+        """
+        return int(np.unpackbits(self.bits ^ other.bits).sum()) / FINGERPRINT_BITS
+
+
+def _decode(filename: str, chunk_size: int = 1 << 20) -> Iterator[np.ndarray]:
+    """Stream mono 16-bit PCM from an audio file through ffmpeg.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the audio file.
+    chunk_size : int, optional
+        Number of bytes read from ffmpeg at a time, by default 1 MiB.
+
+    Yields
+    ------
+    np.ndarray
+        Blocks of int16 samples at `SAMPLE_RATE`.
+    """
+    import ffmpeg
+
+    process = (
+        ffmpeg.input(filename)
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=SAMPLE_RATE)
+        .global_args("-v", "error")
+        .run_async(pipe_stdout=True)
+    )
+    pending = b""
+    try:
+        while True:
+            chunk = process.stdout.read(chunk_size)
+            if not chunk:
+                break
+            # a pipe read may split a sample, carry the odd byte over
+            chunk, pending = pending + chunk, b""
+            if len(chunk) % 2:
+                chunk, pending = chunk[:-1], chunk[-1:]
+            yield np.frombuffer(chunk, dtype=np.int16)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+@dataclass
+class FingerprintIndex:
+    """Local index of fingerprints supporting near-duplicate lookup.
+
+    The index is kept in memory as a packed bit matrix, so a lookup is a single
+    vectorised XOR and popcount against every stored fingerprint, and persisted
+    as JSON next to `auth.json`.
+
+    Processes may share the file, e.g. the shards of a sharded run: `save`
+    merges the entries other processes saved under a file lock before replacing
+    the file atomically, and `lookup` first picks up entries saved since.
+    `lookup_or_reserve` checks and adds a fingerprint under both locks, so of
+    two near-duplicates converted at once only one is reserved.
+
+    Attributes
+    ----------
+    filename : str, optional
+        The JSON file the index is loaded from and saved to.
+    max_distance : float
+        The normalised Hamming distance below which two tracks are duplicates.
+    duration_tolerance : float
+        The maximum duration difference in seconds between duplicates.
+    """
+
+    filename: Optional[str] = "fingerprints.json"
+    max_distance: float = 0.2
+    duration_tolerance: float = 10.0
+    keys: list[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rows: list[np.ndarray] = []
+        self._durations: list[float] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._loaded: Optional[tuple[int, int]] = None  # (mtime_ns, size) read
+        self._unsaved: dict[str, Fingerprint] = {}  # added since the last save
+
+        with self._lock:
+            self._merge()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _stat(self) -> Optional[tuple[int, int]]:
+        try:
+            stat = os.stat(self.filename)
+        except (OSError, TypeError):
+            return
+        return stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on `filename` shared with other processes."""
+        if fcntl is None or not self.filename:
+            yield
+            return
+        with open(f"{self.filename}.lock", "a") as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+    def _merge(self) -> None:
+        """Reload `filename` if it changed; `_lock` is held.
+
+        Entries added since the last save are kept, entries other processes
+        released are dropped.
+        """
+        stat = self._stat()
+        if stat is None or stat == self._loaded:
+            return
+        with open(self.filename, encoding="utf-8") as jsonfile:
+            entries = json.load(jsonfile)
+        unsaved = self._unsaved
+        self.keys.clear()
+        self._rows, self._durations, self._unsaved = [], [], {}
+        for entry in entries:
+            if entry["key"] not in unsaved:
+                self._append(
+                    entry["key"],
+                    Fingerprint(
+                        bits=np.frombuffer(bytes.fromhex(entry["bits"]), np.uint8),
+                        duration=entry["duration"],
+                    ),
+                )
+        for key, fingerprint in unsaved.items():
+            self._append(key, fingerprint)
+        self._unsaved = unsaved
+        self._loaded = stat
+        return
+
+    def _append(self, key: str, fingerprint: Fingerprint) -> None:
+        self.keys.append(key)
+        self._rows.append(fingerprint.bits)
+        self._durations.append(fingerprint.duration)
+        self._matrix = None
+
+    def _write(self) -> None:
+        """Replace `filename` with the entries in memory; both locks are held."""
+        entries = [
+            {"key": key, "duration": duration, "bits": bits.tobytes().hex()}
+            for key, duration, bits in zip(self.keys, self._durations, self._rows)
+        ]
+        # readers never see a partially written index
+        staging = temporary_path(self.filename)
+        with open(staging, "w", encoding="utf-8") as jsonfile:
+            json.dump(entries, jsonfile)
+        move_into_place(staging, self.filename)
+        self._loaded = self._stat()
+        self._unsaved = {}
+        return
+
+    def _closest(self, fingerprint: Fingerprint) -> Optional[str]:
+        """Find the closest near-duplicate in memory; `_lock` is held."""
+        if not self.keys:
+            return
+        if self._matrix is None:
+            self._matrix = np.stack(self._rows)
+            self._duration_array = np.asarray(self._durations)
+
+        distances = (
+            np.unpackbits(self._matrix ^ fingerprint.bits, axis=1).sum(axis=1)
+            / FINGERPRINT_BITS
+        )
+        distances[
+            np.abs(self._duration_array - fingerprint.duration)
+            > self.duration_tolerance
+        ] = np.inf
+
+        best = int(np.argmin(distances))
+        if distances[best] <= self.max_distance:
+            return self.keys[best]
+        return
+
+    def add(self, key: str, fingerprint: Fingerprint, autosave: bool = False) -> None:
+        """Add a fingerprint to the index.
+
+        Parameters
+        ----------
+        key : str
+            The identifier stored with the fingerprint, e.g. the audio path.
+        fingerprint : Fingerprint
+            The fingerprint to add.
+        autosave : bool, optional
+            Whether to save the index to `filename` automatically, by default False.
+        """
+        with self._lock:
+            self._append(key, fingerprint)
+            if self.filename:
+                self._unsaved[key] = fingerprint
+        if autosave:
+            self.save()
+        return
+
+    def lookup(self, fingerprint: Fingerprint) -> Optional[str]:
+        """Find the closest near-duplicate of a fingerprint in the index.
+
+        Parameters
+        ----------
+        fingerprint : Fingerprint
+            The fingerprint to look up.
+
+        Returns
+        -------
+        str or None
+            The key of the closest duplicate, or None if there is none.
+        """
+        with self._lock:
+            self._merge()  # saved by another process since
+            return self._closest(fingerprint)
+
+    def lookup_or_reserve(self, key: str, fingerprint: Fingerprint) -> Optional[str]:
+        """Find the closest near-duplicate of a fingerprint, or else add it.
+
+        The lookup and the addition happen at once for the threads sharing the
+        index and, through the file lock, for the processes sharing `filename`,
+        which the reservation is saved to; `release` takes it back.
+
+        Parameters
+        ----------
+        key : str
+            The identifier stored with the fingerprint, e.g. the audio path.
+        fingerprint : Fingerprint
+            The fingerprint to look up and reserve.
+
+        Returns
+        -------
+        str or None
+            The key of the closest duplicate, or None if the fingerprint was
+            reserved under `key`.
+        """
+        with self._file_lock(), self._lock:
+            self._merge()
+            duplicate = self._closest(fingerprint)
+            if duplicate is None:
+                self._append(key, fingerprint)
+                if self.filename:
+                    self._write()
+        return duplicate
+
+    def release(self, key: str) -> None:
+        """Remove the fingerprint of a key, e.g. a reservation that was not used.
+
+        Parameters
+        ----------
+        key : str
+            The identifier stored with the fingerprint.
+        """
+        with self._file_lock(), self._lock:
+            self._merge()
+            if key not in self.keys:
+                return
+            index = self.keys.index(key)
+            del self.keys[index], self._rows[index], self._durations[index]
+            self._unsaved.pop(key, None)
+            self._matrix = None
+            if self.filename:
+                self._write()
+        return
+
+    def save(self) -> None:
+        """Save the index to `filename`, keeping entries saved by other processes."""
+        if not self.filename:
+            return
+
+        with self._file_lock(), self._lock:
+            self._merge()
+            self._write()
+        return
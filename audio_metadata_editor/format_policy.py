@@ -0,0 +1,161 @@
+# @title Audio format and bitrate selection policy class { display-mode: "form" }
+import json
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Union
+
+# output container used for each downloaded mime type when none is configured
+DEFAULT_CONTAINERS: dict[str, str] = {
+    "audio/mp4": "m4a",
+    "audio/webm": "opus",
+}
+
+
+@dataclass
+class FormatPolicy:
+    """Policy choosing which YouTube audio stream to download and how to store it.
+
+    Attributes
+    ----------
+    mime_types : tuple[str, ...]
+        Accepted stream mime types in order of preference, by default ("audio/mp4",).
+    target_abr : int, optional
+        Target average bitrate in kbps; the smallest stream at or above it is
+        chosen, or the largest one below it if none reaches it, by default None.
+    prefer : str
+        Which stream to choose without a `target_abr`, "highest" or "lowest"
+        bitrate, by default "highest".
+    container : str, optional
+        Output file extension, e.g. "m4a", "opus" or "ogg". By default the
+        container matching the stream mime type in `DEFAULT_CONTAINERS`.
+    codec : str, optional
+        ffmpeg audio codec for the output, "copy" to stream-copy without
+        re-encoding. By default ffmpeg's default codec for the container.
+    """
+
+    mime_types: tuple[str, ...] = ("audio/mp4",)
+    target_abr: Optional[int] = None
+    prefer: str = "highest"
+    container: Optional[str] = None
+    codec: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.prefer not in ("highest", "lowest"):
+            raise ValueError(
+                f"prefer must be 'highest' or 'lowest', not {self.prefer!r}"
+            )
+
+    @classmethod
+    def mobile(cls, target_abr: int = 64) -> "FormatPolicy":
+        """Policy for the mobile tier: the smallest opus stream above `target_abr`
+        stream-copied into an .opus file, falling back to AAC in .m4a.
+
+        Parameters
+        ----------
+        target_abr : int, optional
+            Target average bitrate in kbps, by default 64.
+
+        Returns
+        -------
+        FormatPolicy
+            The mobile policy.
+        """
+        return cls(
+            mime_types=("audio/webm", "audio/mp4"),
+            target_abr=target_abr,
+            codec="copy",
+        )
+
+    @classmethod
+    def from_option(cls, value: Union[None, str, dict[str, Any]]) -> "FormatPolicy":
+        """Build a policy from a job or command-line option.
+
+        Parameters
+        ----------
+        value : None, str or dict[str, Any]
+            None or "default" for the default policy, "mobile" for `mobile`, or
+            the policy fields as a dict or JSON object string, e.g.
+            '{"codec": "copy"}'.
+
+        Returns
+        -------
+        FormatPolicy
+            The policy.
+        """
+        if value is None or value == "default":
+            return cls()
+        if value == "mobile":
+            return cls.mobile()
+        if isinstance(value, str) and value.lstrip().startswith("{"):
+            value = json.loads(value)
+        if not isinstance(value, dict):
+            raise ValueError(f"unknown format policy {value!r}")
+        if "mime_types" in value:
+            value = {**value, "mime_types": tuple(value["mime_types"])}
+        return cls(**value)
+
+    @staticmethod
+    def _abr(stream: Any) -> int:
+        """Parse the average bitrate of a stream, e.g. "160kbps", in kbps."""
+        try:
+            return int(str(stream.abr).rstrip("kbps"))
+        except ValueError:
+            return 0
+
+    def select(self, streams: Iterable[Any]) -> Optional[Any]:
+        """Select the stream to download.
+
+        Parameters
+        ----------
+        streams : Iterable[pytube.Stream]
+            The streams available for a video, e.g. `YouTube.streams`.
+
+        Returns
+        -------
+        pytube.Stream or None
+            The selected audio stream, or None if no stream is accepted.
+        """
+        audio_streams = [stream for stream in streams if stream.type == "audio"]
+
+        for mime_type in self.mime_types:
+            candidates = sorted(
+                (stream for stream in audio_streams if stream.mime_type == mime_type),
+                key=self._abr,
+            )
+            if not candidates:
+                continue
+
+            if self.target_abr is not None:
+                above = [s for s in candidates if self._abr(s) >= self.target_abr]
+                return above[0] if above else candidates[-1]
+
+            return candidates[-1] if self.prefer == "highest" else candidates[0]
+
+        return
+
+    def extension(self, stream: Any) -> str:
+        """Return the output file extension for a stream.
+
+        Parameters
+        ----------
+        stream : pytube.Stream
+            The selected stream.
+
+        Returns
+        -------
+        str
+            The output file extension including the leading dot.
+        """
+        return "." + (self.container or DEFAULT_CONTAINERS.get(stream.mime_type, "m4a"))
+
+    def output_options(self) -> dict[str, Any]:
+        """Return the ffmpeg output options for the policy.
+
+        Returns
+        -------
+        dict[str, Any]
+            Keyword arguments for `ffmpeg.output`.
+        """
+        if self.codec is None:
+            return {}
+        # drop any video/cover stream so a stream copy only has to fit the audio
+        return {"acodec": self.codec, "vn": None}
@@ -0,0 +1,323 @@
+# @title Per-stage timing instrumentation class { display-mode: "form" }
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, replace
+from typing import IO, Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+RESERVOIR_SIZE: int = 1024  # durations sampled per stage for the percentiles
+
+
+@dataclass
+class Span:
+    """A timed pipeline stage.
+
+    Attributes
+    ----------
+    stage : str
+        The stage name, e.g. "download" or "spotify.search".
+    start : float
+        The wall-clock start time as a UNIX timestamp.
+    duration : float
+        The duration of the stage in seconds.
+    attributes : dict[str, Any]
+        Extra values recorded by the stage, e.g. "bytes" or "error".
+    """
+
+    stage: str
+    start: float
+    duration: float
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+class Hook:
+    """Interface receiving every finished span of an `Instrumentation`."""
+
+    def emit(self, span: Span) -> None:
+        """Handle a finished span.
+
+        Parameters
+        ----------
+        span : Span
+            The finished span.
+        """
+        return
+
+    def close(self) -> None:
+        """Flush and release anything held by the hook."""
+        return
+
+
+@dataclass
+class LoggingHook(Hook):
+    """Hook logging every span through the `logging` module.
+
+    Attributes
+    ----------
+    level : int
+        The logging level of the span records, by default logging.DEBUG.
+    """
+
+    level: int = logging.DEBUG
+
+    def emit(self, span: Span) -> None:
+        logger.log(
+            self.level,
+            "%s took %.3fs %s",
+            span.stage,
+            span.duration,
+            span.attributes or "",
+        )
+        return
+
+
+@dataclass
+class JsonLinesHook(Hook):
+    """Hook writing every span as one JSON object per line.
+
+    Attributes
+    ----------
+    stream : IO[str]
+        The text stream the JSON lines are written to.
+    """
+
+    stream: IO[str]
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        line = json.dumps(asdict(span), default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+        return
+
+    def close(self) -> None:
+        self.stream.flush()
+        return
+
+
+@dataclass
+class PrometheusHook(Hook):
+    """Hook exporting per-stage counters in the Prometheus text format.
+
+    The metrics file is rewritten on `close`, ready for the node_exporter
+    textfile collector.
+
+    Attributes
+    ----------
+    filename : str
+        The `.prom` file the metrics are written to.
+    prefix : str
+        The metric name prefix, by default "ytad".
+    """
+
+    filename: str
+    prefix: str = "ytad"
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._count: dict[str, int] = defaultdict(int)
+        self._seconds: dict[str, float] = defaultdict(float)
+
+    def emit(self, span: Span) -> None:
+        with self._lock:
+            self._count[span.stage] += 1
+            self._seconds[span.stage] += span.duration
+        return
+
+    def render(self) -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            The rendered metrics.
+        """
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# TYPE {name} summary"]
+        with self._lock:
+            for stage in sorted(self._count):
+                lines.append(f'{name}_sum{{stage="{stage}"}} {self._seconds[stage]}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {self._count[stage]}')
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        with open(self.filename, "w", encoding="utf-8") as promfile:
+            promfile.write(self.render())
+        return
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Return the `q` percentile of sorted values, interpolating linearly."""
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+@dataclass
+class _Stage:
+    """Running statistics of one stage, in memory independent of its span count.
+
+    The count, total and max are exact; the percentiles are estimated from a
+    uniform sample of at most `RESERVOIR_SIZE` durations (reservoir sampling).
+    """
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    bytes: int = 0
+    samples: list[float] = field(default_factory=list)
+
+    def add(self, duration: float, bytes_: int, rng: random.Random) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.bytes += bytes_
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(duration)
+        else:
+            index = rng.randrange(self.count)
+            if index < RESERVOIR_SIZE:
+                self.samples[index] = duration
+        return
+
+
+@dataclass
+class Instrumentation:
+    """Collects timing spans of the pipeline stages and reports on them.
+
+    Memory stays bounded in long-running processes: every stage keeps exact
+    counts and totals and a fixed-size sample of durations for the percentiles.
+
+    Attributes
+    ----------
+    hooks : list[Hook]
+        The hooks every finished span is emitted to, by default none.
+    """
+
+    hooks: list[Hook] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stages: dict[str, _Stage] = defaultdict(_Stage)
+        self._rng = random.Random()
+
+    @contextmanager
+    def span(self, stage: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+        """Time the enclosed block as one span of `stage`.
+
+        Parameters
+        ----------
+        stage : str
+            The stage name.
+        attributes : Any
+            Extra values recorded with the span.
+
+        Yields
+        ------
+        dict[str, Any]
+            The span attributes, which the block may extend, e.g. with "bytes".
+        """
+        start, counter = time.time(), time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as error:
+            attributes["error"] = type(error).__name__
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - counter, start, **attributes)
+
+    def record(
+        self,
+        stage: str,
+        duration: float,
+        start: Optional[float] = None,
+        **attributes: Any,
+    ) -> None:
+        """Record a span timed elsewhere.
+
+        Parameters
+        ----------
+        stage : str
+            The stage name.
+        duration : float
+            The duration of the stage in seconds.
+        start : float, optional
+            The wall-clock start time, by default `duration` seconds ago.
+        attributes : Any
+            Extra values recorded with the span; a "bytes" value also records the
+            throughput as "bytes_per_second".
+        """
+        if start is None:
+            start = time.time() - duration
+        if "bytes" in attributes and duration > 0:
+            attributes["bytes_per_second"] = attributes["bytes"] / duration
+        span = Span(stage=stage, start=start, duration=duration, attributes=attributes)
+
+        with self._lock:
+            self._stages[stage].add(duration, attributes.get("bytes", 0), self._rng)
+        for hook in self.hooks:
+            hook.emit(span)
+        return
+
+    def report(self) -> dict[str, dict[str, float]]:
+        """Summarise the recorded spans per stage.
+
+        Returns
+        -------
+        dict[str, dict[str, float]]
+            The count, total, p50, p95 and max duration in seconds of every stage,
+            and the bytes per second of stages recording "bytes"; the p50 and p95
+            are estimated from a sample once a stage has more than
+            `RESERVOIR_SIZE` spans.
+        """
+        with self._lock:
+            stages = {
+                stage: replace(stats, samples=sorted(stats.samples))
+                for stage, stats in self._stages.items()
+            }
+
+        report = {}
+        for stage, stats in stages.items():
+            report[stage] = {
+                "count": stats.count,
+                "total": stats.total,
+                "p50": _percentile(stats.samples, 50),
+                "p95": _percentile(stats.samples, 95),
+                "max": stats.max,
+            }
+            if stats.bytes and stats.total > 0:
+                report[stage]["bytes_per_second"] = stats.bytes / stats.total
+        return report
+
+    def summary(self) -> str:
+        """Format the per-stage report as a table.
+
+        Returns
+        -------
+        str
+            The formatted report.
+        """
+        lines = [
+            f"{'stage':<16} {'count':>6} {'total':>9} {'p50':>8} {'p95':>8} {'max':>8}"
+        ]
+        for stage, stats in self.report().items():
+            lines.append(
+                f"{stage:<16} {stats['count']:>6} {stats['total']:>8.3f}s "
+                f"{stats['p50']:>7.3f}s {stats['p95']:>7.3f}s {stats['max']:>7.3f}s"
+            )
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        """Close every hook."""
+        for hook in self.hooks:
+            hook.close()
+        return
@@ -0,0 +1,403 @@
+# @title SQLite-backed job queue class { display-mode: "form" }
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+
+_SCHEMA: str = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, not_before, id);
+CREATE INDEX IF NOT EXISTS jobs_url ON jobs (url);
+CREATE TABLE IF NOT EXISTS workers (
+    owner TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+STATUSES: tuple[str, ...] = ("queued", "running", "done", "failed")
+BATCH_SIZE: int = 500  # job IDs per query, below SQLite's variable limit
+
+
+@dataclass
+class Job:
+    """A queued video to process.
+
+    Attributes
+    ----------
+    id : int
+        The job ID.
+    url : str
+        URL of the YouTube video.
+    options : dict[str, Any]
+        Per-job options, e.g. {"output_dir": "music", "metadata": False}.
+    status : str
+        "queued", "running", "done" or "failed".
+    attempts : int
+        Number of times the job was claimed.
+    owner : str, optional
+        The worker the job is leased to while running.
+    result : dict[str, Any], optional
+        The result of the last attempt.
+    error : str, optional
+        The error of the last failed attempt.
+    """
+
+    id: int
+    url: str
+    options: dict[str, Any] = field(default_factory=dict)
+    status: str = "queued"
+    attempts: int = 0
+    owner: Optional[str] = None
+    result: Optional[dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            url=row["url"],
+            options=json.loads(row["options"]),
+            status=row["status"],
+            attempts=row["attempts"],
+            owner=row["owner"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+        )
+
+
+@dataclass
+class JobQueue:
+    """Persistent job queue in a SQLite database.
+
+    Claimed jobs are leased to a worker; a job whose lease expires, e.g. because
+    its worker died, is claimable again. Processes on one host, or on hosts
+    sharing the database file, coordinate through the queue: each job is claimed
+    by one worker at a time, and live workers renew their leases with `heartbeat`.
+
+    Attributes
+    ----------
+    filename : str
+        The SQLite database file, by default "jobs.db".
+    lease : float
+        Seconds a claimed job is leased to its worker, by default 900.0.
+    """
+
+    filename: str = "jobs.db"
+    lease: float = 900.0
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        if os.path.dirname(self.filename):
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        self._connection = sqlite3.connect(
+            self.filename, timeout=30.0, isolation_level=None, check_same_thread=False
+        )
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the block in an immediate transaction, serialising writers."""
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def submit(self, url: str, **options: Any) -> int:
+        """Queue a video.
+
+        Parameters
+        ----------
+        url : str
+            URL of the YouTube video.
+        options : Any
+            Per-job options, stored as JSON.
+
+        Returns
+        -------
+        int
+            The job ID.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT INTO jobs (url, options, created, updated) VALUES (?, ?, ?, ?)",
+                (url, json.dumps(options), now, now),
+            )
+        return int(cursor.lastrowid)
+
+    def submit_many(self, urls: Iterable[str], **options: Any) -> dict[str, int]:
+        """Queue the videos not queued yet, in one transaction.
+
+        Videos with a queued, running or done job are not queued again, so every
+        host sharing the database can submit the same list.
+
+        Parameters
+        ----------
+        urls : Iterable[str]
+            URLs of the YouTube videos.
+        options : Any
+            Per-job options, stored as JSON.
+
+        Returns
+        -------
+        dict[str, int]
+            The job ID of every video, new or, for skipped videos, existing, in
+            submission order.
+        """
+        now, ids = time.time(), {}
+        with self._transaction() as db:
+            for url in urls:
+                if url in ids:
+                    continue
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE url = ? AND status != 'failed'"
+                    " ORDER BY id DESC LIMIT 1",
+                    (url,),
+                ).fetchone()
+                if row is None:
+                    cursor = db.execute(
+                        "INSERT INTO jobs (url, options, created, updated)"
+                        " VALUES (?, ?, ?, ?)",
+                        (url, json.dumps(options), now, now),
+                    )
+                    row = (cursor.lastrowid,)
+                ids[url] = int(row[0])
+        return ids
+
+    def claim(self, owner: str, max_attempts: Optional[int] = None) -> Optional[Job]:
+        """Lease the oldest ready job to `owner`.
+
+        Parameters
+        ----------
+        owner : str
+            The claiming worker.
+        max_attempts : int, optional
+            Attempts after which a job whose lease expired, e.g. because it
+            crashed its worker, fails for good instead of being claimed again,
+            by default None, which reclaims it forever.
+
+        Returns
+        -------
+        Job or None
+            The claimed job, or None if no job is ready.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            if max_attempts is not None:
+                db.execute(
+                    "UPDATE jobs SET status = 'failed', owner = NULL,"
+                    " lease_expires = NULL, updated = ?,"
+                    " error = 'Lease expired after ' || attempts || ' attempts'"
+                    " WHERE status = 'running' AND lease_expires < ?"
+                    " AND attempts >= ?",
+                    (now, now, max_attempts),
+                )
+            row = db.execute(
+                "SELECT * FROM jobs WHERE (status = 'queued' AND not_before <= ?)"
+                " OR (status = 'running' AND lease_expires < ?)"
+                " ORDER BY not_before, id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1,"
+                " owner = ?, lease_expires = ?, updated = ? WHERE id = ?",
+                (owner, now + self.lease, now, row["id"]),
+            )
+        job = Job.from_row(row)
+        job.status, job.attempts, job.owner = "running", job.attempts + 1, owner
+        return job
+
+    def complete(self, job: Job, result: dict[str, Any]) -> bool:
+        """Mark a claimed job done.
+
+        Parameters
+        ----------
+        job : Job
+            The claimed job.
+        result : dict[str, Any]
+            The result, stored as JSON.
+
+        Returns
+        -------
+        bool
+            False if the job's lease was lost, e.g. it expired and another
+            worker claimed the job, in which case nothing is recorded.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL,"
+                " owner = NULL, lease_expires = NULL, updated = ?"
+                " WHERE id = ? AND owner = ? AND status = 'running'",
+                (json.dumps(result, default=str), time.time(), job.id, job.owner),
+            )
+        return cursor.rowcount == 1
+
+    def fail(
+        self,
+        job: Job,
+        error: str,
+        result: Optional[dict[str, Any]] = None,
+        retry_in: Optional[float] = None,
+    ) -> bool:
+        """Record a failed attempt of a claimed job.
+
+        Parameters
+        ----------
+        job : Job
+            The claimed job.
+        error : str
+            The error of the attempt.
+        result : dict[str, Any], optional
+            The result of the attempt, by default None.
+        retry_in : float, optional
+            Seconds until the job is claimable again, by default None, which
+            fails the job for good.
+
+        Returns
+        -------
+        bool
+            False if the job's lease was lost, e.g. it expired and another
+            worker claimed the job, in which case nothing is recorded.
+        """
+        status = "failed" if retry_in is None else "queued"
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, not_before = ?,"
+                " owner = NULL, lease_expires = NULL, updated = ?"
+                " WHERE id = ? AND owner = ? AND status = 'running'",
+                (
+                    status,
+                    error,
+                    json.dumps(result, default=str) if result else None,
+                    now + (retry_in or 0.0),
+                    now,
+                    job.id,
+                    job.owner,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def heartbeat(self, owner: str) -> int:
+        """Renew the leases of a live worker's running jobs.
+
+        Parameters
+        ----------
+        owner : str
+            The worker.
+
+        Returns
+        -------
+        int
+            The number of live workers, those with a heartbeat within `lease`.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE status = 'running' AND owner = ?",
+                (now + self.lease, owner),
+            )
+            db.execute(
+                "INSERT INTO workers (owner, heartbeat) VALUES (?, ?)"
+                " ON CONFLICT (owner) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (owner, now),
+            )
+            db.execute("DELETE FROM workers WHERE heartbeat < ?", (now - self.lease,))
+            (live,) = db.execute("SELECT COUNT(*) FROM workers").fetchone()
+        return int(live)
+
+    def leave(self, owner: str) -> None:
+        """Remove a stopped worker from the live workers."""
+        with self._transaction() as db:
+            db.execute("DELETE FROM workers WHERE owner = ?", (owner,))
+        return
+
+    def drained(self) -> bool:
+        """Return whether no job is queued or running, in any process."""
+        counts = self.counts()
+        return counts["queued"] == 0 and counts["running"] == 0
+
+    def jobs(
+        self, status: Optional[str] = None, ids: Optional[Iterable[int]] = None
+    ) -> list[Job]:
+        """Return the jobs in submission order.
+
+        Parameters
+        ----------
+        status : str, optional
+            The status of the returned jobs, by default any.
+        ids : Iterable[int], optional
+            The IDs of the returned jobs, looked up by primary key instead of
+            reading the whole queue, by default any.
+
+        Returns
+        -------
+        list[Job]
+            The jobs.
+        """
+        query = "SELECT * FROM jobs WHERE (? IS NULL OR status = ?)"
+        if ids is None:
+            batches = [[]]
+        else:
+            ids = sorted(ids)
+            batches = [
+                ids[start : start + BATCH_SIZE]
+                for start in range(0, len(ids), BATCH_SIZE)
+            ]
+        rows = []
+        with self._lock:
+            for batch in batches:
+                where = f" AND id IN ({', '.join('?' * len(batch))})" if batch else ""
+                rows += self._connection.execute(
+                    f"{query}{where} ORDER BY id", (status, status, *batch)
+                ).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def get(self, job_id: int) -> Optional[Job]:
+        """Return a job by ID, or None if it does not exist."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of jobs per status."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+        return
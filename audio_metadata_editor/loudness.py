@@ -0,0 +1,100 @@
+# @title Loudness analysis and ReplayGain class { display-mode: "form" }
+import math
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+REFERENCE_LOUDNESS: float = -18.0  # LUFS, ReplayGain 2.0 reference level
+
+_SUMMARY = re.compile(
+    r"Integrated loudness:\s+I:\s+(?P<integrated>-?[\d.]+|-inf) LUFS"
+    r"(?:.*?Loudness range:\s+LRA:\s+(?P<lra>[\d.]+) LU)?"
+    r"(?:.*?True peak:\s+Peak:\s+(?P<true_peak>-?[\d.]+|-inf) dBFS)?",
+    re.DOTALL,
+)
+
+
+@dataclass
+class Loudness:
+    """EBU R128 loudness of an audio file.
+
+    Attributes
+    ----------
+    integrated : float
+        The integrated loudness in LUFS.
+    true_peak : float
+        The true peak in dBFS.
+    loudness_range : float, optional
+        The loudness range in LU.
+    """
+
+    integrated: float
+    true_peak: float
+    loudness_range: Optional[float] = None
+
+    @classmethod
+    def from_ebur128(cls, log: str) -> Optional["Loudness"]:
+        """Parse the summary printed by ffmpeg's `ebur128` filter.
+
+        Parameters
+        ----------
+        log : str
+            The ffmpeg stderr output containing the `ebur128` summary.
+
+        Returns
+        -------
+        Loudness or None
+            The parsed loudness, or None if the log has no summary.
+        """
+        summary = log.rpartition("Summary:")[2]
+        match = _SUMMARY.search(summary)
+        if not match:
+            return
+
+        return cls(
+            integrated=float(match["integrated"]),
+            true_peak=float(match["true_peak"] or "-inf"),
+            loudness_range=float(match["lra"]) if match["lra"] else None,
+        )
+
+    @property
+    def gain(self) -> float:
+        """The ReplayGain track gain in dB."""
+        if math.isinf(self.integrated):
+            return 0.0
+        return REFERENCE_LOUDNESS - self.integrated
+
+    @property
+    def peak(self) -> float:
+        """The true peak as a linear amplitude relative to full scale."""
+        return 10 ** (self.true_peak / 20)
+
+    @property
+    def itunnorm(self) -> str:
+        """The iTunes Sound Check (`iTunNORM`) value for the track gain."""
+        ratio = 10 ** (-self.gain / 10)
+        milliwatt = min(round(1000 * ratio), 65534)
+        two_and_a_half_milliwatt = min(round(2500 * ratio), 65534)
+        peak = min(round(self.peak * 32768), 32768)
+        values = (
+            *(milliwatt, milliwatt),
+            *(two_and_a_half_milliwatt, two_and_a_half_milliwatt),
+            *(0, 0),
+            *(peak, peak),
+            *(0, 0),
+        )
+        return "".join(f" {value:08X}" for value in values)
+
+    def tags(self) -> dict[str, str]:
+        """Return the loudness as `Metadata` field values.
+
+        Returns
+        -------
+        dict[str, str]
+            The ReplayGain and iTunNORM values keyed by `Metadata` field name.
+        """
+        return {
+            "replaygain_track_gain": f"{self.gain:+.2f} dB",
+            "replaygain_track_peak": f"{self.peak:.6f}",
+            "itunnorm": self.itunnorm,
+        }
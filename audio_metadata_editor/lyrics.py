@@ -0,0 +1,246 @@
+# @title Lyrics providers and cache classes { display-mode: "form" }
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+from .cache import LRUCache
+
+if TYPE_CHECKING:
+    from requests import Session
+
+logger = logging.getLogger(__name__)
+
+# "[01:23.45]" line timestamps and "[ar: Artist]" header tags of LRC files
+_LRC_TAG = re.compile(r"\[(?:\d+:\d+(?:[.:]\d+)?|[a-z#]+:[^\]]*)\]", re.IGNORECASE)
+
+
+def strip_lrc(lrc: str) -> str:
+    """Convert synced LRC lyrics to plain text lyrics.
+
+    Parameters
+    ----------
+    lrc : str
+        The LRC lyrics.
+
+    Returns
+    -------
+    str
+        The lyrics without timestamps and header tags.
+    """
+    lines = []
+    for line in lrc.splitlines():
+        text = _LRC_TAG.sub("", line).strip()
+        if text or (line.strip() == "" and lines and lines[-1]):
+            lines.append(text)
+    return "\n".join(lines).strip()
+
+
+@dataclass
+class LyricsQuery:
+    """The track lyrics are looked up for.
+
+    Attributes
+    ----------
+    title : str
+        The track title.
+    artist : str
+        The track artists.
+    album : str, optional
+        The album name, by default None.
+    duration : float, optional
+        The track length in seconds, by default None.
+    isrc : str, optional
+        The International Standard Recording Code, by default None.
+    track_id : str, optional
+        The Spotify track ID, by default None.
+    """
+
+    title: str
+    artist: str
+    album: Optional[str] = None
+    duration: Optional[float] = None
+    isrc: Optional[str] = None
+    track_id: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """The cache key: the ISRC, else the track ID, else artist and title."""
+        return self.isrc or self.track_id or f"{self.artist}\n{self.title}".lower()
+
+
+class LyricsProvider(ABC):
+    """Interface of a lyrics source."""
+
+    @abstractmethod
+    def fetch(self, query: LyricsQuery) -> Optional[str]:
+        """Look up the lyrics of a track.
+
+        Parameters
+        ----------
+        query : LyricsQuery
+            The track.
+
+        Returns
+        -------
+        str or None
+            The plain text lyrics, or None if the provider has none.
+        """
+
+
+@dataclass
+class LocalLyricsProvider(LyricsProvider):
+    """Provider reading `.lrc` and `.txt` files from a directory, for offline use.
+
+    A track's file is named after its ISRC, its Spotify track ID or
+    "<artist> - <title>", e.g. "CAI370611475.lrc" or "Hasting - Fighting For You.txt".
+
+    Attributes
+    ----------
+    directory : str
+        The directory the lyrics files are in.
+    extensions : tuple[str, ...]
+        The accepted extensions in order of preference, by default (".lrc", ".txt").
+    """
+
+    directory: str
+    extensions: tuple[str, ...] = (".lrc", ".txt")
+
+    def fetch(self, query: LyricsQuery) -> Optional[str]:
+        names = [query.isrc, query.track_id, f"{query.artist} - {query.title}"]
+        for name in filter(None, names):
+            name = re.sub(r'[\\/:*?"<>|]', "_", name)
+            for ext in self.extensions:
+                filename = os.path.join(self.directory, name + ext)
+                if not os.path.exists(filename):
+                    continue
+                with open(filename, encoding="utf-8-sig") as file:
+                    lyrics = file.read()
+                return strip_lrc(lyrics) if ext == ".lrc" else lyrics.strip()
+        return
+
+
+def _session() -> "Session":
+    """Create the default HTTP session, importing requests on first use."""
+    from requests import Session
+
+    return Session()
+
+
+@dataclass
+class HTTPLyricsProvider(LyricsProvider):
+    """Provider querying a lyrics web API.
+
+    By default the endpoint is queried like the LRCLIB `/api/get` endpoint, with
+    track_name, artist_name, album_name and duration parameters, and answers
+    JSON with "plainLyrics" or "syncedLyrics". Other APIs override `params` and
+    `parse`.
+
+    Attributes
+    ----------
+    endpoint : str
+        The URL queried for every track.
+    session : requests.Session
+        The HTTP session the requests are sent through.
+    timeout : float
+        Seconds before a request is given up, by default 5.0.
+    """
+
+    endpoint: str
+    session: "Session" = field(default_factory=_session)
+    timeout: float = 5.0
+
+    def params(self, query: LyricsQuery) -> dict[str, Any]:
+        """Return the query parameters of a track's request."""
+        params = {"track_name": query.title, "artist_name": query.artist}
+        if query.album:
+            params["album_name"] = query.album
+        if query.duration:
+            params["duration"] = round(query.duration)
+        return params
+
+    def parse(self, data: Any) -> Optional[str]:
+        """Return the plain text lyrics of a decoded JSON response."""
+        if data.get("plainLyrics"):
+            return data["plainLyrics"].strip()
+        if data.get("syncedLyrics"):
+            return strip_lrc(data["syncedLyrics"])
+        return
+
+    def fetch(self, query: LyricsQuery) -> Optional[str]:
+        res = self.session.get(
+            self.endpoint, params=self.params(query), timeout=self.timeout
+        )
+        if res.status_code == 404:
+            return
+        res.raise_for_status()
+        return self.parse(res.json())
+
+
+class _Unavailable(Exception):
+    """No provider had the lyrics and at least one of them failed."""
+
+
+@dataclass
+class Lyrics:
+    """Lyrics lookup trying providers in order, with an LRU cache per track.
+
+    Misses are cached too, unless a provider failed, and concurrent lookups of the
+    same track share one fetch, so repeated tracks never query the providers again.
+
+    Attributes
+    ----------
+    providers : list[LyricsProvider]
+        The providers tried in order until one has the lyrics.
+    maxsize : int
+        The number of tracks cached before the least recently used is evicted,
+        by default 1024.
+    """
+
+    providers: list[LyricsProvider] = field(default_factory=list)
+    maxsize: int = 1024
+
+    def __post_init__(self) -> None:
+        self._cache = LRUCache(self.maxsize)
+
+    def _fetch(self, query: LyricsQuery) -> Optional[str]:
+        """Return the lyrics of the first provider that has them; a miss after a
+        provider error raises `_Unavailable`, so it is not cached."""
+        failed = False
+        for provider in self.providers:
+            try:
+                lyrics = provider.fetch(query)
+            except Exception as error:
+                logger.warning(
+                    "%s failed for %s: %s", type(provider).__name__, query.key, error
+                )
+                failed = True
+                continue
+            if lyrics:
+                return lyrics
+        if failed:
+            raise _Unavailable(query.key)
+        return
+
+    def get(self, query: LyricsQuery) -> Optional[str]:
+        """Look up the lyrics of a track.
+
+        Parameters
+        ----------
+        query : LyricsQuery
+            The track.
+
+        Returns
+        -------
+        str or None
+            The plain text lyrics, or None if no provider has them.
+        """
+        try:
+            return self._cache.get(query.key, lambda: self._fetch(query))
+        except _Unavailable:
+            return
+
+    def __len__(self) -> int:
+        return len(self._cache)
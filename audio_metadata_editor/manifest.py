@@ -0,0 +1,81 @@
+# @title Download manifest class { display-mode: "form" }
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional
+
+
+@dataclass
+class DownloadManifest:
+    """Append-only JSON lines log of the published audio files.
+
+    Every entry records where a video was published and the SHA-256 of the
+    stream downloaded for it, hashed while it was written. The published file is
+    tagged after that and is not hashed, so no file is read a second time.
+
+    Attributes
+    ----------
+    filename : str
+        The JSON lines file the entries are appended to, by default
+        "manifest.jsonl".
+    """
+
+    filename: str = "manifest.jsonl"
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+
+    def record(self, path: str, **entry: Any) -> dict[str, Any]:
+        """Append the entry of a published audio file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the audio file.
+        **entry : Any
+            The JSON serializable fields of the entry, e.g. "video_url",
+            "source_sha256", "bytes" and "duration".
+
+        Returns
+        -------
+        dict[str, Any]
+            The appended entry.
+        """
+        entry = {
+            "path": path,
+            **entry,
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock, open(self.filename, "a", encoding="utf-8") as file:
+            file.write(line)
+        return entry
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def find(self, path: str) -> Optional[dict[str, Any]]:
+        """Return the latest entry of an audio file.
+
+        Parameters
+        ----------
+        path : str
+            The path of the audio file.
+
+        Returns
+        -------
+        dict[str, Any] or None
+            The entry, or None if the file was never recorded.
+        """
+        found = None
+        for entry in self:
+            if entry["path"] == path:
+                found = entry
+        return found
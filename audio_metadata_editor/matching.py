@@ -0,0 +1,243 @@
+# @title Fuzzy title normalization and matching functions { display-mode: "form" }
+import re
+import unicodedata
+from typing import Optional, Sequence
+
+import numpy as np
+
+NGRAM: int = 3  # characters per n-gram
+DIMENSIONS: int = 2048  # hashed n-gram buckets per vector
+BLOCK_SIZE: int = 4096  # candidates vectorized at a time, bounding peak memory
+VERSION_PENALTY: float = 0.15  # score lost per version token only one side has
+TITLE_THRESHOLD: float = 0.5  # lowest score of a title picked among unrelated ones
+
+# tokens telling recordings of one song apart, e.g. "Song (Acoustic Version)"
+VERSION_TOKENS = frozenset(
+    (
+        "acoustic",
+        "cover",
+        "demo",
+        "edit",
+        "instrumental",
+        "karaoke",
+        "live",
+        "piano",
+        "remaster",
+        "remastered",
+        "remix",
+        "slowed",
+        "sped",
+    )
+)
+_FEATURE = re.compile(r"\b(?:feat|ft|featuring)\b\.?", re.IGNORECASE)
+_BRACKETS = re.compile(r"[(\[{]([^)\]}]*)[)\]}]")
+_CHANNEL_SUFFIX = re.compile(r"(?:\s*-\s*topic|vevo|official)$", re.IGNORECASE)
+_WEIGHTS = np.array([1_000_003**2, 1_000_003, 1], dtype=np.uint64)[-NGRAM:]
+
+
+def _keep_versions(match: "re.Match[str]") -> str:
+    """Keep bracketed version details, drop noise like "(Official Video)"."""
+    words = match.group(1)
+    return f" {words} " if VERSION_TOKENS & set(normalize(words).split()) else " "
+
+
+def normalize(text: str) -> str:
+    """Fold a title or artist into lowercase ASCII-like words for matching.
+
+    Accents are removed, "ft." and "featuring" become "feat", bracketed details
+    are dropped unless they name a version (e.g. "remix" or "live") and
+    punctuation is replaced by spaces.
+
+    Parameters
+    ----------
+    text : str
+        The title or artist.
+
+    Returns
+    -------
+    str
+        The normalized text, e.g. "Beyoncé - Halo (Official Video)" becomes
+        "beyonce halo".
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _BRACKETS.sub(_keep_versions, text.casefold())
+    text = _FEATURE.sub(" feat ", text.replace("&", " and "))
+    return " ".join(re.sub(r"[^\w]+|_", " ", text).split())
+
+
+def split_features(text: str) -> tuple[str, list[str]]:
+    """Split the featured artists off a title or artist.
+
+    Parameters
+    ----------
+    text : str
+        The title or artist, e.g. "Song (feat. A & B)".
+
+    Returns
+    -------
+    tuple[str, list[str]]
+        The normalized text without the featured artists, and the normalized
+        featured artists, e.g. ("song", ["a", "b"]).
+    """
+    text = _BRACKETS.sub(lambda match: f" {match.group(1)} ", text)
+    main, _, features = normalize(text).partition(" feat ")
+    features = re.split(r"\s*(?:,|\band\b|\bx\b)\s*", features) if features else []
+    return main, [feature.strip() for feature in features if feature.strip()]
+
+
+def version_tokens(text: str) -> frozenset[str]:
+    """Return the `VERSION_TOKENS` of a normalized text."""
+    return VERSION_TOKENS & frozenset(text.split())
+
+
+def parse_video(author: str, title: str) -> tuple[str, str]:
+    """Guess the artist and track title of a YouTube video.
+
+    Parameters
+    ----------
+    author : str
+        The channel, e.g. "HastingVEVO" or "Hasting - Topic".
+    title : str
+        The video title, e.g. "Hasting - Fighting For You (Official Video)".
+
+    Returns
+    -------
+    tuple[str, str]
+        The normalized artist and title.
+    """
+    artist, separator, track = title.partition(" - ")
+    if not separator:
+        artist, track = _CHANNEL_SUFFIX.sub("", author.strip()), title
+    return normalize(artist), normalize(track)
+
+
+def video_query(author: str, title: str) -> str:
+    """Build the text Spotify tracks of a YouTube video are ranked against.
+
+    The artist and title are parsed by `parse_video` and the featured artists
+    moved next to the artist, like the artists of a Spotify track.
+
+    Parameters
+    ----------
+    author : str
+        The channel, e.g. "HastingVEVO".
+    title : str
+        The video title, e.g. "Hasting - Fighting For You ft. Lena".
+
+    Returns
+    -------
+    str
+        The normalized query, e.g. "hasting lena fighting for you".
+    """
+    artist, track = parse_video(author, title)
+    artist, artist_features = split_features(artist)
+    track, track_features = split_features(track)
+    return " ".join(filter(None, (artist, *artist_features, *track_features, track)))
+
+
+def _ngrams(text: str) -> np.ndarray:
+    """Hash the character n-grams of a normalized text into buckets."""
+    if not text:
+        return np.empty(0, dtype=np.uint64)
+    padded = " " * (NGRAM - 1) + text + " "
+    points = np.frombuffer(padded.encode("utf-32-le"), dtype=np.uint32)
+    windows = np.lib.stride_tricks.sliding_window_view(points.astype(np.uint64), NGRAM)
+    return (windows * _WEIGHTS).sum(axis=1) % DIMENSIONS
+
+
+def vectorize(texts: Sequence[str]) -> np.ndarray:
+    """Embed normalized texts as L2-normalized hashed n-gram count vectors.
+
+    Parameters
+    ----------
+    texts : Sequence[str]
+        Normalized texts, see `normalize`.
+
+    Returns
+    -------
+    np.ndarray
+        A (len(texts), DIMENSIONS) float32 array; the vector of an empty text is
+        all zeros.
+    """
+    codes = [_ngrams(text) for text in texts]
+    rows = np.repeat(np.arange(len(codes), dtype=np.uint64), [c.size for c in codes])
+    flat = rows * DIMENSIONS + (np.concatenate(codes) if codes else rows)
+    vectors = np.bincount(flat.astype(np.intp), minlength=len(codes) * DIMENSIONS)
+    vectors = vectors.reshape(len(codes), DIMENSIONS).astype(np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def similarity(queries: Sequence[str], candidates: Sequence[str]) -> np.ndarray:
+    """Compute the n-gram cosine similarity of every query and candidate.
+
+    Parameters
+    ----------
+    queries : Sequence[str]
+        Normalized query texts.
+    candidates : Sequence[str]
+        Normalized candidate texts, vectorized `BLOCK_SIZE` at a time.
+
+    Returns
+    -------
+    np.ndarray
+        A (len(queries), len(candidates)) float32 array of similarities in [0, 1].
+    """
+    query_vectors = vectorize(queries)
+    scores = np.empty((len(queries), len(candidates)), dtype=np.float32)
+    for start in range(0, len(candidates), BLOCK_SIZE):
+        block = vectorize(candidates[start : start + BLOCK_SIZE])
+        scores[:, start : start + BLOCK_SIZE] = query_vectors @ block.T
+    return scores
+
+
+def score(query: str, candidates: Sequence[str]) -> np.ndarray:
+    """Score candidates against a query, penalizing differing versions.
+
+    Parameters
+    ----------
+    query : str
+        The query, e.g. "hasting fighting for you"; normalized here.
+    candidates : Sequence[str]
+        The candidates; normalized here.
+
+    Returns
+    -------
+    np.ndarray
+        A float32 array with one score per candidate, at most 1.
+    """
+    query = normalize(query)
+    candidates = [normalize(candidate) for candidate in candidates]
+    scores = similarity([query], candidates)[0]
+
+    versions = version_tokens(query)
+    penalties = [len(versions ^ version_tokens(text)) for text in candidates]
+    return scores - VERSION_PENALTY * np.asarray(penalties, dtype=np.float32)
+
+
+def best_match(
+    query: str, candidates: Sequence[str], threshold: float = 0.0
+) -> Optional[int]:
+    """Find the candidate matching a query best.
+
+    Parameters
+    ----------
+    query : str
+        The query.
+    candidates : Sequence[str]
+        The candidates.
+    threshold : float, optional
+        The lowest accepted score, by default 0.0.
+
+    Returns
+    -------
+    int or None
+        The index of the best candidate, the first one on ties, or None if no
+        candidate scores above `threshold`.
+    """
+    if not candidates:
+        return
+    scores = score(query, candidates)
+    index = int(np.argmax(scores))
+    return index if scores[index] > threshold else None
@@ -0,0 +1,158 @@
+# @title Memory-bounded download helpers and budget class { display-mode: "form" }
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import IO, TYPE_CHECKING, Callable, Iterator, Optional
+
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+CHUNK_SIZE: int = 1024 * 1024  # bytes held per read, whatever the payload size
+RANGE_SIZE: int = 9 * 1024 * 1024  # bytes per ranged request, as in pytube
+
+# headers pytube sends for its ranged requests
+_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}
+
+
+def write_chunks(
+    res: "Response",
+    file: IO[bytes],
+    chunk_size: int = CHUNK_SIZE,
+    on_chunk: Optional[Callable[[bytes], None]] = None,
+) -> int:
+    """Write the body of a streamed response to a file chunk by chunk.
+
+    Parameters
+    ----------
+    res : requests.Response
+        A response requested with `stream=True`.
+    file : IO[bytes]
+        The binary file the body is written to.
+    chunk_size : int, optional
+        The bytes read at a time, by default `CHUNK_SIZE`.
+    on_chunk : Callable[[bytes], None], optional
+        Called with every written chunk, e.g. to hash it, by default None.
+
+    Returns
+    -------
+    int
+        The number of bytes written.
+    """
+    written = 0
+    for chunk in res.iter_content(chunk_size=chunk_size):
+        file.write(chunk)
+        written += len(chunk)
+        if on_chunk is not None:
+            on_chunk(chunk)
+    return written
+
+
+def download(
+    session: "Session",
+    url: str,
+    filename: str,
+    filesize: int,
+    chunk_size: int = CHUNK_SIZE,
+    on_chunk: Optional[Callable[[bytes], None]] = None,
+    range_size: int = RANGE_SIZE,
+) -> int:
+    """Download a YouTube stream in ranged requests, `chunk_size` bytes at a time.
+
+    Like pytube, every request asks for one `range` of the stream, which avoids
+    the throttling of unranged requests, but the range is streamed to the file
+    instead of being read whole.
+
+    Parameters
+    ----------
+    session : requests.Session
+        The HTTP session the requests are sent through.
+    url : str
+        The stream URL, e.g. `pytube.Stream.url`.
+    filename : str
+        The path the stream is written to.
+    filesize : int
+        The size of the stream in bytes.
+    chunk_size : int, optional
+        The bytes read at a time, by default `CHUNK_SIZE`.
+    on_chunk : Callable[[bytes], None], optional
+        Called with every written chunk, e.g. to hash it, by default None.
+    range_size : int, optional
+        The bytes requested at a time, by default `RANGE_SIZE`.
+
+    Returns
+    -------
+    int
+        The number of bytes downloaded.
+    """
+    separator = "&" if "?" in url else "?"
+    downloaded = 0
+    with open(filename, "wb") as file:
+        while downloaded < filesize:
+            stop = min(downloaded + range_size, filesize) - 1
+            with session.get(
+                f"{url}{separator}range={downloaded}-{stop}",
+                headers=_HEADERS,
+                stream=True,
+            ) as res:
+                res.raise_for_status()
+                written = write_chunks(res, file, chunk_size, on_chunk)
+            if not written:
+                raise IOError(f"stream ended at {downloaded} of {filesize} bytes")
+            downloaded += written
+    return downloaded
+
+
+@dataclass
+class MemoryBudget:
+    """Limit on the estimated bytes in flight across concurrent jobs.
+
+    A job reserves its estimated footprint before it starts and waits while the
+    reservations would exceed `limit`, so a few long mixes take the place of many
+    short tracks. A job larger than the whole budget runs once nothing else is in
+    flight, instead of never. Waiting jobs are admitted in arrival order, so a
+    stream of small jobs cannot starve a large one.
+
+    Attributes
+    ----------
+    limit : int
+        The bytes that may be reserved at once.
+    """
+
+    limit: int
+
+    def __post_init__(self) -> None:
+        self._condition = threading.Condition()
+        self._tickets = itertools.count()
+        self._waiting: deque[int] = deque()
+        self.in_flight: int = 0
+
+    @contextmanager
+    def reserve(self, nbytes: int) -> Iterator[None]:
+        """Reserve `nbytes` for the duration of the block, waiting for room.
+
+        Parameters
+        ----------
+        nbytes : int
+            The estimated bytes the job holds.
+        """
+        with self._condition:
+            ticket = next(self._tickets)
+            self._waiting.append(ticket)
+            try:
+                self._condition.wait_for(
+                    lambda: self._waiting[0] == ticket
+                    and (self.in_flight == 0 or self.in_flight + nbytes <= self.limit)
+                )
+            finally:
+                self._waiting.remove(ticket)
+                # the next waiter may fit alongside, or take over a cancelled turn
+                self._condition.notify_all()
+            self.in_flight += nbytes
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= nbytes
+                self._condition.notify_all()
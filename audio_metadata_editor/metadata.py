@@ -1,11 +1,39 @@
 # @title # Required audio metadata class { display-mode: "form", run: "auto" }
 import os
-from dataclasses import asdict, dataclass, field
+import shutil
+from dataclasses import dataclass, field, fields
 from enum import Enum
-from typing import Any, Optional, Union
+from typing import Any, Iterator, Optional, Union
 
 from mutagen import id3, mp4
 
+from .paths import move_into_place, temporary_path
+
+# bytes kept free after the tags, so later edits such as added lyrics or a larger
+# cover fit in place instead of shifting the audio data
+PADDING: int = 64 * 1024
+# free bytes below which the tags are rewritten with `PADDING` again
+MIN_PADDING: int = 4 * 1024
+
+
+def _reserve_padding(info: Any) -> int:
+    """Mutagen padding strategy reserving `PADDING` bytes once padding runs low.
+
+    Parameters
+    ----------
+    info : mutagen.PaddingInfo
+        The padding left after the new tags; negative if they do not fit.
+
+    Returns
+    -------
+    int
+        The padding to write: the current one while the new tags fit in place
+        and leave at least `MIN_PADDING` bytes free, else `PADDING`.
+    """
+    if info.padding >= MIN_PADDING:
+        return info.padding
+    return PADDING
+
 
 class AudioType(Enum):
     MP3 = "mp3"
@@ -45,7 +73,8 @@ class Metadata:
     Attributes
     ----------
     audio : Optional[mp4.MP4 | id3.ID3]
-        The audio file's metadata object (MP4 or ID3).
+        The audio file's metadata object (MP4 or ID3), kept by `add_to_m4a` and
+        `add_to_mp3` until saved, None once autosaved.
     title : Optional[str]
         The title of the audio.
     album : Optional[str]
@@ -94,13 +123,25 @@ class Metadata:
         The album art of the audio.
     comment : Optional[str]
         The comment of the audio.
+    replaygain_track_gain : Optional[str]
+        The ReplayGain track gain of the audio, e.g. "-7.70 dB".
+    replaygain_track_peak : Optional[str]
+        The ReplayGain track peak of the audio, e.g. "0.988553".
+    itunnorm : Optional[str]
+        The iTunes Sound Check normalization value of the audio.
+    spotify_track_id : Optional[str]
+        The Spotify track ID of the audio, so a re-tag needs no search.
+    isrc : Optional[str]
+        The International Standard Recording Code of the audio.
 
     Methods
     -------
-    add_to_m4a(audio: str, autosave: bool = False) -> None
+    add_to_m4a(audio: str, autosave: bool = False, atomic: bool = False) -> None
         Add the metadata to an M4A audio file.
-    add_to_mp3(audio: str, autosave: bool = False) -> None
+    add_to_mp3(audio: str, autosave: bool = False, atomic: bool = False) -> None
         Add the metadata to an MP3 audio file.
+    read_identifiers(audio: str) -> dict[str, str]
+        Read the Spotify track ID and ISRC tagged in an audio file.
     """
 
     audio: Union[mp4.MP4, id3.ID3, None] = field(default=None)
@@ -128,6 +169,11 @@ class Metadata:
     lyrics: Optional[str] = field(default=None)
     album_art: Union[str, id3.APIC, mp4.MP4Cover, None] = field(default=None)
     comment: Optional[str] = field(default=None)
+    replaygain_track_gain: Optional[str] = field(default=None)
+    replaygain_track_peak: Optional[str] = field(default=None)
+    itunnorm: Optional[str] = field(default=None)
+    spotify_track_id: Optional[str] = field(default=None)
+    isrc: Optional[str] = field(default=None)
 
     @staticmethod
     def _map_metadata(key: str, type: AudioType) -> Any:
@@ -170,6 +216,11 @@ class Metadata:
             "lyrics",
             "album_art",
             "comment",
+            "replaygain_track_gain",
+            "replaygain_track_peak",
+            "itunnorm",
+            "spotify_track_id",
+            "isrc",
         ):
             return
 
@@ -270,9 +321,64 @@ class Metadata:
                 AudioType.MP4: "\xa9cmt",
                 AudioType.MP3: ("COMM", id3.COMM),
             },
+            "replaygain_track_gain": {
+                AudioType.MP4: "----:com.apple.iTunes:replaygain_track_gain",
+                AudioType.MP3: ("TXXX:REPLAYGAIN_TRACK_GAIN", id3.TXXX),
+            },
+            "replaygain_track_peak": {
+                AudioType.MP4: "----:com.apple.iTunes:replaygain_track_peak",
+                AudioType.MP3: ("TXXX:REPLAYGAIN_TRACK_PEAK", id3.TXXX),
+            },
+            "itunnorm": {
+                AudioType.MP4: "----:com.apple.iTunes:iTunNORM",
+                AudioType.MP3: ("COMM:iTunNORM:eng", id3.COMM),
+            },
+            "spotify_track_id": {
+                AudioType.MP4: "----:com.apple.iTunes:SPOTIFY_TRACK_ID",
+                AudioType.MP3: ("TXXX:SPOTIFY_TRACK_ID", id3.TXXX),
+            },
+            "isrc": {
+                AudioType.MP4: "----:com.apple.iTunes:ISRC",
+                AudioType.MP3: ("TSRC", id3.TSRC),
+            },
         }[key][type]
 
-    def add_to_m4a(self, audio: str, autosave: bool = False) -> None:
+    def _items(self) -> Iterator[tuple[str, Any]]:
+        """Yield the field names and values, without the deep copies `asdict` makes
+        of the album art and the loaded tags."""
+        for field_ in fields(self):
+            yield field_.name, getattr(self, field_.name)
+
+    @staticmethod
+    def _save(audio_: Union[mp4.MP4, id3.ID3], audio: str, atomic: bool) -> None:
+        """Save the tags of an audio file, reserving `PADDING` bytes when they grow.
+
+        Parameters
+        ----------
+        audio_ : mp4.MP4 | id3.ID3
+            The loaded tags of the audio file.
+        audio : str
+            The path to the audio file.
+        atomic : bool
+            Whether to save into a temporary copy that replaces the audio file.
+        """
+        if not atomic:
+            audio_.save(padding=_reserve_padding)
+            return
+
+        staging = temporary_path(audio)
+        try:
+            shutil.copyfile(audio, staging)
+            audio_.save(staging, padding=_reserve_padding)
+            move_into_place(staging, audio)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+        return
+
+    def add_to_m4a(
+        self, audio: str, autosave: bool = False, atomic: bool = False
+    ) -> None:
         """Add the metadata to an M4A audio file.
 
         Parameters
@@ -281,6 +387,9 @@ class Metadata:
             The path to the M4A audio file.
         autosave : bool, optional
             Whether to save the changes to the audio file automatically, by default False.
+        atomic : bool, optional
+            Whether to save into a temporary copy that replaces the audio file once
+            written, so readers never see a half-written file, by default False.
         """
         if self.album_art and isinstance(self.album_art, str):
             # IMPROVEMENT: instead of loading local image, get the bytes from the url
@@ -294,15 +403,26 @@ class Metadata:
 
         audio_ = mp4.MP4(audio)
 
-        for key, value in asdict(self).items():
-            if value is not None and self._map_metadata(key, AudioType.MP4) is not None:
-                audio_[self._map_metadata(key, AudioType.MP4)] = [value]
+        for key, value in self._items():
+            tag = self._map_metadata(key, AudioType.MP4)
+            if value is None or tag is None:
+                continue
 
+            if tag.startswith("----:"):
+                # freeform atoms : mean="com.apple.iTunes", name=..., data=utf-8 bytes
+                audio_[tag] = [mp4.MP4FreeForm(str(value).encode())]
+            else:
+                audio_[tag] = [value]
+
+        # kept for a later save, dropped once saved so the tags are not held
+        self.audio = None if autosave else audio_
         if autosave:
-            audio_.save()
+            self._save(audio_, audio, atomic)
         return
 
-    def add_to_mp3(self, audio: str, autosave: bool = False) -> None:
+    def add_to_mp3(
+        self, audio: str, autosave: bool = False, atomic: bool = False
+    ) -> None:
         """
         Add the metadata to an MP3 audio file.
 
@@ -312,6 +432,9 @@ class Metadata:
             The path to the MP3 audio file.
         autosave : bool, optional
             Whether to save the changes to the audio file automatically, by default False.
+        atomic : bool, optional
+            Whether to save into a temporary copy that replaces the audio file once
+            written, so readers never see a half-written file, by default False.
         """
         if self.album_art and isinstance(self.album_art, str):
             # IMPROVEMENT: instead of loading local image, get the bytes from the url
@@ -327,7 +450,7 @@ class Metadata:
 
         audio_ = id3.ID3(audio)
 
-        for key, value in asdict(self).items():
+        for key, value in self._items():
             if value is None or self._map_metadata(key, AudioType.MP3) is None:
                 continue
 
@@ -341,6 +464,13 @@ class Metadata:
                 # data=open('path/to/album_art.jpg', 'rb').read()
                 # NOTE: album cover is added successfully, windows cannot display that.
                 audio_[tag] = value
+            elif tag.startswith("TXXX:"):
+                # user text : encoding=3, desc='REPLAYGAIN_TRACK_GAIN', text='-7.70 dB'
+                audio_[tag] = metadata(encoding=3, desc=tag.split(":")[1], text=value)
+            elif tag.startswith("COMM:"):
+                # named comment : encoding=3, lang='eng', desc='iTunNORM', text=...
+                _, desc, lang = tag.split(":")
+                audio_[tag] = metadata(encoding=3, lang=lang, desc=desc, text=value)
             elif key in ("comment",):
                 # comment : encoding=3, desc='sort_name', text='Sort Name'
                 # NOTE: comment is added successfully, iTunes cannot display that.
@@ -356,6 +486,47 @@ class Metadata:
             else:
                 audio_[tag] = metadata(encoding=3, text=str(value))
 
+        # kept for a later save, dropped once saved so the tags are not held
+        self.audio = None if autosave else audio_
         if autosave:
-            audio_.save()
+            self._save(audio_, audio, atomic)
         return
+
+    @classmethod
+    def read_identifiers(cls, audio: str) -> dict[str, str]:
+        """Read the Spotify track ID and ISRC tagged in an audio file.
+
+        Parameters
+        ----------
+        audio : str
+            The path to the M4A or MP3 audio file.
+
+        Returns
+        -------
+        dict[str, str]
+            The "spotify_track_id" and "isrc" found, empty for untagged files.
+        """
+        ext = os.path.splitext(audio)[1].lower()
+        if ext in (".m4a", ".mp4"):
+            type, audio_ = AudioType.MP4, mp4.MP4(audio).tags or {}
+        elif ext == ".mp3":
+            try:
+                type, audio_ = AudioType.MP3, id3.ID3(audio)
+            except id3.ID3NoHeaderError:
+                return {}
+        else:
+            raise ValueError(f"Unsupported audio format: {audio}")
+
+        identifiers = {}
+        for key in ("spotify_track_id", "isrc"):
+            tag = cls._map_metadata(key, type)
+            tag = tag[0] if type is AudioType.MP3 else tag
+            if tag not in audio_:
+                continue
+            value = audio_[tag]
+            # freeform atoms hold a list of bytes, ID3 text frames a list of str
+            value = value[0] if type is AudioType.MP4 else value.text[0]
+            value = value.decode() if isinstance(value, bytes) else str(value)
+            if value:
+                identifiers[key] = value
+        return identifiers
@@ -0,0 +1,68 @@
+# @title Safe output path helpers { display-mode: "form" }
+import errno
+import os
+import shutil
+from typing import Optional
+from uuid import uuid4
+
+
+def temporary_path(filename: str, directory: Optional[str] = None) -> str:
+    """Return a collision-free temporary path for `filename`.
+
+    The temporary path keeps the extension of `filename`, so tools that infer
+    the format from it (e.g. ffmpeg) still work, and is hidden and unique, so
+    concurrent workers writing the same file never share a temporary file.
+
+    Parameters
+    ----------
+    filename : str
+        The path the temporary file will eventually be moved to.
+    directory : str, optional
+        The directory of the temporary file, by default the directory of `filename`.
+
+    Returns
+    -------
+    str
+        The temporary path.
+    """
+    head, tail = os.path.split(filename)
+    name, ext = os.path.splitext(tail)
+    return os.path.join(
+        head if directory is None else directory, f".{name}.{uuid4().hex}.part{ext}"
+    )
+
+
+def move_into_place(source: str, destination: str) -> str:
+    """Atomically move `source` to `destination`, replacing any existing file.
+
+    If both paths are on different filesystems (e.g. `source` lives on a tmpfs),
+    the file is first copied next to `destination` and then renamed, so readers
+    never see a partially written `destination`.
+
+    Parameters
+    ----------
+    source : str
+        The path of the finished file.
+    destination : str
+        The final path of the file.
+
+    Returns
+    -------
+    str
+        The final path of the file.
+    """
+    try:
+        os.replace(source, destination)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        staging = temporary_path(destination)
+        try:
+            shutil.copyfile(source, staging)
+            os.replace(staging, destination)
+        except BaseException:
+            if os.path.exists(staging):
+                os.remove(staging)
+            raise
+        os.remove(source)
+    return destination
@@ -0,0 +1,272 @@
+# @title Download and tag pipeline { display-mode: "form" }
+import logging
+import os
+import time
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Optional
+
+from .metadata import Metadata
+
+if TYPE_CHECKING:
+    from .spotify_api import SpotifyAPI
+    from .youtube_audio_downloader import YouTubeAudioDownloader
+
+logger = logging.getLogger(__name__)
+
+# catalog identifiers `SpotifyAPI.lookup` resolves a track by
+IDENTIFIERS = ("spotify_track_id", "isrc", "upc", "track_number")
+# extensions `tag` can write metadata to
+TAGGABLE = (".m4a", ".mp4", ".mp3")
+
+
+@dataclass
+class TrackResult:
+    """Outcome of processing one video.
+
+    Attributes
+    ----------
+    video_url : str
+        URL of the YouTube video.
+    status : str
+        "ok", "duplicate", "no_audio" or "failed".
+    path : str, optional
+        Path to the audio file.
+    author : str, optional
+        The YouTube channel of the video.
+    title : str, optional
+        The YouTube title of the video.
+    duplicate_of : str, optional
+        The audio file this video duplicates.
+    tagged : bool
+        Whether metadata was written to the audio file.
+    error : str, optional
+        The error a failed video raised.
+    duration : float
+        The time spent on the video in seconds.
+    source_sha256 : str, optional
+        The SHA-256 of the downloaded stream, hashed while it was written; the
+        tagged file is not hashed.
+    """
+
+    video_url: str
+    status: str = "ok"
+    path: Optional[str] = None
+    author: Optional[str] = None
+    title: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    tagged: bool = False
+    error: Optional[str] = None
+    duration: float = 0.0
+    source_sha256: Optional[str] = None
+
+
+def tag(metadata: Metadata, audio: str, atomic: bool = True) -> bool:
+    """Write metadata to an audio file according to its extension.
+
+    Parameters
+    ----------
+    metadata : Metadata
+        The metadata to write.
+    audio : str
+        The path to the audio file.
+    atomic : bool, optional
+        Whether to write into a copy replacing the file, for files readers may
+        already see, by default True.
+
+    Returns
+    -------
+    bool
+        True if the file format supports tagging and the tags were written; the
+        temporary album art file of `metadata` is removed either way.
+    """
+    ext = os.path.splitext(audio)[1].lower()
+    try:
+        if ext in (".m4a", ".mp4"):
+            metadata.add_to_m4a(audio, autosave=True, atomic=atomic)
+        elif ext in (".mp3",):
+            metadata.add_to_mp3(audio, autosave=True, atomic=atomic)
+        else:
+            return False
+    finally:
+        discard_album_art(metadata)
+    return True
+
+
+def discard_album_art(metadata: Metadata) -> None:
+    """Remove the temporary album art file of metadata that was not written.
+
+    Parameters
+    ----------
+    metadata : Metadata
+        The metadata, whose `album_art` is still a path unless it was tagged.
+    """
+    if isinstance(metadata.album_art, str) and os.path.exists(metadata.album_art):
+        os.remove(metadata.album_art)
+    return
+
+
+def resolve(
+    spotify: "SpotifyAPI",
+    identifiers: Optional[dict[str, str]] = None,
+    artist: Optional[str] = None,
+    title: Optional[str] = None,
+    market: Optional[str] = None,
+    limit: int = 5,
+) -> Optional[Metadata]:
+    """Find the Spotify metadata of a track, by identifier before searching.
+
+    Parameters
+    ----------
+    spotify : SpotifyAPI
+        An authenticated Spotify client.
+    identifiers : dict[str, str], optional
+        Any of `IDENTIFIERS`, by default None.
+    artist : str, optional
+        The artist searched for without a known track, by default None.
+    title : str, optional
+        The title searched for without a known track, also picking the track of
+        a UPC album, by default None.
+    market : str, optional
+        An ISO 3166-1 alpha-2 country code to limit the search, by default None.
+    limit : int, optional
+        The maximum number of search results, ranked against the video by
+        `SpotifyAPI.to_metadata`, by default 5.
+
+    Returns
+    -------
+    Metadata or None
+        The metadata, or None if nothing matched.
+    """
+    if identifiers and spotify.lookup(**identifiers, title=title, market=market):
+        return spotify.to_metadata()
+    if identifiers:
+        logger.info("No track found for %s, searching instead.", identifiers)
+    if artist is None and title is None:
+        return
+    rank_by = None
+    if artist is not None and title is not None:
+        from .matching import video_query
+
+        rank_by = video_query(artist, title)
+    spotify.search(
+        *filter(None, (artist, title)), market=market, limit=limit, rank_by=rank_by
+    )
+    return spotify.to_metadata()
+
+
+def retag(audio: str, spotify: "SpotifyAPI", market: Optional[str] = None) -> bool:
+    """Tag an audio file again, resolving it by the identifiers it is tagged with.
+
+    Files tagged by `process` carry their Spotify track ID, so this takes one
+    Spotify request and no search.
+
+    Parameters
+    ----------
+    audio : str
+        The path to the M4A or MP3 audio file.
+    spotify : SpotifyAPI
+        An authenticated Spotify client.
+    market : str, optional
+        An ISO 3166-1 alpha-2 country code, by default None.
+
+    Returns
+    -------
+    bool
+        True if the file was tagged, False if it has no identifiers or none matched.
+    """
+    identifiers = Metadata.read_identifiers(audio)
+    if not identifiers:
+        logger.info(f"No identifiers tagged in `{audio}`.")
+        return False
+    metadata = resolve(spotify, identifiers, market=market)
+    return tag(metadata, audio) if metadata else False
+
+
+def process(
+    video_url: str,
+    downloader: "YouTubeAudioDownloader",
+    spotify: Optional["SpotifyAPI"] = None,
+    output_file: Optional[str] = None,
+    market: Optional[str] = None,
+    limit: int = 5,
+    identifiers: Optional[dict[str, str]] = None,
+) -> TrackResult:
+    """Download the audio of a video and tag it with Spotify metadata.
+
+    Parameters
+    ----------
+    video_url : str
+        URL of the YouTube video.
+    downloader : YouTubeAudioDownloader
+        The downloader fetching and converting the audio.
+    spotify : SpotifyAPI, optional
+        An authenticated Spotify client; metadata is skipped without one,
+        by default None.
+    output_file : str, optional
+        Output file path for the audio, by default chosen by `downloader`.
+    market : str, optional
+        An ISO 3166-1 alpha-2 country code to limit the search, by default None.
+    limit : int, optional
+        The maximum number of search results, ranked against the video by
+        `SpotifyAPI.to_metadata`, by default 5.
+    identifiers : dict[str, str], optional
+        Catalog identifiers of the track, e.g. {"isrc": "..."} or {"upc": "..."},
+        looked up instead of searching the video title, by default None.
+
+    Returns
+    -------
+    TrackResult
+        The outcome of processing the video; errors are reported, not raised.
+    """
+    start = time.perf_counter()
+    result = TrackResult(video_url)
+
+    def tag_converted(audio: str) -> None:
+        """Tag the converted, not yet published file, so it is written once."""
+        # no metadata, and no album art file, is fetched for files `tag` cannot write
+        if os.path.splitext(audio)[1].lower() not in TAGGABLE:
+            logger.info(f"Metadata skipped, `{audio}` cannot be tagged.")
+            return
+
+        metadata = None
+        if spotify is None:
+            logger.info("Metadata skipped.")
+        else:
+            logger.info("Collecting metadata, please wait.")
+            video = downloader.video
+            metadata = resolve(
+                spotify, identifiers, video.author, video.title, market, limit
+            )
+
+        # the loudness measured while converting is written even without
+        # metadata, so it never takes a second decode
+        try:
+            if downloader.loudness:
+                loudness = downloader.loudness.tags()
+                metadata = replace(metadata or Metadata(), **loudness)
+            if metadata:
+                logger.info("Adding metadata to audio.")
+                with downloader.instrumentation.span("tag"):
+                    result.tagged = tag(metadata, audio, atomic=False)
+        finally:
+            if metadata:
+                discard_album_art(metadata)
+        return
+
+    try:
+        result.path = downloader.get_audio(video_url, output_file, tag=tag_converted)
+        result.author, result.title = downloader.video.author, downloader.video.title
+        result.source_sha256 = downloader.source_sha256
+        logger.info(f"Found audio: `{result.path}`")
+
+        if downloader.duplicate_of:
+            result.status, result.duplicate_of = "duplicate", downloader.duplicate_of
+            logger.info(f"Duplicate of `{downloader.duplicate_of}`, metadata skipped.")
+        elif result.path is None:
+            result.status = "no_audio"
+    except Exception as error:
+        logger.exception(f"Failed to process `{video_url}`.")
+        result.status, result.error = "failed", f"{type(error).__name__}: {error}"
+
+    result.duration = time.perf_counter() - start
+    return result
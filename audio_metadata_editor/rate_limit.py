@@ -0,0 +1,49 @@
+# @title Request rate limiter class { display-mode: "form" }
+import threading
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class RateLimiter:
+    """Thread-safe token bucket spacing out requests.
+
+    Callers reserve their slot under a lock and sleep outside of it, so
+    concurrent callers wait in turn instead of all retrying at once.
+
+    Attributes
+    ----------
+    rate : float
+        The sustained requests per second; may be changed while in use, e.g.
+        when the budget is divided among more processes.
+    burst : int
+        The requests allowed at once after an idle period, by default 1.
+    """
+
+    rate: float
+    burst: int = 1
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens: float = float(self.burst)
+        self._updated = time.monotonic()
+
+    def acquire(self) -> float:
+        """Wait for the next request slot.
+
+        Returns
+        -------
+        float
+            The seconds waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.burst), self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,151 @@
+# @title Multi-process sharded batch runs { display-mode: "form" }
+"""
+Sharded batch runs of the command-line interface, see `cli.main`.
+
+The videos are queued in a `JobQueue` shared by `--shards` worker processes, each
+a draining `Daemon` claiming one video at a time. A crashed worker's videos are
+claimed again once their leases expire, and workers on other hosts sharing the
+database file can join with `ytad --join --db ...`.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import signal
+import sys
+from multiprocessing.connection import wait
+from typing import IO, Any, Iterable, Optional
+
+from .jobs import Job, JobQueue
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL: float = 1.0  # seconds between polls of the finished videos
+
+
+def work(args: argparse.Namespace, auth: Optional[dict[str, Any]]) -> None:
+    """Process queued videos until the queue drains; the target of a shard.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The parsed options of `cli.main`.
+    auth : dict[str, Any], optional
+        The Spotify token of the parent process, renewed by the shard when it
+        expires, or None without metadata.
+    """
+    from .cli import build
+    from .daemon import Daemon
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="[%(levelname)s] %(processName)s: %(message)s",
+    )
+    downloader, spotify = build(args)
+    if spotify is not None and auth:
+        spotify.auth = auth
+
+    daemon = Daemon(
+        queue=JobQueue(args.db, lease=args.lease),
+        spotify=spotify,
+        auth_file=args.auth_file,
+        workers=args.workers,
+        # like a threaded run, failed videos are reported, not retried, and are
+        # queued again when the run is repeated
+        max_attempts=1,
+        downloader=downloader,
+        drain=True,
+        spotify_rate=args.spotify_rate,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: daemon.stop())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    logger.info("Stage timings:\n%s", downloader.instrumentation.summary())
+    return
+
+
+def run(
+    urls: Iterable[str],
+    args: argparse.Namespace,
+    auth: Optional[dict[str, Any]] = None,
+    output: Optional[IO[str]] = None,
+) -> list[Job]:
+    """Queue videos and process them in `args.shards` worker processes.
+
+    Videos already queued or done in `args.db` are not queued again, so an
+    interrupted run resumes where it stopped when repeated. Only the videos of
+    this run are reported, or with `args.join`, the videos queued or running
+    when the run joined the queue. The queue is polled every `POLL_INTERVAL`
+    seconds, so videos are reported shortly after they finish.
+
+    Parameters
+    ----------
+    urls : Iterable[str]
+        URLs of the YouTube videos.
+    args : argparse.Namespace
+        The parsed options of `cli.main`.
+    auth : dict[str, Any], optional
+        The Spotify token shared by the shards, by default None.
+    output : IO[str], optional
+        The stream the results are written to as JSON lines, by default stdout.
+
+    Returns
+    -------
+    list[Job]
+        The failed jobs.
+    """
+    # the input files cannot be sent to the worker processes
+    args = argparse.Namespace(**{**vars(args), "files": None})
+    output = output or sys.stdout
+    queue = JobQueue(args.db, lease=args.lease)
+    if args.join:
+        scope = {job.id for job in queue.jobs() if job.status in ("queued", "running")}
+    else:
+        scope = set(queue.submit_many(urls).values())
+    logger.info("Running %d videos of `%s`.", len(scope), args.db)
+
+    context = multiprocessing.get_context("spawn")
+    shards = [
+        context.Process(target=work, args=(args, auth), name=f"shard-{index}")
+        for index in range(max(args.shards or 1, 1))
+    ]
+    failed: list[Job] = []
+
+    def emit() -> None:
+        """Report the jobs of the run finished since the last call."""
+        # only the unreported jobs are read, not the history of a reused --db
+        for job in queue.jobs(ids=scope):
+            if job.status not in ("done", "failed"):
+                continue
+            scope.discard(job.id)
+            if job.status == "failed":
+                failed.append(job)
+            result = job.result or {
+                "video_url": job.url,
+                "status": job.status,
+                "error": job.error,
+            }
+            print(json.dumps(result, default=str), file=output)
+        output.flush()
+        return
+
+    for shard in shards:
+        shard.start()
+    try:
+        # the shards record results in the queue, reported while they run
+        while any(shard.is_alive() for shard in shards):
+            wait([shard.sentinel for shard in shards], POLL_INTERVAL)
+            emit()
+    except KeyboardInterrupt:
+        for shard in shards:
+            shard.terminate()
+            shard.join()
+        raise
+    for shard in shards:
+        shard.join()
+    emit()
+    queue.close()
+    return failed
@@ -3,24 +3,149 @@ import base64
 import json
 import os
 import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
-from io import BytesIO
-from typing import Any, Optional
-
-import requests
-from bs4 import BeautifulSoup
-from PIL import Image
-from requests import Response
+from typing import TYPE_CHECKING, Any, Optional
 
+from .cache import LRUCache
+from .instrumentation import Instrumentation
+from .lyrics import Lyrics, LyricsQuery
+from .memory import write_chunks
 from .metadata import Metadata
+from .paths import move_into_place, temporary_path
+from .rate_limit import RateLimiter
+
+if TYPE_CHECKING:
+    from requests import Response, Session
+
+
+@dataclass
+class AlbumContext:
+    """Metadata shared by the tracks of a Spotify album, resolved once per run.
+
+    Attributes
+    ----------
+    id : str
+        The Spotify album ID.
+    name : str
+        The album name.
+    album : str
+        The album name as tagged, e.g. "Castle - Single".
+    album_artist : str
+        The names of the album artists.
+    total_tracks : int
+        The number of tracks of the album.
+    date : str
+        The release date of the album.
+    compilation : int, optional
+        1 for compilations, else None.
+    genre : str, optional
+        The genre scraped from Apple Music.
+    copyright : str, optional
+        The copyright scraped from Apple Music.
+    album_art : str
+        The album art file, copied for every track it is tagged to; it is
+        removed once the context is evicted from `SpotifyAPI.albums` and no
+        track uses it.
+    """
+
+    id: str
+    name: str
+    album: str
+    album_artist: str
+    total_tracks: int
+    date: str
+    compilation: Optional[int] = None
+    genre: Optional[str] = None
+    copyright: Optional[str] = None
+    album_art: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._references = 1  # held by the cache until the context is evicted
+
+    def acquire(self) -> bool:
+        """Use the context, keeping its album art until the matching `release`.
+
+        Returns
+        -------
+        bool
+            False if the context was already released for good, i.e. evicted,
+            and its album art removed.
+        """
+        with self._lock:
+            if self._references == 0:
+                return False
+            self._references += 1
+        return True
+
+    def release(self) -> None:
+        """Drop one reference, removing the album art file with the last one."""
+        with self._lock:
+            self._references -= 1
+            last = self._references == 0
+        if last and self.album_art and os.path.exists(self.album_art):
+            os.remove(self.album_art)
+        return
+
+
+def _session() -> "Session":
+    """Create the default HTTP session, importing requests on first use."""
+    from requests import Session
+
+    return Session()
 
 
 @dataclass
 class SpotifyAPI:
-    """Class representing the Spotify API."""
+    """Class representing the Spotify API.
+
+    Attributes
+    ----------
+    auth : dict[str, Any]
+        The Spotify access token response.
+    temp_dir : str, optional
+        Directory the album art is downloaded to, by default the system temporary
+        directory.
+    instrumentation : Instrumentation
+        Collector of the auth, search, scrape and album art timings.
+    session : requests.Session
+        The HTTP session every request is sent through, reusing its connections.
+    lyrics : Lyrics, optional
+        The lyrics lookup, run alongside the album resolution; lyrics are left
+        empty without one, by default None.
+    albums : LRUCache
+        The resolved `AlbumContext` per album ID, shared by copies of the client,
+        so every album is scraped and its art downloaded once per run.
+    rate_limiter : RateLimiter, optional
+        Limit on the Web API requests, shared by copies of the client, by
+        default None.
+    """
 
     auth: dict[str, Any] = field(default_factory=lambda: {})
+    temp_dir: Optional[str] = None
+    instrumentation: Instrumentation = field(default_factory=Instrumentation)
+    session: "Session" = field(default_factory=_session)
+    lyrics: Optional[Lyrics] = None
+    albums: LRUCache = field(
+        default_factory=lambda: LRUCache(256, on_evict=AlbumContext.release)
+    )
+    rate_limiter: Optional[RateLimiter] = None
+
+    def _throttle(self) -> None:
+        """Wait for a Web API request slot of `rate_limiter`."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        return
+
+    def close(self) -> None:
+        """Release the album contexts and their album art files."""
+        self.albums.clear()
+        return
 
     def is_authenticated(self, filename: str = "auth.json") -> bool:
         """Check if the user is authenticated.
@@ -75,11 +200,15 @@ class SpotifyAPI:
             "Content-Type": "application/x-www-form-urlencoded",
         }
 
-        self.auth = requests.post(ENDPOINT, params=form, headers=headers).json()
+        with self.instrumentation.span("spotify.auth"):
+            self.auth = self.session.post(ENDPOINT, params=form, headers=headers).json()
         self.auth["authorize_after"] = now + self.auth["expires_in"]
 
-        with open(filename, "w") as jsonfile:
+        # replaced at once, processes sharing the file never read half of it
+        staging = temporary_path(filename)
+        with open(staging, "w") as jsonfile:
             json.dump(self.auth, jsonfile, indent=2)
+        move_into_place(staging, filename)
         return
 
     def search(
@@ -90,6 +219,7 @@ class SpotifyAPI:
         limit: int = 5,  # Value Range: 0 - 50
         offset: int = 0,  # Value Range: 0 - 1000
         include_external: Optional[str] = None,  # Values: "audio"
+        rank_by: Optional[str] = None,
     ) -> Any:
         """Search for tracks, albums, artists, playlists, shows, episodes, or audiobooks on Spotify.
 
@@ -107,6 +237,9 @@ class SpotifyAPI:
             The index of the first item to return, by default 0.
         include_external : str, optional
             Whether to include external audio content in the search results, by default None.
+        rank_by : str, optional
+            The text `to_metadata` ranks the tracks found against, e.g. the artist
+            and title parsed from a video, by default the query.
 
         Returns
         -------
@@ -128,7 +261,106 @@ class SpotifyAPI:
             "Content-Type": "application/json",
         }
 
-        self.res = requests.get(ENDPOINT, params=params, headers=headers).json()
+        self._throttle()
+        with self.instrumentation.span("spotify.search"):
+            self.res = self.session.get(ENDPOINT, params=params, headers=headers).json()
+        # the results are ranked against the query by `to_metadata`
+        self.query: str = rank_by or params["q"]
+        return self.res
+
+    def lookup(
+        self,
+        spotify_track_id: Optional[str] = None,
+        isrc: Optional[str] = None,
+        upc: Optional[str] = None,
+        title: Optional[str] = None,
+        track_number: Optional[int] = None,
+        market: Optional[str] = None,
+    ) -> Any:
+        """Find a track by identifier instead of a free-text search.
+
+        The first identifier given is used: a Spotify track ID takes one request,
+        an ISRC one `isrc:` search, and a UPC an `upc:` album search plus the album
+        track pages, 50 tracks each, and the track request, picking the track by
+        `track_number` or else the track name matching `title` best.
+
+        Parameters
+        ----------
+        spotify_track_id : str, optional
+            The Spotify track ID, by default None.
+        isrc : str, optional
+            The International Standard Recording Code, by default None.
+        upc : str, optional
+            The Universal Product Code of the album, by default None.
+        title : str, optional
+            The track or video title, e.g. "Artist - Song (Official Video)", picked
+            from a UPC album by `matching.best_match`, by default None.
+        track_number : int, optional
+            The track number picked from a UPC album, by default None.
+        market : str, optional
+            An ISO 3166-1 alpha-2 country code, by default None.
+
+        Returns
+        -------
+        Any
+            The track in the shape of a track search response, empty if not found.
+        """
+        ENDPOINT = "https://api.spotify.com/v1"
+        headers = {
+            "Authorization": f"{self.auth.get('token_type')} {self.auth.get('access_token')}",
+            "Content-Type": "application/json",
+        }
+
+        def get(path: str, **params: Any) -> Any:
+            params = {key: value for key, value in params.items() if value is not None}
+            self._throttle()
+            res = self.session.get(
+                f"{ENDPOINT}/{path}", params=params or None, headers=headers
+            )
+            return res.json() if res.ok else {}
+
+        with self.instrumentation.span("spotify.lookup"):
+            if not spotify_track_id and isrc:
+                items = self.search(f"isrc:{isrc}", market=market, limit=1)
+                return self.res if items.get("tracks", {}).get("items") else {}
+
+            if not spotify_track_id and upc:
+                from .matching import TITLE_THRESHOLD, best_match, parse_video
+
+                albums = self.search(f"upc:{upc}", type_="album", market=market)
+                albums = albums.get("albums", {}).get("items")
+                page = (
+                    get(f"albums/{albums[0]['id']}/tracks", limit=50, market=market)
+                    if albums
+                    else {}
+                )
+                # albums of more than 50 tracks are paged through `next`
+                number = int(track_number) if track_number is not None else None
+                tracks: list[dict[str, Any]] = []
+                while page and not spotify_track_id:
+                    for track in page.get("items", []):
+                        tracks.append(track)
+                        if number is not None and track.get("track_number") == number:
+                            spotify_track_id = track.get("id")
+                            break
+                    next_ = page.get("next")
+                    page = get(next_.removeprefix(f"{ENDPOINT}/")) if next_ else {}
+
+                if not spotify_track_id and title and tracks:
+                    # a video title, e.g. "Artist - Song (Official Video)"
+                    _, name = parse_video("", title)
+                    names = [track.get("name", "") for track in tracks]
+                    index = best_match(name, names, TITLE_THRESHOLD)
+                    if index is not None:
+                        spotify_track_id = tracks[index].get("id")
+
+            track = (
+                get(f"tracks/{spotify_track_id}", market=market)
+                if spotify_track_id
+                else {}
+            )
+
+        self.res = {"tracks": {"items": [track]}} if track.get("id") else {}
         return self.res
 
     def to_metadata(self) -> Optional[Metadata]:
@@ -140,7 +372,11 @@ class SpotifyAPI:
             The converted metadata or None if no tracks found.
         """
 
-        def request(url: str, params=None) -> Response:
+        from bs4 import BeautifulSoup
+
+        from .matching import best_match
+
+        def request(url: str, params=None) -> "Response":
             """Send a GET request to the specified URL.
 
             Parameters
@@ -163,15 +399,17 @@ class SpotifyAPI:
                 # "User-Agent": "Mozilla/5.0",
             }
 
-            return requests.get(url, params, headers=headers)
+            return self.session.get(url, params=params, headers=headers)
 
-        def music_search(*args: str) -> Optional[str]:
+        def music_search(artist: str, album: str) -> Optional[str]:
             """Perform a music search using Google search.
 
             Parameters
             ----------
-            args : str
-                The search query.
+            artist : str
+                The album artist.
+            album : str
+                The album name, matched against the album links found.
 
             Returns
             -------
@@ -179,7 +417,7 @@ class SpotifyAPI:
                 The URL of the music search result or None if not found.
             """
             # make a request to website
-            query = ", ".join(map(str, args))
+            query = f"{artist}, {album}"
             params = {"q": f"site:music.apple.com {query} "}
             res = request("https://google.com/search", params)
             soup = BeautifulSoup(res.content, "html.parser")
@@ -193,9 +431,13 @@ class SpotifyAPI:
             if div_rso:
                 # Create a regular expression pattern
                 pattern = re.compile(r"^https://music.apple.com/[a-z]{2}/album/\S+/\d+")
-                return sorted([a["href"] for a in div_rso.find_all("a", href=pattern)])[
-                    -1
+                hrefs = [a["href"] for a in div_rso.find_all("a", href=pattern)]
+                # ".../album/when-heaven-comes-down/1443209131" -> "when heaven comes down"
+                slugs = [
+                    href.rstrip("/").split("/")[-2].replace("-", " ") for href in hrefs
                 ]
+                index = best_match(album, slugs)
+                return hrefs[index] if index is not None else None
             return
 
         def scrape_data(url: str) -> dict[str, Any]:
@@ -263,55 +505,160 @@ class SpotifyAPI:
             album_arts : list[dict[str, Any]]
                 The album art data.
             filename : str
-                The filename to save the album art.
+                The prefix of the album art filename, e.g. the album ID.
 
             Returns
             -------
             str
                 The filename of the saved album art.
             """
-            # IMPROVEMENT: instead of saving the image, store it as bytes and return
-            # then use the bytes directly to set the album_art
-            res = requests.get(str(album_arts[0].get("url")))
-            Image.open(BytesIO(res.content)).save(f"{filename}.jpg")
-            return f"{filename}.jpg"
+            from PIL import Image
+
+            # unique per call, tracks of one album may be tagged concurrently
+            fd, album_art = tempfile.mkstemp(
+                suffix=".jpg", prefix=f"{filename}-", dir=self.temp_dir
+            )
+            # streamed to the file in chunks, never held whole in memory
+            url = str(album_arts[0].get("url"))
+            with os.fdopen(fd, "wb") as image, self.session.get(
+                url, stream=True
+            ) as res:
+                write_chunks(res, image)
+
+            # Spotify serves JPEG, which is kept as downloaded; only the header is read
+            with Image.open(album_art) as image:
+                if image.format != "JPEG":
+                    image.convert("RGB").save(album_art, format="JPEG")
+            return album_art
+
+        def resolve_album(album_: dict[str, Any]) -> AlbumContext:
+            """Resolve the metadata shared by the tracks of an album.
+
+            Parameters
+            ----------
+            album_ : dict[str, Any]
+                The album object of a Spotify track.
+
+            Returns
+            -------
+            AlbumContext
+                The album metadata, scraped data and album art.
+            """
+            name: str = album_.get("name")
+            album_type: str = album_.get("album_type")
+            album_artist: str = get_artists(album_.get("artists"))
+
+            def scrape() -> Optional[dict[str, Any]]:
+                with self.instrumentation.span("scrape"):
+                    url = music_search(album_artist, name)
+                    return scrape_data(url) if url else None
+
+            def album_art() -> str:
+                with self.instrumentation.span("art"):
+                    return get_album_art(album_.get("images"), album_.get("id"))
+
+            # the lookups wait on different hosts, run them side by side
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                data_, album_art_ = executor.submit(scrape), executor.submit(album_art)
+            data = data_.result() or {}
+
+            if album_type == "single":
+                album: str = f"{name} - {album_type.title()}"
+            elif album_type == "ep":
+                album: str = f"{name} - {album_type.upper()}"
+            else:
+                album: str = name
+
+            return AlbumContext(
+                id=album_.get("id"),
+                name=name,
+                album=album,
+                album_artist=album_artist,
+                total_tracks=album_.get("total_tracks"),
+                date=album_.get("release_date"),
+                compilation=1 if album_type == "compilation" else None,
+                genre=data.get("genre"),
+                copyright=data.get("copyright"),
+                album_art=album_art_.result(),
+            )
+
+        def track_art(context: AlbumContext) -> str:
+            """Copy the album art for one track, tagging consumes its file."""
+            fd, album_art = tempfile.mkstemp(
+                suffix=".jpg", prefix=f"{context.id}-", dir=self.temp_dir
+            )
+            os.close(fd)
+            shutil.copyfile(context.album_art, album_art)
+            return album_art
 
         if not self.res.get("tracks"):
             return
 
         items = self.res.get("tracks").get("items")
-        item_1 = items[0]
+        if not items:
+            return
 
-        filename: str = item_1.get("album").get("id")
+        # rank the results against the query instead of trusting the first one
+        index = None
+        if len(items) > 1 and getattr(self, "query", None):
+            candidates = [
+                f"{get_artists(item.get('artists'))} {item.get('name')}"
+                for item in items
+            ]
+            index = best_match(self.query, candidates)
+        item_1 = items[index or 0]
 
         title: str = item_1.get("name")
-        album_name: str = item_1.get("album").get("name")
-        album_type: str = item_1.get("album").get("album_type")
-        album_artist: str = get_artists(item_1.get("album").get("artists"))
-
-        if album_type == "single":
-            album: str = f"{album_name} - {album_type.title()}"
-        elif album_type == "ep":
-            album: str = f"{album_name} - {album_type.upper()}"
-        else:
-            album: str = album_name
-
-        data: Optional[Any] = music_search(album_artist, album_name)
-        if data:
-            data = scrape_data(data)
-
         artist: str = get_artists(item_1.get("artists"))
+        query = LyricsQuery(
+            title=title,
+            artist=artist,
+            album=item_1.get("album").get("name"),
+            duration=item_1.get("duration_ms", 0) / 1000 or None,
+            isrc=item_1.get("external_ids", {}).get("isrc"),
+            track_id=item_1.get("id"),
+        )
+
+        def album_context() -> AlbumContext:
+            album_ = item_1.get("album")
+            # an album evicted before it is acquired is resolved again
+            while True:
+                context = self.albums.get(
+                    album_.get("id"), lambda: resolve_album(album_)
+                )
+                if context.acquire():
+                    return context
+
+        def track_lyrics() -> Optional[str]:
+            if self.lyrics is None:
+                return
+            with self.instrumentation.span("lyrics"):
+                return self.lyrics.get(query)
+
+        # the album is resolved once per run, the lyrics once per track
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            context_ = executor.submit(album_context)
+            lyrics_ = executor.submit(track_lyrics)
+        context = context_.result()
+        try:
+            album_art: str = track_art(context)
+        finally:
+            context.release()
+        lyrics = lyrics_.result()
+
+        album: str = context.album
+        album_artist: str = context.album_artist
         track: int = item_1.get("track_number")
-        total_tracks: int = item_1.get("album").get("total_tracks")
-        date: str = item_1.get("album").get("release_date")
-        genre: Optional[str] = data.get("genre") if data else None
+        total_tracks: int = context.total_tracks
+        date: str = context.date
+        genre: Optional[str] = context.genre
         composer: Optional[str] = None  # TODO: NOT IMPLEMENTED
         disk: int = item_1.get("disc_number")
-        compilation: Optional[int] = 1 if album_type == "compilation" else None
+        compilation: Optional[int] = context.compilation
         gapless_playback = None
         rating = int(item_1.get("explicit"))
         # media_type = ...
-        copyright: Optional[str] = data.get("copyright") if data else None
+        copyright: Optional[str] = context.copyright
         account_id = "alimussifar@icloud.com"
         purchase_date: Optional[str] = None  # TODO: NOT IMPLEMENTED
         # sort_name = ...
@@ -319,8 +666,6 @@ class SpotifyAPI:
         # sort_album_artist = ...
         # sort_artist = ...
         # sort_composer = ...
-        lyrics: Optional[str] = None  # TODO: NOT IMPLEMENTED
-        album_art: str = get_album_art(item_1.get("album").get("images"), filename)
         comment = (
             "Metadata collected from SpotifyAPI and added via the "
             "python package named 'Mutagen'"
@@ -351,4 +696,6 @@ class SpotifyAPI:
             lyrics=lyrics,
             album_art=album_art,
             comment=comment,
+            spotify_track_id=item_1.get("id"),
+            isrc=item_1.get("external_ids", {}).get("isrc"),
         )
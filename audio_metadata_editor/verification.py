@@ -0,0 +1,80 @@
+# @title Converted audio verification functions { display-mode: "form" }
+from typing import Optional
+
+import mutagen
+
+
+class VerificationError(ValueError):
+    """The converted audio is truncated or corrupt."""
+
+
+def check_integrity(filename: str) -> None:
+    """Demux every packet of an audio file without decoding it.
+
+    Runs `ffmpeg -v error -i <filename> -c copy -f null -`, which reads the
+    whole container at disk speed and reports broken atoms, frames or packets.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the audio file.
+
+    Raises
+    ------
+    VerificationError
+        If ffmpeg fails or reports any error.
+    """
+    import ffmpeg
+
+    try:
+        _, log = (
+            ffmpeg.input(filename, v="error")
+            .output("-", c="copy", format="null")
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as error:
+        log = error.stderr or b"ffmpeg failed"
+    if log.strip():
+        message = log.decode(errors="replace").strip().splitlines()[0]
+        raise VerificationError(f"corrupt audio `{filename}`: {message}")
+    return
+
+
+def check_duration(
+    filename: str, expected: Optional[float], tolerance: float = 2.0
+) -> float:
+    """Compare the duration of an audio file with the length of its video.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the audio file.
+    expected : float, optional
+        The video length in seconds; nothing is compared without it.
+    tolerance : float, optional
+        The accepted difference in seconds, by default 2.0, as YouTube rounds
+        video lengths to whole seconds.
+
+    Returns
+    -------
+    float
+        The duration of the audio in seconds.
+
+    Raises
+    ------
+    VerificationError
+        If the file is unreadable or its duration differs from `expected`.
+    """
+    try:
+        audio = mutagen.File(filename)
+    except mutagen.MutagenError as error:
+        raise VerificationError(f"unreadable audio `{filename}`: {error}") from error
+    if audio is None or not audio.info.length:
+        raise VerificationError(f"unreadable audio `{filename}`")
+
+    duration: float = audio.info.length
+    if expected and abs(duration - expected) > tolerance:
+        raise VerificationError(
+            f"audio `{filename}` lasts {duration:.1f}s, the video {expected:.1f}s"
+        )
+    return duration
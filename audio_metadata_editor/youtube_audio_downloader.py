@@ -1,26 +1,141 @@
 # @title YouTube video information and audio class { display-mode: "form" }
+import hashlib
+import logging
 import os
-from dataclasses import dataclass
-from typing import Any, Optional
+import tempfile
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
-import ffmpeg
-from pytube import YouTube
+from .format_policy import FormatPolicy
+from .instrumentation import Instrumentation
+from .loudness import Loudness
+from .manifest import DownloadManifest
+from .memory import CHUNK_SIZE, MemoryBudget, download
+from .paths import move_into_place, temporary_path
+from .verification import check_duration, check_integrity
+
+if TYPE_CHECKING:
+    from requests import Session
+
+    from .fingerprint import Fingerprint, FingerprintIndex
+
+logger = logging.getLogger(__name__)
+
+
+def _youtube(*args: Any, **kwargs: Any) -> Any:
+    """Call `pytube.YouTube`, importing pytube on first use."""
+    from pytube import YouTube
+
+    return YouTube(*args, **kwargs)
+
+
+def _session() -> "Session":
+    """Create the default HTTP session, importing requests on first use."""
+    from requests import Session
+
+    return Session()
 
 
 @dataclass
 class YouTubeAudioDownloader:
-    """Class for downloading audio from YouTube videos."""
+    """Class for downloading audio from YouTube videos.
 
-    def _on_progress(self, *args: Any, **kwargs: Any) -> None:
-        """Callback function to handle download progress updates."""
-        return
+    Attributes
+    ----------
+    fingerprint_index : FingerprintIndex, optional
+        Index of already downloaded audio; when set, every converted file is
+        fingerprinted and checked for near-duplicates, by default None.
+    skip_duplicates : bool
+        Whether to delete duplicate audio instead of only flagging it through
+        `duplicate_of`, by default False.
+    analyze_loudness : bool
+        Whether to measure EBU R128 loudness into `loudness` during the convert
+        pass, by default False.
+    format_policy : FormatPolicy
+        Policy choosing the stream to download and the output container and codec,
+        by default the highest bitrate AAC stream converted to M4A.
+    output_dir : str, optional
+        Directory the audio files are written to, by default the current directory.
+    temp_dir : str, optional
+        Directory for the intermediate downloads, e.g. on a local SSD or tmpfs,
+        by default the system temporary directory.
+    instrumentation : Instrumentation
+        Collector of the resolve, download, convert and fingerprint timings.
+    client : Callable[..., pytube.YouTube]
+        Factory resolving a video URL, called like `pytube.YouTube`, by default
+        `pytube.YouTube`.
+    session : requests.Session
+        The HTTP session the audio streams are downloaded through.
+    chunk_size : int
+        The bytes read and held at a time while downloading, by default 1 MiB.
+    memory_budget : MemoryBudget, optional
+        Budget shared by the downloaders of concurrent videos; every video reserves
+        its estimated `footprint` from downloading until it is converted and
+        fingerprinted, releasing it before tagging, by default None.
+    verify : bool
+        Whether to check the converted file's integrity and duration against the
+        video length before it is tagged and published; a failed check raises
+        `VerificationError`, by default True.
+    duration_tolerance : float
+        The accepted difference in seconds between audio and video, by default 2.0.
+    manifest : DownloadManifest, optional
+        Log every published file is recorded in, with the SHA-256 of its
+        downloaded stream; the tagged file itself is not hashed, by default None.
+    """
+
+    fingerprint_index: Optional["FingerprintIndex"] = None
+    skip_duplicates: bool = False
+    analyze_loudness: bool = False
+    format_policy: FormatPolicy = field(default_factory=FormatPolicy)
+    output_dir: Optional[str] = None
+    temp_dir: Optional[str] = None
+    instrumentation: Instrumentation = field(default_factory=Instrumentation)
+    client: Callable[..., Any] = _youtube
+    session: "Session" = field(default_factory=_session)
+    chunk_size: int = CHUNK_SIZE
+    memory_budget: Optional[MemoryBudget] = None
+    verify: bool = True
+    duration_tolerance: float = 2.0
+    manifest: Optional[DownloadManifest] = None
+
+    def __post_init__(self) -> None:
+        self.duplicate_of: Optional[str] = None
+        self.loudness: Optional[Loudness] = None
+        self.bytes_downloaded: int = 0
+        self.source_sha256: Optional[str] = None
+        self.duration: Optional[float] = None
+        self._hash = hashlib.sha256()
 
-    def _on_complete(self, *args: Any, **kwargs: Any) -> None:
-        """Callback function to handle download completion."""
+    def _on_chunk(self, chunk: bytes) -> None:
+        """Callback function to count and hash downloaded chunks as they are written."""
+        self.bytes_downloaded += len(chunk)
+        self._hash.update(chunk)
         return
 
+    def footprint(self, stream: Any) -> int:
+        """Estimate the bytes a video holds while it is processed.
+
+        The downloaded stream and its converted copy coexist until the conversion
+        ends, in memory if `temp_dir` is a tmpfs, next to the download buffer.
+
+        Parameters
+        ----------
+        stream : pytube.Stream
+            The selected audio stream.
+
+        Returns
+        -------
+        int
+            The estimated bytes.
+        """
+        return 2 * (stream.filesize or 0) + self.chunk_size
+
     def get_audio(
-        self, video_url: str, output_file: Optional[str] = None
+        self,
+        video_url: str,
+        output_file: Optional[str] = None,
+        tag: Optional[Callable[[str], Any]] = None,
     ) -> Optional[str]:
         """Download audio from a YouTube video.
 
@@ -29,51 +144,192 @@ class YouTubeAudioDownloader:
         video_url : str
             URL of the YouTube video.
         output_file : str, optional
-            Output file path for the downloaded audio, by default None.
+            Output file path for the downloaded audio, by default the video title with
+            the `format_policy` extension in `output_dir`.
+        tag : Callable[[str], Any], optional
+            Called with the converted file before it is moved into place, to write
+            its tags in place; skipped for duplicates, by default None.
 
         Returns
         -------
         str or None
-            Path to the downloaded audio file in M4A format, or None if download fails.
+            Path to the downloaded audio file in the `format_policy` container, or
+            None if download fails or the audio is a skipped duplicate.
         """
 
-        def convert_to_m4a(filename: str) -> str:
-            """Convert a video file to M4A format.
+        def convert(filename: str, output_file: str) -> str:
+            """Convert a video file to the `format_policy` container and codec.
 
             Parameters
             ----------
             filename : str
-                Path to the input video file.
+                Path to the input video file, removed once converted.
+            output_file : str
+                Path to the output audio file, with the container's extension.
 
             Returns
             -------
             str
-                Path to the output M4A audio file.
+                Path to the output audio file.
             """
-            file_name, ext = os.path.splitext(filename)
-            output_file = file_name + ".m4a"
+            import ffmpeg
 
-            if os.path.exists(output_file):
-                os.remove(output_file)
+            options = self.format_policy.output_options()
 
-            ffmpeg.input(file_name + ext).output(output_file).run()
+            input_ = ffmpeg.input(filename)
+            if not self.analyze_loudness:
+                with self.instrumentation.span("convert"):
+                    input_.output(output_file, **options).run()
+            else:
+                # meter the decoded input in the same ffmpeg run into a null sink;
+                # its per-frame lines stay in the captured stderr, from which only
+                # the summary is parsed; older ffmpeg builds reject framelog="quiet"
+                meter = input_.audio.filter("ebur128", peak="true")
+                with self.instrumentation.span("convert", loudness=True):
+                    _, log = ffmpeg.merge_outputs(
+                        input_.audio.output(output_file, **options),
+                        meter.output("-", format="null"),
+                    ).run(capture_stderr=True)
+                self.loudness = Loudness.from_ebur128(log.decode(errors="replace"))
             os.remove(filename)
 
             return output_file
 
-        self.video = YouTube(video_url, self._on_progress, self._on_complete)
-        print(self.video.author, self.video.title)
+        def verify(filename: str) -> str:
+            """Check that the converted file is complete before paying for tagging.
 
-        audio_streams = self.video.streams.filter(
-            type="audio", mime_type="audio/mp4"
-        ).order_by("abr")
-        stream = audio_streams.last()
+            Parameters
+            ----------
+            filename : str
+                Path to the converted audio file.
 
-        # FEATURE: users can add custom download path/filename
+            Returns
+            -------
+            str
+                Path to the verified audio file.
+            """
+            if not self.verify:
+                return filename
 
-        if stream:
-            filename = os.path.basename(stream.download())
+            with self.instrumentation.span("verify"):
+                check_integrity(filename)
+                self.duration = check_duration(
+                    filename,
+                    getattr(self.video, "length", None),
+                    self.duration_tolerance,
+                )
+            return filename
 
-            return convert_to_m4a(filename)
+        def fingerprint_of(filename: str) -> Optional["Fingerprint"]:
+            """Fingerprint the converted file, decoding it, if there is an index."""
+            if self.fingerprint_index is None:
+                return
+            from .fingerprint import Fingerprint
 
-        return
+            with self.instrumentation.span("fingerprint"):
+                return Fingerprint.from_file(filename)
+
+        def publish(
+            filename: str, output_file: str, fingerprint: Optional["Fingerprint"]
+        ) -> Optional[str]:
+            """Flag or skip audio already present in the fingerprint index, else
+            reserve it there, tag the converted file in place, then move it into
+            place, releasing the reservation if that fails.
+
+            Parameters
+            ----------
+            filename : str
+                Path to the converted, not yet published, audio file.
+            output_file : str
+                Final path of the audio file.
+            fingerprint : Fingerprint, optional
+                The fingerprint of the file, None without a fingerprint index.
+
+            Returns
+            -------
+            str or None
+                The final audio file path, or None if it was a skipped duplicate.
+            """
+            index = self.fingerprint_index
+            if fingerprint is not None:
+                # reserved before the slow tagging, so a near-duplicate converted
+                # meanwhile by another worker or shard is flagged against it
+                self.duplicate_of = index.lookup_or_reserve(output_file, fingerprint)
+
+                if self.duplicate_of is not None and self.skip_duplicates:
+                    os.remove(filename)
+                    return
+
+            try:
+                # the staging file is private, so the tags are written straight
+                # into it and the file is published once, fully tagged
+                if tag is not None and self.duplicate_of is None:
+                    tag(filename)
+
+                move_into_place(filename, output_file)
+            except BaseException:
+                if fingerprint is not None and self.duplicate_of is None:
+                    index.release(output_file)
+                raise
+            if self.manifest is not None:
+                self.manifest.record(
+                    output_file,
+                    video_url=video_url,
+                    video_id=self.video.video_id,
+                    source_sha256=self.source_sha256,
+                    bytes=self.bytes_downloaded,
+                    duration=self.duration,
+                    duplicate_of=self.duplicate_of,
+                )
+
+            return output_file
+
+        self.duplicate_of = None
+        self.loudness = None
+        self.source_sha256 = self.duration = None
+        with self.instrumentation.span("resolve"):
+            self.video = self.client(video_url)
+            logger.info("%s - %s", self.video.author, self.video.title)
+            stream = self.format_policy.select(self.video.streams)
+        if not stream:
+            return
+
+        if output_file is None:
+            name, _ = os.path.splitext(stream.default_filename)
+            output_file = os.path.join(
+                self.output_dir or "", name + self.format_policy.extension(stream)
+            )
+
+        if os.path.dirname(output_file):
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+        # unique names for every intermediate file, so concurrent workers and
+        # tracks sharing a title never touch each other's files
+        source = temporary_path(
+            f"{self.video.video_id}.{stream.subtype}",
+            self.temp_dir or tempfile.gettempdir(),
+        )
+        staging = temporary_path(output_file)
+        budget = self.memory_budget
+        try:
+            with budget.reserve(self.footprint(stream)) if budget else nullcontext():
+                self.bytes_downloaded, self._hash = 0, hashlib.sha256()
+                with self.instrumentation.span("download") as span:
+                    download(
+                        self.session,
+                        stream.url,
+                        source,
+                        stream.filesize,
+                        self.chunk_size,
+                        self._on_chunk,
+                    )
+                    span["bytes"] = self.bytes_downloaded
+                self.source_sha256 = self._hash.hexdigest()
+                converted = verify(convert(source, staging))
+                fingerprint = fingerprint_of(converted)
+            # tagging waits on the network, not memory; the budget is released
+            return publish(converted, output_file, fingerprint)
+        finally:
+            for filename in (source, staging):
+                if os.path.exists(filename):
+                    os.remove(filename)
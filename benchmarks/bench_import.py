@@ -0,0 +1,116 @@
+"""
+Import-time benchmark of the package entry points.
+
+    python -m benchmarks.bench_import --repeat 10
+
+Every statement runs in a fresh interpreter, as in a short-lived tagging
+worker, and the median wall time and the heavy third-party modules it loaded
+are reported.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Optional
+
+from benchmarks.stand_in import ROOT
+
+STATEMENTS: dict[str, str] = {
+    "package": "import audio_metadata_editor",
+    "Metadata": "from audio_metadata_editor import Metadata",
+    "SpotifyAPI": "from audio_metadata_editor import SpotifyAPI",
+    "YouTubeAudioDownloader": "from audio_metadata_editor import YouTubeAudioDownloader",
+}
+
+HEAVY_MODULES: tuple[str, ...] = (
+    "bs4",
+    "ffmpeg",
+    "mutagen",
+    "numpy",
+    "PIL",
+    "pytube",
+    "requests",
+)
+
+_PROBE: str = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+loaded = [m for m in {modules!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "modules": loaded}}))
+"""
+
+
+def measure(statement: str) -> dict:
+    """Run `statement` in a fresh interpreter and time it.
+
+    Parameters
+    ----------
+    statement : str
+        The import statement.
+
+    Returns
+    -------
+    dict
+        The "seconds" the statement took and the heavy "modules" it loaded.
+    """
+    probe = _PROBE.format(statement=statement, modules=HEAVY_MODULES)
+    output = subprocess.run(
+        [sys.executable, "-c", probe],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def run(repeat: int = 5) -> dict[str, dict]:
+    """Measure every statement in `STATEMENTS` `repeat` times.
+
+    Parameters
+    ----------
+    repeat : int, optional
+        Number of fresh interpreters per statement, by default 5.
+
+    Returns
+    -------
+    dict[str, dict]
+        The median and minimum seconds and the heavy modules per statement.
+    """
+    report = {}
+    for name, statement in STATEMENTS.items():
+        samples = [measure(statement) for _ in range(repeat)]
+        seconds = [sample["seconds"] for sample in samples]
+        report[name] = {
+            "median": statistics.median(seconds),
+            "min": min(seconds),
+            "modules": samples[-1]["modules"],
+        }
+    return report
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        print(f"{'import':<24} {'median':>9} {'min':>9}  modules")
+        for name, stats in report.items():
+            print(
+                f"{name:<24} {stats['median'] * 1000:>7.1f}ms "
+                f"{stats['min'] * 1000:>7.1f}ms  {', '.join(stats['modules'])}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Offline end-to-end benchmark of the download, convert, resolve and tag paths.
+
+    python -m benchmarks.bench_pipeline --tracks 50 --workers 4 --latency 0.05
+
+YouTube, Spotify, Google and Apple Music are replaced by a local `StandIn`
+server, so runs are reproducible and can be compared before and after a change.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from typing import Optional
+
+from audio_metadata_editor import (
+    FormatPolicy,
+    Instrumentation,
+    SpotifyAPI,
+    YouTubeAudioDownloader,
+)
+from audio_metadata_editor.pipeline import TrackResult, process
+from benchmarks.stand_in import StandIn
+
+
+def run(
+    tracks: int = 20,
+    workers: int = 4,
+    latency: float = 0.0,
+    metadata: bool = True,
+    analyze_loudness: bool = False,
+    codec: Optional[str] = None,
+) -> dict:
+    """Process `tracks` stand-in videos and report throughput and stage latency.
+
+    Parameters
+    ----------
+    tracks : int, optional
+        Number of videos processed, by default 20.
+    workers : int, optional
+        Number of videos processed concurrently, by default 4.
+    latency : float, optional
+        Seconds every stand-in response is delayed by, by default 0.0.
+    metadata : bool, optional
+        Whether to resolve and write metadata, by default True.
+    analyze_loudness : bool, optional
+        Whether to measure loudness during the convert pass, by default False.
+    codec : str, optional
+        The ffmpeg output codec, e.g. "copy", by default ffmpeg's default.
+
+    Returns
+    -------
+    dict
+        The tracks per minute, failures and per-stage report.
+    """
+    stand_in = StandIn(latency=latency).start()
+    directory = tempfile.mkdtemp(prefix="ytad-bench-")
+    instrumentation = Instrumentation()
+    spotify: Optional[SpotifyAPI] = None
+
+    try:
+        session = stand_in.session()
+        if metadata:
+            spotify = SpotifyAPI(
+                temp_dir=directory, instrumentation=instrumentation, session=session
+            )
+            spotify.authenticate(os.path.join(directory, "auth.json"))
+
+        def job(index: int) -> TrackResult:
+            downloader = YouTubeAudioDownloader(
+                analyze_loudness=analyze_loudness,
+                format_policy=FormatPolicy(codec=codec),
+                output_dir=os.path.join(directory, "output"),
+                temp_dir=directory,
+                instrumentation=instrumentation,
+                client=stand_in.youtube(),
+                session=session,
+            )
+            return process(
+                f"https://www.youtube.com/watch?v=stand-in-{index:05d}",
+                downloader,
+                # SpotifyAPI keeps the last search response, one copy per job
+                replace(spotify) if spotify else None,
+            )
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(job, range(tracks)))
+        elapsed = time.perf_counter() - start
+    finally:
+        if spotify:
+            spotify.close()
+        stand_in.stop()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    failures = [asdict(result) for result in results if result.status == "failed"]
+    return {
+        "tracks": tracks,
+        "workers": workers,
+        "latency": latency,
+        "elapsed": elapsed,
+        "tracks_per_minute": tracks / elapsed * 60,
+        "failures": failures,
+        "stages": instrumentation.report(),
+        "summary": instrumentation.summary(),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--no-metadata", dest="metadata", action="store_false")
+    parser.add_argument("--analyze-loudness", action="store_true")
+    parser.add_argument("--codec", default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if not shutil.which("ffmpeg"):
+        print("ffmpeg is required for the convert stage", file=sys.stderr)
+        return 2
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run(
+        tracks=args.tracks,
+        workers=args.workers,
+        latency=args.latency,
+        metadata=args.metadata,
+        analyze_loudness=args.analyze_loudness,
+        codec=args.codec,
+    )
+
+    if args.json:
+        print(json.dumps({k: v for k, v in report.items() if k != "summary"}))
+    else:
+        print(
+            f"{report['tracks']} tracks, {report['workers']} workers, "
+            f"{report['latency'] * 1000:.0f} ms latency: "
+            f"{report['tracks_per_minute']:.1f} tracks/minute, "
+            f"{len(report['failures'])} failed"
+        )
+        print(report["summary"])
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+"""
+Local HTTP stand-in for YouTube, Spotify, Google and Apple Music.
+
+Every `https://<host>/<path>` request sent through a session with a mounted
+`StandInAdapter` is served by `StandIn` as `http://127.0.0.1:<port>/<host>/<path>`,
+after the configured latency.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from mutagen import mp4
+from PIL import Image
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES: str = os.path.join(ROOT, "benchmarks", "fixtures")
+TESTS: str = os.path.join(ROOT, "tests")
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _cover(size: int = 640) -> bytes:
+    """Render a JPEG cover image like the ones served by i.scdn.co."""
+    image = Image.new("RGB", (size, size), (30, 215, 96))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def _audio() -> bytes:
+    """Return the M4A test fixture without tags, like a YouTube audio stream."""
+    with tempfile.TemporaryDirectory() as directory:
+        audio = os.path.join(directory, "audio.m4a")
+        shutil.copyfile(os.path.join(TESTS, "test_audio_1.m4a"), audio)
+        mp4.MP4(audio).delete()
+        return _read(audio)
+
+
+@dataclass
+class StandIn:
+    """Local HTTP server replaying saved responses.
+
+    Attributes
+    ----------
+    latency : float
+        Seconds every response is delayed by, by default 0.0.
+    host_latency : dict[str, float]
+        Per-host latency overriding `latency`, e.g. {"google.com": 0.3}.
+    """
+
+    latency: float = 0.0
+    host_latency: dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.audio = _audio()
+        self.routes: dict[str, tuple[str, bytes]] = {
+            "accounts.spotify.com": (
+                "application/json",
+                json.dumps(
+                    {
+                        "access_token": "stand-in",
+                        "token_type": "Bearer",
+                        "expires_in": 3600,
+                    }
+                ).encode(),
+            ),
+            "api.spotify.com": (
+                "application/json",
+                _read(os.path.join(TESTS, "SpotifyApiResponse.json")),
+            ),
+            "google.com": (
+                "text/html; charset=utf-8",
+                _read(os.path.join(FIXTURES, "google_search.html")),
+            ),
+            "music.apple.com": (
+                "text/html; charset=utf-8",
+                _read(os.path.join(FIXTURES, "apple_music_album.html")),
+            ),
+            "i.scdn.co": ("image/jpeg", _cover()),
+            "youtube.stand-in": ("audio/mp4", self.audio),
+        }
+        self.requests: dict[str, int] = {host: 0 for host in self.routes}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self) -> None:
+                host = self.path.lstrip("/").split("/", 1)[0]
+                if host not in stand_in.routes:
+                    self.send_error(404)
+                    return
+
+                stand_in.requests[host] += 1
+                time.sleep(stand_in.host_latency.get(host, stand_in.latency))
+
+                content_type, body = stand_in.routes[host]
+                # ranged stream requests like pytube's "&range=<start>-<stop>"
+                range_ = parse_qs(urlsplit(self.path).query).get("range")
+                if range_:
+                    start, stop = map(int, range_[0].split("-"))
+                    body = body[start : stop + 1]
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _respond
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        """The base URL of the running server."""
+        assert self._server is not None, "the stand-in is not running"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandIn":
+        """Serve in a background thread."""
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        return
+
+    def session(self) -> Session:
+        """Return a session whose https requests are served by the stand-in."""
+        session = Session()
+        session.mount("https://", StandInAdapter(self.url))
+        return session
+
+    def youtube(self) -> Callable[..., "FakeVideo"]:
+        """Return a `YouTubeAudioDownloader.client` resolving videos locally; their
+        streams are downloaded through a session returned by `StandIn.session`."""
+
+        def client(video_url: str) -> "FakeVideo":
+            video_id = parse_qs(urlsplit(video_url).query).get("v", ["stand-in"])[0]
+            stream = FakeStream(
+                filesize=len(self.audio), default_filename=f"{video_id}.mp4"
+            )
+            return FakeVideo(video_id=video_id, streams=[stream])
+
+        return client
+
+
+class StandInAdapter(HTTPAdapter):
+    """Transport adapter sending https requests to a `StandIn` server."""
+
+    def __init__(self, base_url: str, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request: Any, **kwargs: Any) -> Any:
+        url = urlsplit(request.url)
+        request.url = f"{self.base_url}/{url.netloc}{url.path}"
+        if url.query:
+            request.url += f"?{url.query}"
+        return super().send(request, **kwargs)
+
+
+@dataclass
+class FakeStream:
+    """Audio stream mimicking the `pytube.Stream` attributes used by the downloader."""
+
+    filesize: int
+    default_filename: str
+    type: str = "audio"
+    mime_type: str = "audio/mp4"
+    subtype: str = "mp4"
+    abr: str = "128kbps"
+    audio_codec: str = "mp4a.40.2"
+    url: str = "https://youtube.stand-in/audio.m4a?source=stand-in"
+
+
+@dataclass
+class FakeVideo:
+    """Video mimicking the `pytube.YouTube` attributes used by the downloader."""
+
+    video_id: str
+    streams: list[FakeStream]
+    author: str = "Hasting"
+    title: str = "Fighting For You"
+    length: int = 158
@@ -1,40 +1,51 @@
-from audio_metadata_editor import SpotifyAPI, YouTubeAudioDownloader
+import logging
+
+from audio_metadata_editor import (
+    FingerprintIndex,
+    Instrumentation,
+    LoggingHook,
+    SpotifyAPI,
+    YouTubeAudioDownloader,
+)
+from audio_metadata_editor.pipeline import process
 
 VIDEO_URL: str = "https://www.youtube.com/watch?v=eHZ-Qg7vZvc"
 ADD_MUSIC_METADATA: bool = True
 # ADD_MUSIC_METADATA: bool = False
+SKIP_DUPLICATES: bool = True
+# SKIP_DUPLICATES: bool = False
+ANALYZE_LOUDNESS: bool = True
+# ANALYZE_LOUDNESS: bool = False
 
+logger = logging.getLogger(__name__)
 
-def main() -> None:
-    print("[INFO] Getting YouTube data to download.")
-    ytad = YouTubeAudioDownloader()
-    audio_path = ytad.get_audio(VIDEO_URL)
-    print(f"[INFO] Found audio: `{audio_path}`")
-
-    if not ADD_MUSIC_METADATA:
-        print("[INFO] Metadata skipped.")
-    else:
-        print("[INFO] Collecting metadata, please wait.")
 
-        spotify = SpotifyAPI()
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
+    instrumentation = Instrumentation(hooks=[LoggingHook()])
+
+    logger.info("Getting YouTube data to download.")
+    ytad = YouTubeAudioDownloader(
+        fingerprint_index=FingerprintIndex(),
+        skip_duplicates=SKIP_DUPLICATES,
+        analyze_loudness=ANALYZE_LOUDNESS,
+        instrumentation=instrumentation,
+    )
+
+    spotify = None
+    if ADD_MUSIC_METADATA:
+        spotify = SpotifyAPI(instrumentation=instrumentation)
         if not spotify.is_authenticated():
             spotify.authenticate()
 
-        print("[INFO] Found audio metadata from SpotifyAPI.")
-        y = spotify.search(
-            ytad.video.author,
-            ytad.video.title,
-            # market="US",
-            limit=1,
-        )
-        # print(y)
-        print("[INFO] Adding metadata to audio.")
-        metadata = spotify.to_metadata()
-        if metadata and audio_path:
-            print(metadata)
-            metadata.add_to_m4a(audio_path, autosave=True)
-
-    print("[INFO] Program ended.")
+    result = process(VIDEO_URL, ytad, spotify)
+    logger.info(result)
+    if spotify:
+        spotify.close()
+
+    instrumentation.close()
+    logger.info("Stage timings:\n%s", instrumentation.summary())
+    logger.info("Program ended.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+
+from audio_metadata_editor.cache import LRUCache
+
+
+################
+##  UNITTEST  ##
+################
+class TestLRUCache(unittest.TestCase):
+    def test_memoizes(self) -> None:
+        """Tests that `LRUCache.get` computes a key once."""
+        cache = LRUCache()
+        calls = []
+        for _ in range(3):
+            self.assertEqual(cache.get("a", lambda: calls.append(1) or 42), 42)
+        self.assertEqual(len(calls), 1)
+        self.assertIn("a", cache)
+        return
+
+    def test_eviction(self) -> None:
+        """Tests that the least recently used value is evicted first."""
+        evicted = []
+        cache = LRUCache(maxsize=2, on_evict=evicted.append)
+        cache.get("a", lambda: 1)
+        cache.get("b", lambda: 2)
+        cache.get("a", lambda: 1)  # "b" is now least recently used
+        cache.get("c", lambda: 3)
+        self.assertEqual(evicted, [2])
+        self.assertNotIn("b", cache)
+
+        cache.clear()
+        self.assertEqual(sorted(evicted), [1, 2, 3])
+        self.assertEqual(len(cache), 0)
+        return
+
+    def test_errors_are_not_cached(self) -> None:
+        """Tests that a failed computation is retried on the next `get`."""
+        cache = LRUCache()
+
+        def fail() -> int:
+            raise ConnectionError("timeout")
+
+        with self.assertRaises(ConnectionError):
+            cache.get("a", fail)
+        self.assertEqual(cache.get("a", lambda: 1), 1)
+        return
+
+    def test_concurrent_misses_compute_once(self) -> None:
+        """Tests that concurrent misses of one key share a computation."""
+        cache = LRUCache()
+        calls = []
+
+        def compute() -> str:
+            calls.append(1)
+            time.sleep(0.05)
+            return "album"
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(cache.get("a", compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["album"] * 8)
+        self.assertEqual(len(calls), 1)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
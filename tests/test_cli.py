@@ -0,0 +1,157 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+from unittest import mock
+
+from mutagen import mp4
+
+from audio_metadata_editor.cli import build, main, read_urls, run
+from audio_metadata_editor.jobs import JobQueue
+from audio_metadata_editor.youtube_audio_downloader import YouTubeAudioDownloader
+from benchmarks.stand_in import StandIn
+
+
+@dataclass
+class StubDownloader(YouTubeAudioDownloader):
+    """Downloader 'downloading' every URL not containing "broken"."""
+
+    def get_audio(
+        self,
+        video_url: str,
+        output_file: Optional[str] = None,
+        tag: Optional[Callable[[str], Any]] = None,
+    ) -> str:
+        if "broken" in video_url:
+            raise ConnectionError("video unavailable")
+        self.video = SimpleNamespace(author="Hasting", title=video_url[-1])
+        return os.path.join(self.output_dir or "", f"{video_url[-1]}.m4a")
+
+
+def main_output(argv: list[str]) -> tuple[int, list[dict[str, Any]]]:
+    """Run `main`, returning its exit status and the JSON lines it printed."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output), open(os.devnull, "w") as null:
+        with contextlib.redirect_stderr(null):
+            status = main(argv)
+    return status, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+################
+##  UNITTEST  ##
+################
+class TestCLI(unittest.TestCase):
+    def test_read_urls(self) -> None:
+        """Tests the `read_urls` function."""
+        files = [
+            io.StringIO("# playlist\nhttps://youtu.be/a\n\n  https://youtu.be/b  \n")
+        ]
+        self.assertEqual(
+            list(read_urls(files)), ["https://youtu.be/a", "https://youtu.be/b"]
+        )
+        return
+
+    def test_run(self) -> None:
+        """Tests the `run` function."""
+        output = io.StringIO()
+        urls = [f"https://youtu.be/{i}" for i in range(10)] + ["https://broken/x"]
+        failures = run(
+            iter(urls), StubDownloader(output_dir="music"), workers=2, output=output
+        )
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(r["video_url"] for r in results), sorted(urls))
+        self.assertEqual(
+            {r["path"] for r in results if r["status"] == "ok"},
+            {os.path.join("music", f"{i}.m4a") for i in range(10)},
+        )
+        self.assertEqual([f.video_url for f in failures], ["https://broken/x"])
+        self.assertEqual(failures[0].error, "ConnectionError: video unavailable")
+        return
+
+    def test_shards(self) -> None:
+        """Tests sharded runs, which report only the videos of the run."""
+        with tempfile.TemporaryDirectory() as directory:
+            urls = os.path.join(directory, "urls.txt")
+            with open(urls, "w") as file:
+                file.write("https://broken/a\nhttps://broken/b\n")
+            db = os.path.join(directory, "ytad.db")
+            argv = [urls, "--shards", "2", "--no-metadata", "--db", db]
+
+            status, results = main_output(argv)
+            self.assertEqual(status, 1)
+            self.assertEqual(
+                sorted((r["video_url"], r["status"]) for r in results),
+                [("https://broken/a", "failed"), ("https://broken/b", "failed")],
+            )
+            queue = JobQueue(db)
+            self.assertEqual({job.attempts for job in queue.jobs()}, {1})
+            queue.close()
+
+            # a later run on the same database reports only its own videos
+            with open(urls, "w") as file:
+                file.write("https://broken/c\n")
+            status, results = main_output(argv)
+            self.assertEqual(status, 1)
+            self.assertEqual([r["video_url"] for r in results], ["https://broken/c"])
+        return
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_loudness_without_metadata(self) -> None:
+        """Tests that `--no-metadata --analyze-loudness` still tags the loudness."""
+        stand_in = StandIn().start()
+
+        def build_stand_in(args: Any) -> tuple[YouTubeAudioDownloader, None]:
+            downloader, spotify = build(args)
+            downloader.client, downloader.session = (
+                stand_in.youtube(),
+                stand_in.session(),
+            )
+            return downloader, spotify
+
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                urls = os.path.join(directory, "urls.txt")
+                with open(urls, "w") as file:
+                    file.write("https://www.youtube.com/watch?v=stand-in\n")
+                argv = [urls, "--no-metadata", "--analyze-loudness", "-o", directory]
+
+                with mock.patch("audio_metadata_editor.cli.build", build_stand_in):
+                    status, results = main_output(argv)
+                self.assertEqual(status, 0)
+                self.assertTrue(results[0]["tagged"])
+                tags = mp4.MP4(results[0]["path"]).tags
+                self.assertIn("----:com.apple.iTunes:replaygain_track_gain", tags)
+                self.assertIn("----:com.apple.iTunes:iTunNORM", tags)
+        finally:
+            stand_in.stop()
+        return
+
+    def test_bad_format(self) -> None:
+        """Tests that an invalid `--format` exits with status 2."""
+        with self.assertRaises(SystemExit) as context, open(os.devnull, "w") as null:
+            with contextlib.redirect_stderr(null):
+                main(["--format", "lossless", os.devnull])
+        self.assertEqual(context.exception.code, 2)
+        return
+
+    def test_bad_fingerprints(self) -> None:
+        """Tests that a corrupt `--fingerprints` file is not blamed on `--format`."""
+        with tempfile.TemporaryDirectory() as directory:
+            fingerprints = os.path.join(directory, "fingerprints.json")
+            with open(fingerprints, "w") as file:
+                file.write("{corrupt")
+            with self.assertRaises(ValueError), open(os.devnull, "w") as null:
+                with contextlib.redirect_stderr(null):
+                    main(["--fingerprints", fingerprints, os.devnull])
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import Callable
+
+from audio_metadata_editor.daemon import Daemon, request
+from audio_metadata_editor.jobs import Job, JobQueue
+from audio_metadata_editor.pipeline import TrackResult
+from audio_metadata_editor.rate_limit import RateLimiter
+from audio_metadata_editor.spotify_api import SpotifyAPI
+
+
+class FlakyDaemon(Daemon):
+    """Daemon failing the first attempt of every job instead of downloading."""
+
+    def process(self, job: Job) -> TrackResult:
+        time.sleep(0.01)
+        if job.attempts == 1:
+            return TrackResult(job.url, status="failed", error="HTTPError: 503")
+        return TrackResult(job.url, path=f"{job.id}.m4a")
+
+
+################
+##  UNITTEST  ##
+################
+class TestDaemon(unittest.TestCase):
+    def setUp(self) -> None:
+        """Runs before opening each function."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.daemon = FlakyDaemon(
+            queue=JobQueue(os.path.join(self.directory.name, "jobs.db")),
+            workers=2,
+            backoff=0.0,
+            poll_interval=0.01,
+            socket_path=os.path.join(self.directory.name, "ytad.sock"),
+        )
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        return
+
+    def tearDown(self) -> None:
+        """Runs before closing each function."""
+        self.daemon.stop()
+        self.thread.join(5)
+        self.daemon.queue.close()
+        self.directory.cleanup()
+        return
+
+    def wait_for(self, condition: Callable[[], bool], timeout: float = 5.0) -> None:
+        """Wait until `condition` holds, failing the test after `timeout`."""
+        deadline = time.time() + timeout
+        while not condition():
+            self.assertLess(time.time(), deadline, "timed out")
+            time.sleep(0.01)
+        return
+
+    def test_retries_and_status(self) -> None:
+        """Tests the retries and the "submit", "status" and "job" requests."""
+        self.wait_for(lambda: os.path.exists(self.daemon.socket_path))
+        ids = [
+            request(self.daemon.socket_path, "submit", url=f"https://youtu.be/{i}")[
+                "id"
+            ]
+            for i in range(5)
+        ]
+        self.wait_for(lambda: self.daemon.queue.counts()["done"] == 5)
+
+        status = request(self.daemon.socket_path, "status")
+        self.assertEqual(status["jobs"]["done"], 5)
+        self.assertEqual(status["stages"]["job"]["count"], 10)
+        job = request(self.daemon.socket_path, "job", id=ids[0])
+        self.assertEqual((job["status"], job["attempts"]), ("done", 2))
+        self.assertEqual(job["result"]["path"], f"{ids[0]}.m4a")
+        return
+
+    def test_gives_up(self) -> None:
+        """Tests that a job fails for good after `max_attempts`."""
+        self.daemon.max_attempts = 1
+        job_id = self.daemon.submit("https://youtu.be/a")
+        self.wait_for(lambda: self.daemon.queue.counts()["failed"] == 1)
+        self.assertEqual(self.daemon.queue.get(job_id).error, "HTTPError: 503")
+        return
+
+    def test_bad_request(self) -> None:
+        """Tests that `Daemon.handle` answers an unknown request with an error."""
+        self.assertIn("error", self.daemon.handle({"op": "reboot"}))
+        return
+
+    def test_retry_backoff(self) -> None:
+        """Tests the `Daemon._retry_in` function."""
+        daemon = Daemon(JobQueue(":memory:"), backoff=10.0, max_backoff=25.0)
+        delays = [daemon._retry_in(attempt) for attempt in (1, 2, 3)]
+        self.assertEqual(delays, [10.0, 20.0, None])
+        daemon.max_attempts = 5
+        self.assertEqual(daemon._retry_in(4), 25.0)
+        return
+
+    def test_lost_lease(self) -> None:
+        """Tests that the outcome of a job claimed by another worker is dropped."""
+        queue = JobQueue(os.path.join(self.directory.name, "lost.db"), lease=0.01)
+        daemon = FlakyDaemon(queue)
+        daemon._slots = threading.BoundedSemaphore(1)
+        queue.submit("https://youtu.be/a")
+        stale = queue.claim(daemon.owner)
+        time.sleep(0.05)
+        job = queue.claim("other")
+
+        daemon._slots.acquire()
+        with self.assertLogs("audio_metadata_editor.daemon", "WARNING") as logs:
+            daemon._run(stale)
+        self.assertIn("lost its lease", logs.output[0])
+        self.assertEqual(queue.get(job.id).status, "running")
+        queue.close()
+        return
+
+    def test_drain(self) -> None:
+        """Tests that a draining daemon returns once the queue is empty."""
+        daemon = FlakyDaemon(
+            queue=JobQueue(os.path.join(self.directory.name, "drain.db")),
+            backoff=0.0,
+            poll_interval=0.01,
+            drain=True,
+        )
+        daemon.queue.submit_many(f"https://youtu.be/{i}" for i in range(3))
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(daemon.queue.counts()["done"], 3)
+        daemon.queue.close()
+        return
+
+    def test_spotify_rate_divided(self) -> None:
+        """Tests that `spotify_rate` is divided among the live daemons."""
+        queue = JobQueue(os.path.join(self.directory.name, "drain.db"), lease=0.3)
+        daemon = Daemon(queue, SpotifyAPI(), spotify_rate=10.0)
+        daemon.queue.heartbeat("other")
+        daemon._rate_limiter = daemon.spotify.rate_limiter = RateLimiter(10.0)
+        thread = threading.Thread(target=daemon._heartbeat)
+        thread.start()
+        self.wait_for(lambda: daemon.spotify.rate_limiter.rate == 5.0)
+        self.wait_for(lambda: daemon.spotify.rate_limiter.rate == 10.0)
+        daemon._finished.set()
+        thread.join(5)
+        self.assertEqual(queue.heartbeat("other"), 1)
+        queue.close()
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
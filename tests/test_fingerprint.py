@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from audio_metadata_editor.fingerprint import (
+    SAMPLE_RATE,
+    Fingerprint,
+    FingerprintIndex,
+)
+
+
+def tone(*frequencies: float, seconds: float = 30.0, offset: float = 0.0) -> np.ndarray:
+    """Synthesize a sequence of one-second notes cycling through `frequencies`."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE + offset
+    notes = np.asarray(frequencies)[(t.astype(int)) % len(frequencies)]
+    return (np.sin(2 * np.pi * notes * t) * 10000).astype(np.int16)
+
+
+################
+##  UNITTEST  ##
+################
+class TestFingerprint(unittest.TestCase):
+    def setUp(self) -> None:
+        """Runs before opening each function."""
+        self.directory = tempfile.mkdtemp()
+        return
+
+    def tearDown(self) -> None:
+        """Runs before closing each function."""
+        shutil.rmtree(self.directory)
+        return
+
+    def test_distance(self) -> None:
+        """Tests the `Fingerprint.distance` function."""
+        song = Fingerprint.from_samples(tone(261.6, 329.6, 392.0, 523.3))
+        noisy = tone(261.6, 329.6, 392.0, 523.3, offset=0.1) * 0.5
+        noisy = noisy + np.random.default_rng(0).normal(0, 300, noisy.size)
+        other = Fingerprint.from_samples(tone(293.7, 370.0, 440.0, 466.2, 311.1))
+
+        self.assertEqual(song.distance(song), 0.0)
+        self.assertLess(song.distance(Fingerprint.from_samples(noisy)), 0.2)
+        self.assertGreater(song.distance(other), 0.2)
+        return
+
+    def test_lookup(self) -> None:
+        """Tests the `FingerprintIndex.lookup` function."""
+        filename = os.path.join(self.directory, "fingerprints.json")
+        song = Fingerprint.from_samples(tone(261.6, 329.6, 392.0, 523.3))
+        other = Fingerprint.from_samples(tone(293.7, 370.0, 440.0, 466.2, 311.1))
+
+        index = FingerprintIndex(filename)
+        self.assertIsNone(index.lookup(song))
+        index.add("song.m4a", song, autosave=True)
+        self.assertEqual(index.lookup(song), "song.m4a")
+        self.assertIsNone(index.lookup(other))
+
+        # entries survive a reload and durations must be close to match
+        index = FingerprintIndex(filename)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.lookup(song), "song.m4a")
+        song.duration += 60
+        self.assertIsNone(index.lookup(song))
+        return
+
+    def test_shared_file(self) -> None:
+        """Tests that indexes sharing a file keep each other's entries."""
+        filename = os.path.join(self.directory, "fingerprints.json")
+        song = Fingerprint.from_samples(tone(261.6, 329.6, 392.0, 523.3))
+        other = Fingerprint.from_samples(tone(293.7, 370.0, 440.0, 466.2, 311.1))
+        first, second = FingerprintIndex(filename), FingerprintIndex(filename)
+
+        first.add("song.m4a", song, autosave=True)
+        self.assertEqual(second.lookup(song), "song.m4a")
+        second.add("other.m4a", other, autosave=True)
+
+        def add(index: FingerprintIndex, name: str) -> None:
+            for i in range(20):
+                index.add(f"{name}-{i}.m4a", song, autosave=True)
+            return
+
+        threads = [
+            threading.Thread(target=add, args=(index, name))
+            for index, name in ((first, "first"), (second, "second"))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        reloaded = FingerprintIndex(filename)
+        self.assertEqual(len(reloaded), 42)
+        self.assertEqual(reloaded.lookup(other), "other.m4a")
+        return
+
+    def test_lookup_or_reserve(self) -> None:
+        """Tests that of concurrent near-duplicates exactly one is reserved."""
+        filename = os.path.join(self.directory, "fingerprints.json")
+        song = Fingerprint.from_samples(tone(261.6, 329.6, 392.0, 523.3))
+        indexes = [FingerprintIndex(filename), FingerprintIndex(filename)]
+        barrier = threading.Barrier(8)
+        duplicates = {}
+
+        def reserve(i: int) -> None:
+            barrier.wait()
+            duplicates[i] = indexes[i % 2].lookup_or_reserve(f"{i}.m4a", song)
+            return
+
+        threads = [threading.Thread(target=reserve, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        reserved = [i for i, duplicate in duplicates.items() if duplicate is None]
+        self.assertEqual(len(reserved), 1)
+        self.assertEqual(
+            {duplicates[i] for i in duplicates if i not in reserved},
+            {f"{reserved[0]}.m4a"},
+        )
+        self.assertEqual(FingerprintIndex(filename).keys, [f"{reserved[0]}.m4a"])
+
+        # a released reservation is dropped by the indexes sharing the file
+        indexes[reserved[0] % 2].release(f"{reserved[0]}.m4a")
+        self.assertIsNone(indexes[(reserved[0] + 1) % 2].lookup(song))
+        self.assertEqual(len(FingerprintIndex(filename)), 0)
+        return
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_from_file(self) -> None:
+        """Tests the `Fingerprint.from_file` function."""
+        reencoded = os.path.join(self.directory, "test_audio_1.mp3")
+        os.system(
+            f'ffmpeg -v error -ss 2 -i tests/test_audio_1.m4a -vn -b:a 64k "{reencoded}"'
+        )
+
+        index = FingerprintIndex(None)
+        index.add(
+            "tests/test_audio_1.m4a", Fingerprint.from_file("tests/test_audio_1.m4a")
+        )
+        index.add(
+            "tests/test_audio_2.mp3", Fingerprint.from_file("tests/test_audio_2.mp3")
+        )
+
+        self.assertEqual(
+            index.lookup(Fingerprint.from_file(reencoded)), "tests/test_audio_1.m4a"
+        )
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
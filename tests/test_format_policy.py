@@ -0,0 +1,63 @@
+import unittest
+from types import SimpleNamespace
+
+from audio_metadata_editor.format_policy import FormatPolicy
+
+STREAMS = [
+    SimpleNamespace(type="video", mime_type="video/mp4", abr=None),
+    SimpleNamespace(type="audio", mime_type="audio/mp4", abr="48kbps"),
+    SimpleNamespace(type="audio", mime_type="audio/mp4", abr="128kbps"),
+    SimpleNamespace(type="audio", mime_type="audio/webm", abr="50kbps"),
+    SimpleNamespace(type="audio", mime_type="audio/webm", abr="70kbps"),
+    SimpleNamespace(type="audio", mime_type="audio/webm", abr="160kbps"),
+]
+
+
+################
+##  UNITTEST  ##
+################
+class TestFormatPolicy(unittest.TestCase):
+    def test_select(self) -> None:
+        """Tests the `FormatPolicy.select` function."""
+        self.assertIs(FormatPolicy().select(STREAMS), STREAMS[2])
+        self.assertIs(FormatPolicy(prefer="lowest").select(STREAMS), STREAMS[1])
+        self.assertIs(FormatPolicy.mobile(64).select(STREAMS), STREAMS[4])
+        # no stream reaches the target, take the closest one below it
+        self.assertIs(FormatPolicy.mobile(320).select(STREAMS), STREAMS[5])
+        self.assertIs(
+            FormatPolicy(mime_types=("audio/ogg", "audio/mp4")).select(STREAMS),
+            STREAMS[2],
+        )
+        self.assertIsNone(FormatPolicy(mime_types=("audio/ogg",)).select(STREAMS))
+        self.assertRaises(ValueError, FormatPolicy, prefer="smallest")
+        return
+
+    def test_extension(self) -> None:
+        """Tests the `FormatPolicy.extension` function."""
+        self.assertEqual(FormatPolicy().extension(STREAMS[2]), ".m4a")
+        self.assertEqual(FormatPolicy.mobile().extension(STREAMS[4]), ".opus")
+        self.assertEqual(FormatPolicy(container="ogg").extension(STREAMS[4]), ".ogg")
+        self.assertEqual(FormatPolicy().output_options(), {})
+        self.assertEqual(
+            FormatPolicy.mobile().output_options(), {"acodec": "copy", "vn": None}
+        )
+        return
+
+    def test_from_option(self) -> None:
+        """Tests the `FormatPolicy.from_option` function."""
+        self.assertEqual(FormatPolicy.from_option(None), FormatPolicy())
+        self.assertEqual(FormatPolicy.from_option("default"), FormatPolicy())
+        self.assertEqual(FormatPolicy.from_option("mobile"), FormatPolicy.mobile())
+        self.assertEqual(
+            FormatPolicy.from_option({"mime_types": ["audio/webm"], "codec": "copy"}),
+            FormatPolicy(mime_types=("audio/webm",), codec="copy"),
+        )
+        self.assertEqual(
+            FormatPolicy.from_option('{"target_abr": 96}'), FormatPolicy(target_abr=96)
+        )
+        self.assertRaises(ValueError, FormatPolicy.from_option, "lossless")
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+import unittest
+
+import audio_metadata_editor
+
+HEAVY_MODULES = ("bs4", "ffmpeg", "numpy", "PIL", "pytube", "requests")
+
+
+def loaded_modules(statement: str) -> list[str]:
+    """Return the heavy modules loaded by `statement` in a fresh interpreter."""
+    probe = (
+        f"import json, sys\n{statement}\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, check=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+################
+##  UNITTEST  ##
+################
+class TestImports(unittest.TestCase):
+    def test_package_import_is_light(self) -> None:
+        """Tests that importing the package loads no heavy module."""
+        self.assertEqual(loaded_modules("import audio_metadata_editor"), [])
+        return
+
+    def test_metadata_import_is_light(self) -> None:
+        """Tests that importing `Metadata` loads no heavy module."""
+        self.assertEqual(
+            loaded_modules("from audio_metadata_editor import Metadata"), []
+        )
+        return
+
+    def test_spotify_api_defers_scraping_modules(self) -> None:
+        """Tests that importing `SpotifyAPI` defers requests, bs4 and PIL."""
+        self.assertEqual(
+            loaded_modules("from audio_metadata_editor import SpotifyAPI"), []
+        )
+        return
+
+    def test_lazy_exports(self) -> None:
+        """Tests the lazy `__getattr__` and `__dir__` of the package."""
+        for name in audio_metadata_editor.__all__:
+            self.assertTrue(hasattr(audio_metadata_editor, name), name)
+        self.assertIs(
+            audio_metadata_editor.YTAD, audio_metadata_editor.YouTubeAudioDownloader
+        )
+        self.assertIn("Metadata", dir(audio_metadata_editor))
+        return
+
+    def test_unknown_attribute(self) -> None:
+        """Tests that an unknown package attribute raises AttributeError."""
+        with self.assertRaises(AttributeError):
+            audio_metadata_editor.Missing
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import io
+import json
+import unittest
+
+from audio_metadata_editor.instrumentation import (
+    RESERVOIR_SIZE,
+    Instrumentation,
+    JsonLinesHook,
+    PrometheusHook,
+)
+
+
+################
+##  UNITTEST  ##
+################
+class TestInstrumentation(unittest.TestCase):
+    def test_span(self) -> None:
+        """Tests the `Instrumentation.span` function."""
+        stream = io.StringIO()
+        instrumentation = Instrumentation(hooks=[JsonLinesHook(stream)])
+
+        with instrumentation.span("download", url="u") as span:
+            span["bytes"] = 1024
+        with self.assertRaises(KeyError):
+            with instrumentation.span("convert"):
+                raise KeyError
+
+        download, convert = map(json.loads, stream.getvalue().splitlines())
+        self.assertEqual(download["stage"], "download")
+        self.assertEqual(download["attributes"]["url"], "u")
+        self.assertEqual(download["attributes"]["bytes"], 1024)
+        self.assertIn("bytes_per_second", download["attributes"])
+        self.assertEqual(convert["attributes"], {"error": "KeyError"})
+        return
+
+    def test_report(self) -> None:
+        """Tests the `Instrumentation.report` function."""
+        instrumentation = Instrumentation()
+        for duration in range(1, 101):
+            instrumentation.record("convert", float(duration))
+        instrumentation.record("download", 2.0, bytes=4096)
+
+        report = instrumentation.report()
+        self.assertEqual(report["convert"]["count"], 100)
+        self.assertAlmostEqual(report["convert"]["p50"], 50.5)
+        self.assertAlmostEqual(report["convert"]["p95"], 95.05)
+        self.assertEqual(report["convert"]["max"], 100.0)
+        self.assertEqual(report["download"]["bytes_per_second"], 2048.0)
+        self.assertIn("convert", instrumentation.summary())
+        return
+
+    def test_report_bounded(self) -> None:
+        """Tests that `Instrumentation.report` samples at most `RESERVOIR_SIZE`."""
+        instrumentation = Instrumentation()
+        count = 10 * RESERVOIR_SIZE
+        for duration in range(count):
+            instrumentation.record("job", duration / count)
+
+        self.assertEqual(len(instrumentation._stages["job"].samples), RESERVOIR_SIZE)
+        report = instrumentation.report()["job"]
+        self.assertEqual(report["count"], count)
+        self.assertAlmostEqual(report["total"], (count - 1) / 2)
+        self.assertEqual(report["max"], (count - 1) / count)
+        self.assertAlmostEqual(report["p50"], 0.5, delta=0.1)
+        self.assertAlmostEqual(report["p95"], 0.95, delta=0.05)
+        return
+
+    def test_prometheus_hook(self) -> None:
+        """Tests the `PrometheusHook.render` function."""
+        hook = PrometheusHook("metrics.prom")
+        instrumentation = Instrumentation(hooks=[hook])
+        instrumentation.record("tag", 0.5)
+        instrumentation.record("tag", 0.25)
+
+        self.assertIn(
+            'ytad_stage_duration_seconds_sum{stage="tag"} 0.75', hook.render()
+        )
+        self.assertIn('ytad_stage_duration_seconds_count{stage="tag"} 2', hook.render())
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
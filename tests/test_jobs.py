@@ -0,0 +1,210 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+from audio_metadata_editor.jobs import JobQueue
+
+
+def claim_all(filename: str, owner: str) -> None:
+    """Claim and complete jobs until none is ready; the target of a process."""
+    queue = JobQueue(filename)
+    while (job := queue.claim(owner)) is not None:
+        queue.complete(job, {"owner": owner})
+    queue.close()
+    return
+
+
+################
+##  UNITTEST  ##
+################
+class TestJobQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        """Runs before opening each function."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.directory.name, "jobs.db"))
+        return
+
+    def tearDown(self) -> None:
+        """Runs before closing each function."""
+        self.queue.close()
+        self.directory.cleanup()
+        return
+
+    def test_submit_claim_complete(self) -> None:
+        """Tests the `JobQueue.submit`, `claim` and `complete` functions."""
+        job_id = self.queue.submit("https://youtu.be/a", output_dir="music")
+        job = self.queue.claim("worker")
+        self.assertEqual((job.id, job.url), (job_id, "https://youtu.be/a"))
+        self.assertEqual(job.options, {"output_dir": "music"})
+        self.assertEqual((job.status, job.attempts), ("running", 1))
+        self.assertEqual(job.owner, "worker")
+        self.assertIsNone(self.queue.claim("worker"))
+
+        self.assertTrue(self.queue.complete(job, {"path": "a.m4a"}))
+        self.assertEqual(self.queue.get(job_id).result, {"path": "a.m4a"})
+        self.assertEqual(self.queue.counts()["done"], 1)
+        return
+
+    def test_claims_in_order(self) -> None:
+        """Tests that `JobQueue.claim` returns the oldest job first."""
+        first = self.queue.submit("https://youtu.be/a")
+        second = self.queue.submit("https://youtu.be/b")
+        self.assertEqual(self.queue.claim("worker").id, first)
+        self.assertEqual(self.queue.claim("worker").id, second)
+        return
+
+    def test_retry_waits_for_backoff(self) -> None:
+        """Tests that a job failed with `retry_in` is claimable after it."""
+        self.queue.submit("https://youtu.be/a")
+        job = self.queue.claim("worker")
+        self.assertTrue(self.queue.fail(job, "HTTPError", retry_in=0.05))
+        self.assertEqual(self.queue.get(job.id).status, "queued")
+        self.assertIsNone(self.queue.claim("worker"))
+
+        time.sleep(0.06)
+        self.assertEqual(self.queue.claim("worker").attempts, 2)
+        return
+
+    def test_fail_for_good(self) -> None:
+        """Tests that a job failed without `retry_in` is not claimed again."""
+        self.queue.submit("https://youtu.be/a")
+        job = self.queue.claim("worker")
+        self.queue.fail(job, "HTTPError")
+        self.assertEqual(self.queue.get(job.id).status, "failed")
+        self.assertEqual(self.queue.get(job.id).error, "HTTPError")
+        self.assertIsNone(self.queue.claim("worker"))
+        return
+
+    def test_expired_lease_is_reclaimed(self) -> None:
+        """Tests that the job of a dead worker is claimed again."""
+        self.queue.lease = 0.01
+        self.queue.submit("https://youtu.be/a")
+        self.queue.claim("dead worker")
+        time.sleep(0.05)
+        job = self.queue.claim("worker")
+        self.assertEqual(job.attempts, 2)
+        return
+
+    def test_lost_lease_is_not_recorded(self) -> None:
+        """Tests that a worker whose job was claimed again cannot record it."""
+        self.queue.lease = 0.01
+        self.queue.submit("https://youtu.be/a")
+        stale = self.queue.claim("slow worker")
+        time.sleep(0.05)
+        job = self.queue.claim("worker")
+
+        self.assertFalse(self.queue.complete(stale, {"path": "stale.m4a"}))
+        self.assertFalse(self.queue.fail(stale, "HTTPError", retry_in=0.0))
+        self.assertEqual(self.queue.get(job.id).status, "running")
+        self.assertTrue(self.queue.complete(job, {"path": "a.m4a"}))
+        self.assertFalse(self.queue.complete(job, {"path": "again.m4a"}))
+        self.assertEqual(self.queue.get(job.id).result, {"path": "a.m4a"})
+        return
+
+    def test_expired_lease_fails_after_max_attempts(self) -> None:
+        """Tests that a job crashing its workers is not claimed forever."""
+        self.queue.lease = 0.01
+        self.queue.submit("https://youtu.be/a")
+        for _ in range(2):
+            self.assertIsNotNone(self.queue.claim("crashing worker", max_attempts=2))
+            time.sleep(0.05)
+
+        self.assertIsNone(self.queue.claim("worker", max_attempts=2))
+        job = self.queue.jobs()[0]
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertEqual(job.error, "Lease expired after 2 attempts")
+        return
+
+    def test_persists(self) -> None:
+        """Tests that queued jobs survive reopening the database."""
+        self.queue.submit("https://youtu.be/a")
+        reopened = JobQueue(self.queue.filename)
+        self.assertEqual(reopened.counts()["queued"], 1)
+        reopened.close()
+        return
+
+    def test_submit_many_skips_queued(self) -> None:
+        """Tests that `JobQueue.submit_many` only queues new or failed videos."""
+        urls = ["https://youtu.be/a", "https://youtu.be/b", "https://youtu.be/a"]
+        first = self.queue.submit_many(urls)
+        self.assertEqual(list(first), urls[:2])
+        job = self.queue.claim("worker")
+        self.queue.fail(job, "HTTPError")
+
+        again = self.queue.submit_many(urls)
+        self.assertNotEqual(again[job.url], first[job.url])
+        self.assertEqual(again["https://youtu.be/b"], first["https://youtu.be/b"])
+        self.assertEqual(len(self.queue.jobs()), 3)
+        return
+
+    def test_heartbeat_renews_leases(self) -> None:
+        """Tests the `JobQueue.heartbeat` and `leave` functions."""
+        self.queue.lease = 0.05
+        self.queue.submit("https://youtu.be/a")
+        job = self.queue.claim("worker")
+        for _ in range(4):
+            time.sleep(0.02)
+            self.assertEqual(self.queue.heartbeat("worker"), 1)
+        self.assertIsNone(self.queue.claim("other"))
+        self.assertEqual(self.queue.heartbeat("other"), 2)
+
+        time.sleep(0.06)
+        self.assertEqual(self.queue.heartbeat("other"), 1)
+        self.assertEqual(self.queue.claim("other").id, job.id)
+        self.queue.leave("other")
+        self.assertEqual(self.queue.heartbeat("worker"), 1)
+        return
+
+    def test_drained(self) -> None:
+        """Tests the `JobQueue.drained` and `jobs` functions."""
+        self.assertTrue(self.queue.drained())
+        self.queue.submit("https://youtu.be/a")
+        self.assertFalse(self.queue.drained())
+        job = self.queue.claim("worker")
+        self.assertFalse(self.queue.drained())
+        self.queue.complete(job, {})
+        self.assertTrue(self.queue.drained())
+        self.assertEqual([job.status for job in self.queue.jobs()], ["done"])
+        self.assertEqual(self.queue.jobs("queued"), [])
+        return
+
+    def test_jobs_by_ids(self) -> None:
+        """Tests that `JobQueue.jobs` reads only the given IDs, in batches."""
+        ids = list(
+            self.queue.submit_many(
+                f"https://youtu.be/{i}" for i in range(1200)
+            ).values()
+        )
+        self.queue.complete(self.queue.claim("worker"), {})
+
+        picked = ids[1:1101]
+        self.assertEqual([job.id for job in self.queue.jobs(ids=picked)], picked)
+        self.assertEqual(self.queue.jobs(ids=[]), [])
+        self.assertEqual(self.queue.jobs("done", ids=ids[:2]), [self.queue.get(ids[0])])
+        return
+
+    def test_processes_claim_once(self) -> None:
+        """Tests that processes sharing the database claim every job once."""
+        urls = [f"https://youtu.be/{i}" for i in range(40)]
+        self.queue.submit_many(urls)
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=claim_all, args=(self.queue.filename, f"p{i}"))
+            for i in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+
+        jobs = self.queue.jobs()
+        self.assertEqual([job.url for job in jobs], urls)
+        self.assertEqual({job.status for job in jobs}, {"done"})
+        self.assertEqual({job.attempts for job in jobs}, {1})
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
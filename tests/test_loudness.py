@@ -0,0 +1,50 @@
+import unittest
+
+from audio_metadata_editor.loudness import Loudness
+
+EBUR128_LOG = """\
+size=    2651KiB time=00:02:46.06 bitrate= 130.8kbits/s speed=18.2x
+[Parsed_ebur128_0 @ 0x7fc304001d40] Summary:
+
+  Integrated loudness:
+    I:         -10.3 LUFS
+    Threshold: -20.4 LUFS
+
+  Loudness range:
+    LRA:         6.7 LU
+    Threshold: -30.4 LUFS
+    LRA low:   -14.4 LUFS
+    LRA high:   -7.7 LUFS
+
+  True peak:
+    Peak:        2.6 dBFS
+[out#0/ipod @ 0x2f774ac0] video:0KiB audio:2622KiB subtitle:0KiB
+"""
+
+
+################
+##  UNITTEST  ##
+################
+class TestLoudness(unittest.TestCase):
+    def test_from_ebur128(self) -> None:
+        """Tests the `Loudness.from_ebur128` function."""
+        self.assertEqual(
+            Loudness.from_ebur128(EBUR128_LOG),
+            Loudness(integrated=-10.3, true_peak=2.6, loudness_range=6.7),
+        )
+        self.assertIsNone(Loudness.from_ebur128("size=    2651KiB"))
+        return
+
+    def test_tags(self) -> None:
+        """Tests the `Loudness.tags` function."""
+        tags = Loudness(integrated=-10.3, true_peak=2.6).tags()
+
+        self.assertEqual(tags["replaygain_track_gain"], "-7.70 dB")
+        self.assertEqual(tags["replaygain_track_peak"], "1.348963")
+        self.assertEqual(len(tags["itunnorm"].split()), 10)
+        self.assertTrue(tags["itunnorm"].startswith(" 00001700 00001700"))
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from typing import Optional
+
+from audio_metadata_editor.lyrics import (
+    LocalLyricsProvider,
+    Lyrics,
+    LyricsProvider,
+    LyricsQuery,
+    strip_lrc,
+)
+
+LRC = """[ar: Hasting]
+[ti: Fighting For You]
+[00:12.00]I keep fighting for you
+[00:15.30]Every single night
+
+[00:20.10]Fighting for you
+"""
+
+QUERY = LyricsQuery(
+    title="Fighting For You", artist="Hasting", isrc="CAI370611475", track_id="6NnW"
+)
+
+
+class CountingProvider(LyricsProvider):
+    """Provider returning fixed lyrics, or raising `error`, and counting calls."""
+
+    def __init__(
+        self,
+        lyrics: Optional[str] = None,
+        delay: float = 0.0,
+        error: Optional[Exception] = None,
+    ) -> None:
+        self.lyrics, self.delay, self.error = lyrics, delay, error
+        self.calls = 0
+
+    def fetch(self, query: LyricsQuery) -> Optional[str]:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.lyrics
+
+
+################
+##  UNITTEST  ##
+################
+class TestLyrics(unittest.TestCase):
+    def test_strip_lrc(self) -> None:
+        """Tests the `strip_lrc` function."""
+        self.assertEqual(
+            strip_lrc(LRC),
+            "I keep fighting for you\nEvery single night\n\nFighting for you",
+        )
+        return
+
+    def test_local_provider(self) -> None:
+        """Tests the `LocalLyricsProvider.fetch` function."""
+        with tempfile.TemporaryDirectory() as directory:
+            provider = LocalLyricsProvider(directory)
+            self.assertIsNone(provider.fetch(QUERY))
+
+            with open(
+                os.path.join(directory, "Hasting - Fighting For You.txt"), "w"
+            ) as file:
+                file.write("plain lyrics\n")
+            self.assertEqual(provider.fetch(QUERY), "plain lyrics")
+
+            with open(os.path.join(directory, "CAI370611475.lrc"), "w") as file:
+                file.write(LRC)
+            self.assertTrue(provider.fetch(QUERY).startswith("I keep fighting"))
+        return
+
+    def test_providers_in_order(self) -> None:
+        """Tests that `Lyrics.get` asks the providers in order."""
+        empty, found = CountingProvider(), CountingProvider("la la")
+        lyrics = Lyrics([empty, found])
+        self.assertEqual(lyrics.get(QUERY), "la la")
+        self.assertEqual((empty.calls, found.calls), (1, 1))
+        return
+
+    def test_cache(self) -> None:
+        """Tests that `Lyrics.get` caches misses too and evicts the oldest."""
+        provider = CountingProvider()
+        lyrics = Lyrics([provider], maxsize=2)
+        for _ in range(3):
+            self.assertIsNone(lyrics.get(QUERY))
+        self.assertEqual(provider.calls, 1)
+
+        lyrics.get(LyricsQuery("a", "b", isrc="A"))
+        lyrics.get(LyricsQuery("c", "d", isrc="C"))
+        self.assertEqual(len(lyrics), 2)
+        lyrics.get(QUERY)  # evicted, fetched again
+        self.assertEqual(provider.calls, 4)
+        return
+
+    def test_failure_not_cached(self) -> None:
+        """Tests that `Lyrics.get` logs and does not cache provider errors."""
+        provider = CountingProvider(error=ConnectionError("timeout"))
+        lyrics = Lyrics([provider])
+        with self.assertLogs("audio_metadata_editor.lyrics", "WARNING"):
+            self.assertIsNone(lyrics.get(QUERY))
+            self.assertIsNone(lyrics.get(QUERY))
+        self.assertEqual(provider.calls, 2)
+        return
+
+    def test_concurrent_lookups_share_a_fetch(self) -> None:
+        """Tests that concurrent `Lyrics.get` calls of one track fetch once."""
+        provider = CountingProvider("la la", delay=0.05)
+        lyrics = Lyrics([provider])
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(lyrics.get(QUERY)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["la la"] * 8)
+        self.assertEqual(provider.calls, 1)
+        return
+
+    def test_provider_interface(self) -> None:
+        """Tests that a provider not implementing `fetch` cannot be created."""
+
+        class Forgetful(LyricsProvider):
+            pass
+
+        with self.assertRaises(TypeError):
+            Forgetful()
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from audio_metadata_editor.format_policy import FormatPolicy
+from audio_metadata_editor.manifest import DownloadManifest
+from audio_metadata_editor.youtube_audio_downloader import YouTubeAudioDownloader
+from benchmarks.stand_in import StandIn
+
+
+################
+##  UNITTEST  ##
+################
+class TestDownloadManifest(unittest.TestCase):
+    def test_record(self) -> None:
+        """Tests that entries are appended and the latest one of a path found."""
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = DownloadManifest(os.path.join(directory, "manifest.jsonl"))
+            self.assertEqual(list(manifest), [])
+            self.assertIsNone(manifest.find("a.m4a"))
+
+            manifest.record("a.m4a", source_sha256="1" * 64, bytes=10)
+            manifest.record("b.m4a", source_sha256="2" * 64, bytes=20)
+            manifest.record("a.m4a", source_sha256="3" * 64, bytes=30)
+
+            self.assertEqual(
+                [entry["path"] for entry in manifest], ["a.m4a", "b.m4a", "a.m4a"]
+            )
+            entry = manifest.find("a.m4a")
+            self.assertEqual((entry["source_sha256"], entry["bytes"]), ("3" * 64, 30))
+            self.assertIn("time", entry)
+        return
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_stream_hashed(self) -> None:
+        """Tests that the recorded SHA-256 is the one of the downloaded stream."""
+        stand_in = StandIn().start()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                manifest = DownloadManifest(os.path.join(directory, "manifest.jsonl"))
+                downloader = YouTubeAudioDownloader(
+                    output_dir=directory,
+                    temp_dir=directory,
+                    client=stand_in.youtube(),
+                    session=stand_in.session(),
+                    format_policy=FormatPolicy(codec="copy"),
+                    manifest=manifest,
+                )
+
+                def tag(filename: str) -> None:
+                    with open(filename, "ab") as file:
+                        file.write(b"tags")
+                    return
+
+                path = downloader.get_audio(
+                    "https://www.youtube.com/watch?v=stand-in", tag=tag
+                )
+                entry = manifest.find(path)
+                expected = hashlib.sha256(stand_in.audio).hexdigest()
+                self.assertEqual(entry["source_sha256"], expected)
+                self.assertEqual(downloader.source_sha256, expected)
+                self.assertNotIn("sha256", entry)
+        finally:
+            stand_in.stop()
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
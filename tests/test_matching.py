@@ -0,0 +1,99 @@
+import unittest
+
+import numpy as np
+
+from audio_metadata_editor.matching import (
+    DIMENSIONS,
+    best_match,
+    normalize,
+    parse_video,
+    score,
+    similarity,
+    split_features,
+    vectorize,
+    version_tokens,
+    video_query,
+)
+
+
+################
+##  UNITTEST  ##
+################
+class TestMatching(unittest.TestCase):
+    def test_normalize(self) -> None:
+        """Tests unicode folding, noise removal and feature tokens."""
+        self.assertEqual(normalize("Beyoncé - Halo (Official Video)"), "beyonce halo")
+        self.assertEqual(normalize("Song [Lyrics] ft. A & B"), "song feat a and b")
+        self.assertEqual(normalize("Song (Acoustic Version)"), "song acoustic version")
+        self.assertEqual(normalize("ＲＯＳÉ"), "rose")
+        return
+
+    def test_split_features(self) -> None:
+        """Tests splitting the featured artists off a title."""
+        self.assertEqual(split_features("Song (feat. A & B)"), ("song", ["a", "b"]))
+        self.assertEqual(split_features("Song"), ("song", []))
+        return
+
+    def test_parse_video(self) -> None:
+        """Tests guessing the artist and title of a video."""
+        self.assertEqual(
+            parse_video("HastingVEVO", "Fighting For You (Official Audio)"),
+            ("hasting", "fighting for you"),
+        )
+        self.assertEqual(
+            parse_video("Label", "Hasting - Fighting For You [Lyrics]"),
+            ("hasting", "fighting for you"),
+        )
+        return
+
+    def test_video_query(self) -> None:
+        """Tests that the featured artists follow the artist, as on Spotify."""
+        self.assertEqual(
+            video_query("HastingVEVO", "Hasting - Fighting For You ft. Lena"),
+            "hasting lena fighting for you",
+        )
+        self.assertEqual(
+            video_query("Hasting - Topic", "Fighting For You (Official Video)"),
+            "hasting fighting for you",
+        )
+        return
+
+    def test_vectorize(self) -> None:
+        """Tests that the vectors are unit length, or zero for empty texts."""
+        vectors = vectorize(["fighting for you", ""])
+        self.assertEqual(vectors.shape, (2, DIMENSIONS))
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertFalse(vectors[1].any())
+        return
+
+    def test_similarity(self) -> None:
+        """Tests the batched similarity matrix."""
+        scores = similarity(["fighting for you", "halo"], ["halo", "fighting for me"])
+        self.assertEqual(scores.shape, (2, 2))
+        self.assertAlmostEqual(float(scores[1, 0]), 1.0, places=5)
+        self.assertGreater(scores[0, 1], scores[0, 0])
+        return
+
+    def test_best_match(self) -> None:
+        """Tests ranking Spotify results against a video, versions included."""
+        candidates = [
+            "Riley Clemmons Fighting For Me",
+            "Tenth Avenue North Fighting For You",
+            "Hasting Fighting For You - Acoustic",
+            "Hasting Fighting For You",
+        ]
+        self.assertEqual(
+            best_match("Hasting, Fighting For You (Official)", candidates), 3
+        )
+        self.assertEqual(
+            best_match("Hasting - Fighting For You (Acoustic)", candidates), 2
+        )
+        self.assertIsNone(best_match("anything", []))
+        self.assertIsNone(best_match("zzz", ["qqq"]))
+        self.assertLess(score("song", ["song remix"])[0], score("song", ["songs"])[0])
+        self.assertEqual(version_tokens("summer mix"), frozenset())
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
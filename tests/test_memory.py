@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from typing import Any, Iterator
+from urllib.parse import parse_qs, urlsplit
+
+from audio_metadata_editor.format_policy import FormatPolicy
+from audio_metadata_editor.memory import MemoryBudget, download
+from audio_metadata_editor.youtube_audio_downloader import YouTubeAudioDownloader
+from benchmarks.stand_in import StandIn
+
+
+class FakeResponse:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    def __enter__(self) -> "FakeResponse":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return
+
+    def raise_for_status(self) -> None:
+        return
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for start in range(0, len(self.body), chunk_size):
+            yield self.body[start : start + chunk_size]
+
+
+class FakeSession:
+    """Serves the `range` query parameter of a stream like YouTube does."""
+
+    def __init__(self, body: bytes) -> None:
+        self.body, self.ranges = body, []
+
+    def get(self, url: str, **kwargs: Any) -> FakeResponse:
+        start, stop = map(int, parse_qs(urlsplit(url).query)["range"][0].split("-"))
+        self.ranges.append((start, stop))
+        return FakeResponse(self.body[start : stop + 1])
+
+
+################
+##  UNITTEST  ##
+################
+class TestDownload(unittest.TestCase):
+    def test_ranges(self) -> None:
+        """Tests that a stream is requested in ranges and read in chunks."""
+        body = os.urandom(2500)
+        session = FakeSession(body)
+        chunks: list[bytes] = []
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "audio.mp4")
+            size = download(
+                session,
+                "https://stream/?id=1",
+                filename,
+                len(body),
+                500,
+                chunks.append,
+                range_size=1000,
+            )
+            with open(filename, "rb") as file:
+                self.assertEqual(file.read(), body)
+        self.assertEqual(size, len(body))
+        self.assertEqual(session.ranges, [(0, 999), (1000, 1999), (2000, 2499)])
+        self.assertEqual(list(map(len, chunks)), [500] * 5)
+        return
+
+    def test_truncated(self) -> None:
+        """Tests that a stream shorter than its size raises instead of looping."""
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "audio.mp4")
+            with self.assertRaises(IOError):
+                download(
+                    FakeSession(b"x" * 10), "https://stream/", filename, 20, 8, None, 8
+                )
+        return
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_reserve(self) -> None:
+        """Tests that reservations wait while they would exceed the limit."""
+        budget = MemoryBudget(10)
+        order: list[str] = []
+
+        def job(name: str, nbytes: int, hold: float) -> None:
+            with budget.reserve(nbytes):
+                order.append(f"{name}+")
+                time.sleep(hold)
+                order.append(f"{name}-")
+            return
+
+        first = threading.Thread(target=job, args=("a", 6, 0.2))
+        first.start()
+        time.sleep(0.05)
+        second = threading.Thread(target=job, args=("b", 6, 0.0))
+        second.start()
+        for thread in (first, second):
+            thread.join()
+
+        self.assertEqual(order, ["a+", "a-", "b+", "b-"])
+        self.assertEqual(budget.in_flight, 0)
+        return
+
+    def test_first_come_first_served(self) -> None:
+        """Tests that small jobs arriving later do not overtake a large one."""
+        budget = MemoryBudget(10)
+        order: list[str] = []
+
+        def job(name: str, nbytes: int, hold: float) -> None:
+            with budget.reserve(nbytes):
+                order.append(f"{name}+")
+                time.sleep(hold)
+                order.append(f"{name}-")
+            return
+
+        threads = []
+        for name, nbytes, hold in (("a", 6, 0.2), ("large", 10, 0.05), ("b", 2, 0.0)):
+            threads.append(threading.Thread(target=job, args=(name, nbytes, hold)))
+            threads[-1].start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ["a+", "a-", "large+", "large-", "b+", "b-"])
+        self.assertEqual(budget.in_flight, 0)
+        return
+
+    def test_oversized(self) -> None:
+        """Tests that a job larger than the budget runs once nothing is in flight."""
+        budget = MemoryBudget(10)
+        with budget.reserve(25):
+            self.assertEqual(budget.in_flight, 25)
+        self.assertEqual(budget.in_flight, 0)
+        return
+
+
+class TestDownloaderBudget(unittest.TestCase):
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_released_before_tagging(self) -> None:
+        """Tests that a video holds its reservation until tagging, not during it."""
+        stand_in = StandIn().start()
+        budget = MemoryBudget(64 * 1024 * 1024)
+        in_flight: list[int] = []
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                downloader = YouTubeAudioDownloader(
+                    output_dir=directory,
+                    temp_dir=directory,
+                    client=stand_in.youtube(),
+                    session=stand_in.session(),
+                    memory_budget=budget,
+                    format_policy=FormatPolicy(codec="copy"),
+                )
+                path = downloader.get_audio(
+                    "https://www.youtube.com/watch?v=stand-in",
+                    tag=lambda filename: in_flight.append(budget.in_flight),
+                )
+                self.assertTrue(os.path.exists(path))
+        finally:
+            stand_in.stop()
+        self.assertEqual(in_flight, [0])
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,13 @@
 import json
+import os
+import shutil
+import tempfile
 import unittest
 from typing import Any
 
 from mutagen import id3, mp4
 
-from audio_metadata_editor.metadata import AudioType, Metadata
+from audio_metadata_editor.metadata import PADDING, AudioType, Metadata
 
 
 ################
@@ -118,6 +121,63 @@ class TestMetadata(unittest.TestCase):
         del metadata
         return
 
+    def test_add_to_m4a_in_place(self) -> None:
+        """Tests that tagging an M4A with its `moov` at the end never moves the
+        audio data, and that later growth fits the reserved padding."""
+        with tempfile.TemporaryDirectory() as directory:
+            audio = os.path.join(directory, "audio.m4a")
+            shutil.copyfile("tests/test_audio_1.m4a", audio)
+
+            def layout() -> list[tuple[bytes, int]]:
+                with open(audio, "rb") as file:
+                    return [(atom.name, atom.offset) for atom in mp4.Atoms(file).atoms]
+
+            before = layout()
+            self.assertEqual(before[-1][0], b"moov")
+
+            Metadata(lyrics="la " * 5000).add_to_m4a(audio, autosave=True)
+            self.assertEqual(layout(), before)
+            size = os.path.getsize(audio)
+
+            Metadata(lyrics="la " * 6000).add_to_m4a(audio, autosave=True)
+            self.assertEqual(layout(), before)
+            self.assertEqual(os.path.getsize(audio), size)
+        return
+
+    def test_zero_padding_reserved(self) -> None:
+        """Tests that a file saved without padding gets `PADDING` on its next tag."""
+        with tempfile.TemporaryDirectory() as directory:
+            audio = os.path.join(directory, "audio.m4a")
+            shutil.copyfile("tests/test_audio_1.m4a", audio)
+            tags = mp4.MP4(audio)
+            tags["\xa9nam"] = ["Fighting For You"]
+            tags.save(padding=lambda info: 0)
+            size = os.path.getsize(audio)
+
+            Metadata(title="Fighting For You").add_to_m4a(audio, autosave=True)
+            self.assertGreaterEqual(os.path.getsize(audio), size + PADDING)
+            size = os.path.getsize(audio)
+
+            Metadata(lyrics="la " * 5000).add_to_m4a(audio, autosave=True)
+            self.assertEqual(os.path.getsize(audio), size)
+        return
+
+    def test_read_identifiers(self) -> None:
+        """Tests that the Spotify track ID and ISRC round-trip through the tags."""
+        identifiers = {"spotify_track_id": "0xTrackId", "isrc": "CAI370611475"}
+        with tempfile.TemporaryDirectory() as directory:
+            for fixture in ("tests/test_audio_1.m4a", "tests/test_audio_2.mp3"):
+                audio = os.path.join(directory, os.path.basename(fixture))
+                shutil.copyfile(fixture, audio)
+
+                metadata = Metadata(**identifiers)
+                if audio.endswith(".m4a"):
+                    metadata.add_to_m4a(audio, autosave=True)
+                else:
+                    metadata.add_to_mp3(audio, autosave=True)
+                self.assertEqual(Metadata.read_identifiers(audio), identifiers)
+        return
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,77 @@
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from audio_metadata_editor.paths import move_into_place, temporary_path
+
+
+################
+##  UNITTEST  ##
+################
+class TestPaths(unittest.TestCase):
+    def setUp(self) -> None:
+        """Runs before opening each function."""
+        self.directory = tempfile.mkdtemp()
+        return
+
+    def tearDown(self) -> None:
+        """Runs before closing each function."""
+        shutil.rmtree(self.directory)
+        return
+
+    def test_temporary_path(self) -> None:
+        """Tests the `temporary_path` function."""
+        filename = os.path.join(self.directory, "Title.m4a")
+
+        path = temporary_path(filename)
+        self.assertEqual(os.path.dirname(path), self.directory)
+        self.assertTrue(os.path.basename(path).startswith(".Title."))
+        self.assertTrue(path.endswith(".m4a"))
+        self.assertNotEqual(path, temporary_path(filename))
+        self.assertEqual(os.path.dirname(temporary_path(filename, "/tmp")), "/tmp")
+        return
+
+    def test_move_into_place(self) -> None:
+        """Tests the `move_into_place` function."""
+        destination = os.path.join(self.directory, "Title.m4a")
+        source = temporary_path(destination)
+        for filename, text in ((destination, "old"), (source, "new")):
+            with open(filename, "w") as file:
+                file.write(text)
+
+        self.assertEqual(move_into_place(source, destination), destination)
+        self.assertEqual(os.listdir(self.directory), ["Title.m4a"])
+        with open(destination) as file:
+            self.assertEqual(file.read(), "new")
+        return
+
+    def test_move_into_place_cross_device(self) -> None:
+        """Tests the `move_into_place` function across filesystems."""
+        destination = os.path.join(self.directory, "Title.m4a")
+        source = temporary_path(destination, tempfile.gettempdir())
+        with open(source, "w") as file:
+            file.write("new")
+
+        replace = os.replace
+        calls = []
+
+        def cross_device_replace(src: str, dst: str) -> None:
+            calls.append(src)
+            if src == source:
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            replace(src, dst)
+
+        with mock.patch("os.replace", cross_device_replace):
+            move_into_place(source, destination)
+
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual(os.listdir(self.directory), ["Title.m4a"])
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
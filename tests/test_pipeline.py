@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+
+from audio_metadata_editor.metadata import Metadata
+from audio_metadata_editor.pipeline import process, tag
+from audio_metadata_editor.youtube_audio_downloader import YouTubeAudioDownloader
+
+
+@dataclass
+class OpusDownloader(YouTubeAudioDownloader):
+    """Downloader 'converting' every video to an Opus file it cannot tag."""
+
+    def get_audio(
+        self,
+        video_url: str,
+        output_file: Optional[str] = None,
+        tag: Optional[Callable[[str], Any]] = None,
+    ) -> str:
+        self.video = SimpleNamespace(author="Hasting", title="Fighting For You")
+        self.source_sha256 = None
+        output_file = os.path.join(self.output_dir, "audio.opus")
+        open(output_file, "wb").close()
+        tag(output_file)
+        return output_file
+
+
+class UnusedSpotify:
+    """Spotify client failing the test on any request."""
+
+    def __getattr__(self, name: str) -> Any:
+        raise AssertionError(f"SpotifyAPI.{name} used")
+
+
+################
+##  UNITTEST  ##
+################
+class TestPipeline(unittest.TestCase):
+    def test_tag_unsupported(self) -> None:
+        """Tests that `tag` removes the album art file of a format it cannot tag."""
+        with tempfile.TemporaryDirectory() as directory:
+            album_art = os.path.join(directory, "cover.jpg")
+            open(album_art, "wb").close()
+            metadata = Metadata(title="Fighting For You", album_art=album_art)
+
+            self.assertFalse(tag(metadata, os.path.join(directory, "audio.opus")))
+            self.assertFalse(os.path.exists(album_art))
+        return
+
+    def test_untaggable_not_resolved(self) -> None:
+        """Tests that no metadata is resolved for a file `tag` cannot write."""
+        with tempfile.TemporaryDirectory() as directory:
+            result = process(
+                "https://youtu.be/a",
+                OpusDownloader(output_dir=directory),
+                UnusedSpotify(),
+            )
+            self.assertEqual(result.status, "ok", result.error)
+            self.assertFalse(result.tagged)
+            self.assertEqual(os.listdir(directory), ["audio.opus"])
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import threading
+import time
+import unittest
+
+from audio_metadata_editor.rate_limit import RateLimiter
+
+
+################
+##  UNITTEST  ##
+################
+class TestRateLimiter(unittest.TestCase):
+    def test_spacing(self) -> None:
+        """Tests that `RateLimiter.acquire` spaces requests by 1 / rate."""
+        limiter = RateLimiter(rate=50.0)
+        start = time.monotonic()
+        waits = [limiter.acquire() for _ in range(6)]
+        self.assertEqual(waits[0], 0.0)
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50.0 - 0.01)
+        return
+
+    def test_burst(self) -> None:
+        """Tests that `burst` requests pass at once after an idle period."""
+        limiter = RateLimiter(rate=1.0, burst=3)
+        self.assertEqual([limiter.acquire() for _ in range(3)], [0.0] * 3)
+        return
+
+    def test_threads_wait_in_turn(self) -> None:
+        """Tests that concurrent callers share one request budget."""
+        limiter = RateLimiter(rate=100.0)
+        times = []
+        lock = threading.Lock()
+
+        def request() -> None:
+            limiter.acquire()
+            with lock:
+                times.append(time.monotonic())
+            return
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        times.sort()
+        self.assertGreaterEqual(times[-1] - times[0], 7 / 100.0 - 0.01)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,12 @@
 import os
+import tempfile
 import unittest
+from dataclasses import replace
+from typing import Any
 
-from audio_metadata_editor.spotify_api import SpotifyAPI
+from audio_metadata_editor.cache import LRUCache
+from audio_metadata_editor.spotify_api import AlbumContext, SpotifyAPI
+from benchmarks.stand_in import StandIn
 
 
 ################
@@ -75,5 +80,168 @@ class TestSpotifyAPI(unittest.TestCase):
         return
 
 
+class FakeResponse:
+    def __init__(self, data: Any) -> None:
+        self.data, self.ok = data, bool(data)
+
+    def json(self) -> Any:
+        return self.data
+
+
+class FakeSession:
+    """Answers Spotify API paths from a dict, recording the requests."""
+
+    def __init__(self, responses: dict[str, Any]) -> None:
+        self.responses, self.requests, self.params = responses, [], []
+
+    def get(self, url: str, params: Any = None, headers: Any = None) -> FakeResponse:
+        path = url.removeprefix("https://api.spotify.com/v1/")
+        self.requests.append((path, (params or {}).get("q")))
+        self.params.append(params or {})
+        return FakeResponse(self.responses.get(path, {}))
+
+
+class TestLookup(unittest.TestCase):
+    track = {"id": "0xTrackId", "name": "Fighting For You", "track_number": 2}
+
+    def test_track_id(self) -> None:
+        """Tests that a known track ID takes one request and no search."""
+        session = FakeSession({"tracks/0xTrackId": self.track})
+        spotify = SpotifyAPI(session=session)
+        res = spotify.lookup(spotify_track_id="0xTrackId", isrc="CAI370611475")
+        self.assertEqual(res, {"tracks": {"items": [self.track]}})
+        self.assertEqual(session.requests, [("tracks/0xTrackId", None)])
+        return
+
+    def test_isrc(self) -> None:
+        """Tests the `isrc:` search filter."""
+        session = FakeSession({"search": {"tracks": {"items": [self.track]}}})
+        spotify = SpotifyAPI(session=session)
+        res = spotify.lookup(isrc="CAI370611475")
+        self.assertEqual(res["tracks"]["items"], [self.track])
+        self.assertEqual(session.requests, [("search", "isrc:CAI370611475")])
+        return
+
+    def test_upc(self) -> None:
+        """Tests picking the track of a `upc:` album by title."""
+        session = FakeSession(
+            {
+                "search": {"albums": {"items": [{"id": "0xAlbumId"}]}},
+                "albums/0xAlbumId/tracks": {
+                    "items": [{"id": "0xOther", "name": "Intro"}, self.track]
+                },
+                "tracks/0xTrackId": self.track,
+            }
+        )
+        spotify = SpotifyAPI(session=session)
+        res = spotify.lookup(
+            upc="0602445012345",
+            title="Hasting - Fighting For You (Official Video)",
+            market="CA",
+        )
+        self.assertEqual(res["tracks"]["items"], [self.track])
+        self.assertEqual(session.requests[0], ("search", "upc:0602445012345"))
+        self.assertEqual({params.get("market") for params in session.params}, {"CA"})
+        self.assertEqual(spotify.lookup(upc="0602445012345", title="Unrelated"), {})
+        return
+
+    def test_upc_pages(self) -> None:
+        """Tests that the tracks of a `upc:` album are paged through `next`."""
+        tracks = "albums/0xAlbumId/tracks"
+        session = FakeSession(
+            {
+                "search": {"albums": {"items": [{"id": "0xAlbumId"}]}},
+                tracks: {
+                    "items": [{"id": f"0x{i}", "track_number": i} for i in range(50)],
+                    "next": f"https://api.spotify.com/v1/{tracks}?offset=50&limit=50",
+                },
+                f"{tracks}?offset=50&limit=50": {
+                    "items": [{"id": "0xTrackId", "track_number": 51}],
+                    "next": None,
+                },
+                "tracks/0xTrackId": self.track,
+            }
+        )
+        spotify = SpotifyAPI(session=session)
+        res = spotify.lookup(upc="0602445012345", track_number=51)
+        self.assertEqual(res["tracks"]["items"], [self.track])
+        self.assertEqual(
+            [path for path, _ in session.requests[1:]],
+            [tracks, f"{tracks}?offset=50&limit=50", "tracks/0xTrackId"],
+        )
+        return
+
+    def test_not_found(self) -> None:
+        """Tests that an unknown identifier returns an empty response."""
+        spotify = SpotifyAPI(session=FakeSession({}))
+        self.assertEqual(spotify.lookup(isrc="XX0000000000"), {})
+        self.assertEqual(spotify.lookup(spotify_track_id="0xMissing"), {})
+        return
+
+
+class TestAlbumContext(unittest.TestCase):
+    def setUp(self) -> None:
+        """Runs before opening each function."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.stand_in = StandIn().start()
+        self.spotify = SpotifyAPI(
+            temp_dir=self.directory.name, session=self.stand_in.session()
+        )
+        self.spotify.authenticate(os.path.join(self.directory.name, "auth.json"))
+        return
+
+    def tearDown(self) -> None:
+        """Runs before closing each function."""
+        self.spotify.close()
+        self.stand_in.stop()
+        self.directory.cleanup()
+        return
+
+    def metadata(self, spotify: SpotifyAPI) -> Any:
+        """Resolve the stand-in track with a copy of the client."""
+        spotify.search("hasting", "fighting for you", market="US")
+        return spotify.to_metadata()
+
+    def test_album_resolved_once(self) -> None:
+        """Tests that two tracks of one album scrape and fetch its art once."""
+        first = self.metadata(replace(self.spotify))
+        second = self.metadata(replace(self.spotify))
+
+        self.assertEqual(first.album, second.album)
+        self.assertNotEqual(first.album_art, second.album_art)
+        self.assertEqual(self.stand_in.requests["music.apple.com"], 1)
+        self.assertEqual(self.stand_in.requests["i.scdn.co"], 1)
+        self.assertEqual(len(self.spotify.albums), 1)
+        return
+
+    def test_evicted_album_resolved_again(self) -> None:
+        """Tests that an album evicted between tracks is resolved again."""
+        self.spotify.albums = LRUCache(1, on_evict=AlbumContext.release)
+        self.metadata(replace(self.spotify))
+        (context,) = self.spotify.albums._values.values()
+        self.spotify.albums.clear()
+        self.assertFalse(os.path.exists(context.album_art))
+        self.assertFalse(context.acquire())
+
+        metadata = self.metadata(replace(self.spotify))
+        self.assertTrue(os.path.exists(metadata.album_art))
+        self.assertEqual(self.stand_in.requests["i.scdn.co"], 2)
+        return
+
+    def test_album_art_kept_while_in_use(self) -> None:
+        """Tests that an evicted context keeps its album art until released."""
+        with tempfile.NamedTemporaryFile(dir=self.directory.name, delete=False) as file:
+            album_art = file.name
+        context = AlbumContext(
+            "0xAlbumId", "A", "A", "B", 1, "2006", album_art=album_art
+        )
+        self.assertTrue(context.acquire())
+        context.release()  # evicted from the cache while in use
+        self.assertTrue(os.path.exists(album_art))
+        context.release()
+        self.assertFalse(os.path.exists(album_art))
+        return
+
+
 if __name__ == "__main__":
     unittest.main()
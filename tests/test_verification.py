@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from audio_metadata_editor.verification import (
+    VerificationError,
+    check_duration,
+    check_integrity,
+)
+
+
+################
+##  UNITTEST  ##
+################
+@unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+class TestVerification(unittest.TestCase):
+    def setUp(self) -> None:
+        """Runs before opening each function."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.audio = os.path.join(self.directory.name, "audio.m4a")
+        shutil.copyfile("tests/test_audio_1.m4a", self.audio)
+        return
+
+    def tearDown(self) -> None:
+        """Runs before closing each function."""
+        self.directory.cleanup()
+        return
+
+    def truncate(self) -> None:
+        with open(self.audio, "r+b") as file:
+            file.truncate(os.path.getsize(self.audio) // 2)
+        return
+
+    def test_check_integrity(self) -> None:
+        """Tests that a complete file passes and a truncated one fails."""
+        check_integrity(self.audio)
+        self.truncate()
+        with self.assertRaises(VerificationError):
+            check_integrity(self.audio)
+        return
+
+    def test_check_duration(self) -> None:
+        """Tests the duration comparison with the video length."""
+        self.assertAlmostEqual(check_duration(self.audio, 158), 158.08, places=1)
+        self.assertAlmostEqual(check_duration(self.audio, None), 158.08, places=1)
+        with self.assertRaises(VerificationError):
+            check_duration(self.audio, 3600)
+        self.truncate()
+        with self.assertRaises(VerificationError):
+            check_duration(self.audio, 158)
+        return
+
+
+if __name__ == "__main__":
+    unittest.main()